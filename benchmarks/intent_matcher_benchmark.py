@@ -0,0 +1,57 @@
+"""Compares recognizing messages with the recognizers one by one and with the compiled IntentMatcher.
+
+Usage: python benchmarks/intent_matcher_benchmark.py [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from msg_recognizers import RecognizedMessage, MessageIntent, HelpMsgRecognizer, ContactMsgRecognizer, \
+    UserPrefMsgRecognizer, ExchangeRateMsgRecognizer, ConvertMsgRecognizer, IntentMatcher
+
+MESSAGES = {
+    'command': '/my_bank',
+    'text': 'Курс доллара в Америабанке',
+    'convert': '100 usd',
+    'unknown': 'Hello, how are you doing today?',
+}
+
+
+def recognize_one_by_one(recognizers, message):
+    """Recognizes the message the way MainDialog did before the IntentMatcher."""
+    for recognizer in recognizers:
+        rec_message = recognizer.recognize(message)
+        if rec_message is not None:
+            return rec_message
+
+    return RecognizedMessage(MessageIntent.unknown_intent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=20000, help='number of recognitions per measurement')
+    args = parser.parse_args()
+
+    recognizers = [HelpMsgRecognizer(), ContactMsgRecognizer(), UserPrefMsgRecognizer(), ExchangeRateMsgRecognizer(),
+                   ConvertMsgRecognizer()]
+    matcher = IntentMatcher(recognizers)
+
+    print(f"{'message':<12}{'intent':<24}{'one by one, us':>16}{'matcher, us':>14}")
+    for name, message in MESSAGES.items():
+        expected = recognize_one_by_one(recognizers, message)
+        actual = matcher.recognize(message)
+        assert vars(expected) == vars(actual), f"{name}: {vars(expected)} != {vars(actual)}"
+
+        loop_time = timeit.timeit(lambda: recognize_one_by_one(recognizers, message), number=args.number)
+        matcher_time = timeit.timeit(lambda: matcher.recognize(message), number=args.number)
+
+        print(f"{name:<12}{actual.intent.name:<24}{loop_time / args.number * 1e6:>16.1f}"
+              f"{matcher_time / args.number * 1e6:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
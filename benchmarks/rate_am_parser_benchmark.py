@@ -0,0 +1,99 @@
+"""Compares parsing rate.am pages into a whole page tree with html.fromstring, and parsing them incrementally keeping
+only the rates table, by the parse time, the size of the tree and the part of the page which has to be downloaded.
+
+Recorded rate.am pages can be given as a directory of .html files. Otherwise the synthetic pages of the load test are
+parsed.
+
+Usage: python benchmarks/rate_am_parser_benchmark.py [--number N] [--pages DIR]
+"""
+import argparse
+import glob
+import os
+import sys
+import timeit
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from lxml import html
+
+from bot_data import Language, Currency
+from exchange_rates_informers.rate_am_parser import RateAmPageParser, RatesTableScanner
+from webhook_load_test import create_synthetic_page
+
+PARSERS = {
+    'fromstring': RateAmPageParser.parse,
+    'streaming': RateAmPageParser.parse_streaming,
+}
+
+# Sizes of the chunks in which the pages are received when checking the streaming parser
+CHUNK_SIZES = (1024, 4 * 1024, 16 * 1024)
+
+
+def load_pages(pages_dir: str = None) -> Dict[str, str]:
+    """Returns the recorded pages keyed by their file names, or the synthetic pages if no directory is given."""
+    if pages_dir is None:
+        return {f'synthetic_{lang.value}': create_synthetic_page(lang, seed) for seed, lang in enumerate(Language)}
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+        with open(path, encoding='utf-8') as file:
+            pages[os.path.basename(path)] = file.read()
+    return pages
+
+
+def receive(page_source: str, chunk_size: int = 16 * 1024) -> str:
+    """Returns the part of the page received until the end of the rates table, when it's downloaded in chunks."""
+    scanner = RatesTableScanner()
+    for offset in range(0, len(page_source), chunk_size):
+        if scanner.feed(page_source[offset:offset + chunk_size]):
+            break
+    return scanner.source
+
+
+def check_snapshot(name: str, parser_name: str, snapshot, expected) -> None:
+    """Raises an error if the snapshot differs from the expected one."""
+    if snapshot.banks != expected.banks or any(
+            snapshot.get_best(curr) != expected.get_best(curr) for curr in Currency):
+        raise AssertionError(f"{parser_name} parsed {name} differently.")
+
+
+def tree_elements(parser: str, page_source: str) -> int:
+    """Returns the number of elements which the parser keeps in its tree: the whole page for html.fromstring, and
+    only the rates table for the incremental parser."""
+    tree = html.fromstring(page_source)
+    if parser == 'streaming':
+        return len(tree.xpath('//table[@id="rb"]/descendant-or-self::*'))
+    return len(tree.xpath('//*'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=200, help='number of times each page is parsed')
+    parser.add_argument('--pages', help='directory with recorded rate.am pages')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+
+    print(f"{'page':<24}{'parser':<12}{'banks':>6}{'mean, ms':>10}{'elements':>10}{'received, %':>13}")
+    for name, page_source in pages.items():
+        snapshots = {parser_name: parse(page_source) for parser_name, parse in PARSERS.items()}
+        expected = snapshots['fromstring']
+        for parser_name, snapshot in snapshots.items():
+            check_snapshot(name, parser_name, snapshot, expected)
+
+        # The streaming parser gets only the part of the page received until the end of the rates table
+        for chunk_size in CHUNK_SIZES:
+            check_snapshot(name, f'streaming ({chunk_size} B chunks)',
+                           RateAmPageParser.parse_streaming(receive(page_source, chunk_size)), expected)
+
+        for parser_name, parse in PARSERS.items():
+            seconds = timeit.timeit(lambda: parse(page_source), number=args.number) / args.number
+            received = len(receive(page_source)) if parser_name == 'streaming' else len(page_source)
+            print(f"{name:<24}{parser_name:<12}{len(snapshots[parser_name].banks):>6}{seconds * 1e3:>10.2f}"
+                  f"{tree_elements(parser_name, page_source):>10}{received / len(page_source) * 100:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
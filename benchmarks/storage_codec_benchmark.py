@@ -0,0 +1,69 @@
+"""Compares the storage codecs' encode/decode time and the BSON size of the documents they create.
+
+Usage: python benchmarks/storage_codec_benchmark.py [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+import bson
+from botbuilder.core import MessageFactory
+from botbuilder.dialogs import DialogState, DialogInstance, ListStyle
+from botbuilder.dialogs.choices import Choice
+from botbuilder.dialogs.prompts import PromptOptions
+
+from bot_data import Language, banks
+from data_models import UserPreferences
+from storage.codecs import JsonpickleCodec, CompactCodec
+
+
+def create_states():
+    """Returns the typical states saved by the bot: the user state, and the conversation state between turns and
+    in the middle of the preferences dialog."""
+    user_state = {'user_preferences': UserPreferences(Language.en, banks.BankId.ameria)}
+
+    idle_conversation_state = {'dialog_state': DialogState()}
+
+    prompt = PromptOptions(
+        prompt=MessageFactory.text('Choose your preferred bank.'),
+        style=ListStyle.hero_card,
+        choices=[Choice(bank.en_name) for bank in banks.BANKS])
+    prompt_conversation_state = {'dialog_state': DialogState([
+        DialogInstance('MainDialog', {'dialogs': {'dialogState': DialogState([
+            DialogInstance('waterfall', {'options': None, 'values': {'first_time': True}, 'stepIndex': 0})])}}),
+        DialogInstance('welcome_user_prefs', {'dialogs': {'dialogState': DialogState([
+            DialogInstance('waterfall', {'options': None, 'values': {'lang': Language.en}, 'stepIndex': 1}),
+            DialogInstance('bank_prompt', {'options': prompt, 'state': {}})])}}),
+    ])}
+
+    return {
+        'user': user_state,
+        'conversation (idle)': idle_conversation_state,
+        'conversation (prompt)': prompt_conversation_state,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=2000, help='number of encodes/decodes per measurement')
+    args = parser.parse_args()
+
+    codecs = [JsonpickleCodec(), CompactCodec()]
+
+    print(f"{'state':<24}{'codec':<12}{'encode, us':>12}{'decode, us':>12}{'size, B':>10}")
+    for state_name, state in create_states().items():
+        for codec in codecs:
+            document = codec.encode(state)
+            encode_time = timeit.timeit(lambda: codec.encode(state), number=args.number) / args.number
+            decode_time = timeit.timeit(lambda: codec.decode(document), number=args.number) / args.number
+            size = len(bson.encode(document))
+
+            print(f"{state_name:<24}{codec.name:<12}{encode_time * 1e6:>12.1f}{decode_time * 1e6:>12.1f}{size:>10}")
+
+
+if __name__ == '__main__':
+    main()
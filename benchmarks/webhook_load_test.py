@@ -0,0 +1,304 @@
+"""Load test of the bot's /api/messages webhook.
+
+Runs the app's aiohttp APP in-process with Bot Framework auth disabled and in-memory storage, against a local stub
+which serves rate.am pages and accepts the bot's replies like the Bot Framework connector does. Then replays a mix of
+"all", "my bank", bank name and conversion messages at the given concurrency and reports the throughput, the latency
+percentiles and the time spent in each stage of a turn.
+
+Recorded rate.am pages can be given as a directory with {am,en,ru}_{non-cash,cash}.html files. A synthetic page with
+all supported banks is served for the missing ones.
+
+Usage: python benchmarks/webhook_load_test.py [--messages N] [--concurrency N] [--users N] [--pages DIR]
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+import random
+import socket
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+import aiohttp
+from aiohttp import web
+
+from bot_data import banks, Language
+
+# Words of the messages which are replayed, with their weights in the mix
+MESSAGE_MIX = [
+    ('all $', 20),
+    ('all rub', 10),
+    ('my bank', 20),
+    *((bank.en_name, 1) for bank in banks.BANKS),
+    ('100', 15),
+    ('250 rub', 5),
+    ('48000 dram', 5),
+    ('100 best', 5),
+]
+
+
+def create_synthetic_page(lang: Language, seed: int) -> str:
+    """Creates a rate.am-like page with the rates table of all supported banks."""
+    rnd = random.Random(seed)
+    rows = ['<tr><th></th></tr>', '<tr><th></th></tr>']
+    rates = []
+    for bank in banks.BANKS:
+        # usd buy/sell, eur buy/sell, rur buy/sell, gbp buy/sell
+        bank_rates = [rnd.choice(['479', '480', '481.5']), rnd.choice(['484', '485.25']), '520', '530',
+                      rnd.choice(['6', '6.1']), '6.5', '600', '610']
+        rates.append(bank_rates)
+
+        # Some cells of rate.am have tables of their own, which are nested in the rates table
+        tds = ['<td>1</td>', f'<td><a href="#">{getattr(bank, f"{lang.value}_name")}</a></td>',
+               '<td><table><tr><td></td></tr></table></td>' if bank is banks.BANKS[0] else '<td></td>',
+               '<td></td>', '<td>20 Feb, 10:11</td>'] + [f'<td>{rate}</td>' for rate in bank_rates]
+        rows.append(f'<tr id="{bank.rate_am_id}">{"".join(tds)}</tr>')
+
+    # The rows after the banks: a separator, the minimum and maximum rates, and two more
+    rows.append('<tr><td></td></tr>')
+    for best in (min, max):
+        rows.append('<tr><td></td>' + ''.join(
+            f'<td>{best(float(bank_rates[i]) for bank_rates in rates):g}</td>' for i in range(8)) + '</tr>')
+    rows.extend(['<tr><td></td></tr>'] * 2)
+
+    filler = '<p>Lorem ipsum dolor sit amet</p>' * 2000
+    return f'<html><body><div>{filler}</div><table id="rb">{"".join(rows)}</table><div>{filler}</div></body></html>'
+
+
+class Stub:
+    """Stands in for rate.am and the Bot Framework connector."""
+
+    def __init__(self, pages_dir: str = None):
+        self.pages: Dict[str, str] = {}
+        for seed, (lang, rates_type) in enumerate(itertools.product(Language, ('non-cash', 'cash'))):
+            url_lang = lang.value if lang != Language.hy else 'am'
+            path = os.path.join(pages_dir, f'{url_lang}_{rates_type}.html') if pages_dir else None
+            if path and os.path.exists(path):
+                with open(path, encoding='utf-8') as file:
+                    page = file.read()
+            else:
+                page = create_synthetic_page(lang, seed)
+            self.pages[f'{url_lang}/{rates_type}'] = page, f'"{hashlib.md5(page.encode()).hexdigest()}"'
+
+        self.replies = 0
+        self.page_responses = defaultdict(int)
+        self.app = web.Application()
+        self.app.router.add_get('/{lang}/armenian-dram-exchange-rates/banks/{type}', self.page)
+        self.app.router.add_post('/v3/conversations/{conversation_id}/activities', self.reply)
+        self.app.router.add_post('/v3/conversations/{conversation_id}/activities/{activity_id}', self.reply)
+
+    async def page(self, req: web.Request) -> web.Response:
+        page = self.pages.get(f"{req.match_info['lang']}/{req.match_info['type']}")
+        if page is None:
+            return web.Response(status=404)
+
+        page, etag = page
+        if req.headers.get('if-none-match') == etag:
+            self.page_responses[304] += 1
+            return web.Response(status=304, headers={'etag': etag})
+
+        self.page_responses[200] += 1
+        response = web.Response(text=page, content_type='text/html', headers={'etag': etag})
+        response.enable_compression()
+        return response
+
+    async def reply(self, req: web.Request) -> web.Response:
+        await req.read()
+        self.replies += 1
+        return web.json_response({'id': str(self.replies)})
+
+
+class StageTimer:
+    """Measures the time spent in the wrapped methods of the app's objects."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, obj, name: str, stage: str):
+        """Replaces the obj's method with the given name by a timed one."""
+        method = getattr(obj, name)
+        samples = self.samples[stage]
+
+        if asyncio.iscoroutinefunction(method):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - start)
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - start)
+
+        setattr(obj, name, timed)
+
+    def reset(self):
+        """Drops the samples measured so far."""
+        for samples in self.samples.values():
+            samples.clear()
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Returns the p-th percentile of the sorted values."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def create_activity(service_url: str, channel: str, user: int, message_id: int, text: str) -> dict:
+    """Creates an incoming message activity, like the ones the Bot Framework posts to the webhook."""
+    return {
+        'type': 'message',
+        'id': str(message_id),
+        'serviceUrl': service_url,
+        'channelId': channel,
+        'from': {'id': f'user-{user}', 'name': f'User {user}'},
+        'recipient': {'id': 'bot', 'name': 'Dram Rate Bot'},
+        'conversation': {'id': f'conversation-{user}'},
+        'text': text,
+    }
+
+
+async def seed_users(app_module, channel: str, users: int):
+    """Saves the preferences of all users, so their turns don't start the welcome dialog."""
+    from data_models import UserPreferences
+
+    rnd = random.Random(0)
+    await app_module.STORAGE.write({
+        f'{channel}/users/user-{user}': {
+            'user_preferences': UserPreferences(rnd.choice(list(Language)), rnd.choice(banks.BANKS).id_)
+        } for user in range(users)})
+
+
+async def replay(url: str, service_url: str, args, pick: Callable[[], str]) -> (List[float], int, float):
+    """Posts the messages with the given concurrency and returns their latencies, the number of errors and
+    the duration."""
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal errors
+        while True:
+            message_id = next(counter)
+            if message_id >= args.messages:
+                return
+
+            activity = create_activity(service_url, args.channel, message_id % args.users, message_id, pick())
+            start = time.perf_counter()
+            async with session.post(url, json=activity) as response:
+                await response.read()
+                if response.status >= 300:
+                    errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+        duration = time.perf_counter() - start
+
+    return latencies, errors, duration
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def run(args):
+    stub = Stub(args.pages)
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f'http://127.0.0.1:{stub_port}'
+
+    # The app reads its configuration on import
+    os.environ.update({
+        'MicrosoftAppId': '',
+        'MicrosoftAppPassword': '',
+        'SENTRY_DSN': '',
+        'STORAGE_BACKEND': 'memory',
+        'INFORMER_RATE_AM_URL': stub_url,
+        # The warmup and the measured messages of a user may be the same, and each of them should run a turn
+        'BOT_DUPLICATE_WINDOW': '0',
+    })
+    import app as app_module
+
+    timer = StageTimer()
+    timer.wrap(app_module.BOT, 'on_turn', 'turn')
+    timer.wrap(app_module.STORAGE, 'read', 'storage read')
+    timer.wrap(app_module.STORAGE, 'write', 'storage write')
+    timer.wrap(app_module.MAIN_DIALOG.intent_matcher, 'recognize', 'recognize')
+    timer.wrap(app_module.INFORMER, 'get_snapshot', 'rates')
+    for responder in app_module.MAIN_DIALOG.msg_responders:
+        timer.wrap(responder, 'create_response', 'respond')
+    timer.wrap(app_module.ADAPTER, 'send_activities', 'send replies')
+
+    runners = [web.AppRunner(stub.app), web.AppRunner(app_module.APP)]
+    for runner, port in zip(runners, (stub_port, app_port)):
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+
+    try:
+        await seed_users(app_module, args.channel, args.users)
+
+        texts, weights = zip(*MESSAGE_MIX)
+        rnd = random.Random(args.seed)
+
+        def pick():
+            return rnd.choices(texts, weights)[0]
+
+        url = f'http://127.0.0.1:{app_port}/api/messages'
+        warmup = argparse.Namespace(**{**vars(args), 'messages': args.warmup})
+        await replay(url, stub_url, warmup, pick)
+        timer.reset()
+
+        latencies, errors, duration = await replay(url, stub_url, args, pick)
+    finally:
+        for runner in reversed(runners):
+            await runner.cleanup()
+
+    latencies.sort()
+    print(f"messages: {len(latencies)}, errors: {errors}, concurrency: {args.concurrency}, "
+          f"replies: {stub.replies}, rate.am responses: {dict(stub.page_responses)}")
+    print(f"throughput: {len(latencies) / duration:.1f} msg/s")
+    print(f"latency, ms: p50 {percentile(latencies, 50) * 1e3:.1f}, p95 {percentile(latencies, 95) * 1e3:.1f}, "
+          f"p99 {percentile(latencies, 99) * 1e3:.1f}, max {latencies[-1] * 1e3 if latencies else 0:.1f}")
+
+    print(f"\n{'stage':<16}{'calls/msg':>10}{'mean, ms':>10}{'p50, ms':>10}{'p95, ms':>10}{'total, s':>10}")
+    for stage, samples in timer.samples.items():
+        # e.g. no state was written in the measured phase
+        if not samples:
+            continue
+        samples.sort()
+        print(f"{stage:<16}{len(samples) / max(len(latencies), 1):>10.2f}{sum(samples) / len(samples) * 1e3:>10.2f}"
+              f"{percentile(samples, 50) * 1e3:>10.2f}{percentile(samples, 95) * 1e3:>10.2f}{sum(samples):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000, help='number of measured messages')
+    parser.add_argument('--warmup', type=int, default=100, help='number of messages sent before measuring')
+    parser.add_argument('--concurrency', type=int, default=20, help='number of messages in flight')
+    parser.add_argument('--users', type=int, default=200, help='number of distinct users and conversations')
+    parser.add_argument('--channel', default='telegram', help='channel id of the messages')
+    parser.add_argument('--pages', help='directory with recorded rate.am pages')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the message mix')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
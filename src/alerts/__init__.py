@@ -0,0 +1,4 @@
+from .rate_alert import RateAlert
+from .alert_index import AlertIndex
+from .mongodb_alert_store import MongodbAlertStore
+from .rate_alerts import RateAlerts
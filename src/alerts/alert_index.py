@@ -0,0 +1,131 @@
+import bisect
+from typing import Dict, List, Optional, Tuple, Iterator
+
+from bot_data import Currency
+from alerts.rate_alert import RateAlert
+
+
+class _Thresholds:
+    """The alerts of one rate sorted by their thresholds, and the last seen value of the rate."""
+
+    __slots__ = ('thresholds', 'alerts', 'rate')
+
+    def __init__(self):
+        self.thresholds: List[int] = []
+        self.alerts: List[RateAlert] = []
+        self.rate: Optional[int] = None
+
+
+class AlertIndex:
+    """Indexes the alerts by the rates they wait for, i.e. by (non_cash, bank, currency, buy).
+
+    The alerts of each rate are kept sorted by their thresholds, so when the rate changes, only the alerts whose
+    thresholds it has crossed since its last seen value are visited, instead of checking every alert.
+    """
+
+    def __init__(self):
+        self.__rates: Dict[Tuple[bool, str, Currency, bool], _Thresholds] = {}
+        self.__alerts: Dict[str, RateAlert] = {}
+        # Ids of the alerts of each conversation, in the order they were added
+        self.__conversations: Dict[str, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__alerts)
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self.__alerts
+
+    def add(self, alert: RateAlert) -> None:
+        """Adds the alert, replacing the one with the same id."""
+        self.remove(alert.id_)
+
+        rate = self.__rates.get(alert.key)
+        if rate is None:
+            rate = self.__rates[alert.key] = _Thresholds()
+
+        position = bisect.bisect_right(rate.thresholds, alert.threshold)
+        rate.thresholds.insert(position, alert.threshold)
+        rate.alerts.insert(position, alert)
+
+        self.__alerts[alert.id_] = alert
+        self.__conversations.setdefault(alert.conversation_key, {})[alert.id_] = None
+
+    def remove(self, alert_id: str) -> Optional[RateAlert]:
+        """Removes the alert with the given id.
+
+        :return: the removed alert, or None if there is no such alert
+        """
+        alert = self.__alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+
+        rate = self.__rates[alert.key]
+        start = bisect.bisect_left(rate.thresholds, alert.threshold)
+        end = bisect.bisect_right(rate.thresholds, alert.threshold)
+        position = next(position for position in range(start, end) if rate.alerts[position].id_ == alert_id)
+        del rate.thresholds[position]
+        del rate.alerts[position]
+
+        self.__forget_conversation_alert(alert)
+        return alert
+
+    def clear(self) -> None:
+        """Removes all alerts. The last seen values of the rates are kept."""
+        for rate in self.__rates.values():
+            rate.thresholds.clear()
+            rate.alerts.clear()
+        self.__alerts.clear()
+        self.__conversations.clear()
+
+    def get_conversation_alerts(self, conversation_key: str) -> List[RateAlert]:
+        """Returns the alerts of the given conversation, in the order they were added."""
+        return [self.__alerts[alert_id] for alert_id in self.__conversations.get(conversation_key, ())]
+
+    def get_rates(self, non_cash: bool) -> Iterator[Tuple[str, Currency, bool]]:
+        """Returns the (rate.am bank id, currency, buy) of the non-cash or cash rates which have or had alerts.
+        The rates without alerts are returned too, so their last seen values are kept up to date for the new alerts.
+        """
+        return ((bank_id, curr, buy) for (non_cash_, bank_id, curr, buy) in self.__rates if non_cash_ == non_cash)
+
+    def pop_reached(self, non_cash: bool, bank_id: str, curr: Currency, buy: bool, value: int) -> List[RateAlert]:
+        """Updates the value of the given rate, and removes and returns the alerts whose thresholds it has crossed
+        since its last seen value. All reached alerts are returned for the first seen value.
+
+        :param bool non_cash: whether it's a non-cash or cash rate
+        :param str bank_id: rate.am id of the bank
+        :param Currency curr: currency of the rate
+        :param bool buy: whether it's the buy or sell rate
+        :param int value: the new value of the rate in 1/100 of AMD. A missing rate (0) doesn't change the last
+                          seen value.
+        """
+        rate = self.__rates.get((non_cash, bank_id, curr, buy))
+        if rate is None or not value:
+            return []
+
+        last, rate.rate = rate.rate, value
+        if buy:
+            # The rate has risen to the thresholds in (last, value]
+            start = bisect.bisect_right(rate.thresholds, last) if last is not None else 0
+            end = bisect.bisect_right(rate.thresholds, value)
+        else:
+            # The rate has fallen to the thresholds in [value, last)
+            start = bisect.bisect_left(rate.thresholds, value)
+            end = bisect.bisect_left(rate.thresholds, last) if last is not None else len(rate.thresholds)
+
+        if start >= end:
+            return []
+
+        reached = rate.alerts[start:end]
+        del rate.thresholds[start:end]
+        del rate.alerts[start:end]
+        for alert in reached:
+            del self.__alerts[alert.id_]
+            self.__forget_conversation_alert(alert)
+
+        return reached
+
+    def __forget_conversation_alert(self, alert: RateAlert) -> None:
+        conversation = self.__conversations[alert.conversation_key]
+        del conversation[alert.id_]
+        if not conversation:
+            del self.__conversations[alert.conversation_key]
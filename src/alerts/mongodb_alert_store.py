@@ -0,0 +1,39 @@
+from typing import List, Iterable
+
+import motor.motor_asyncio
+import pymongo
+
+from alerts.rate_alert import RateAlert
+
+
+class MongodbAlertStore:
+    """Keeps the rate alerts in MongoDB, so they survive restarts of the app."""
+
+    def __init__(self, db: motor.motor_asyncio.AsyncIOMotorDatabase, collection: str = 'rate_alerts'):
+        """Creates the store.
+
+        :param db: db in which the alerts collection is
+        :param str collection: name of the collection of the alerts
+        """
+        self.db = db
+        self.collection_name = collection
+
+    async def ensure_indexes(self) -> None:
+        """Creates the index by which the alerts of a conversation are deleted, if it doesn't exist."""
+        await self.__collection.create_index([('conversation_key', pymongo.ASCENDING)])
+
+    async def save(self, alert: RateAlert) -> None:
+        """Saves the alert."""
+        await self.__collection.replace_one({'_id': alert.id_}, alert.to_document(), upsert=True)
+
+    async def delete(self, alert_ids: Iterable[str]) -> None:
+        """Deletes the alerts with the given ids."""
+        await self.__collection.delete_many({'_id': {'$in': list(alert_ids)}})
+
+    async def load(self) -> List[RateAlert]:
+        """Loads all alerts."""
+        return [RateAlert.from_document(document) async for document in self.__collection.find({})]
+
+    @property
+    def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        return self.db[self.collection_name]
@@ -0,0 +1,74 @@
+from decimal import Decimal
+from typing import NamedTuple, Tuple, Dict
+
+from bot_data import Language, Currency, banks
+from bot_data.banks import BankId
+from resources import ResponseMsgs
+
+
+class RateAlert(NamedTuple):
+    """A one-off subscription to the moment when a rate of a bank reaches a threshold.
+
+    A buy rate alert fires when the rate rises to the threshold or above it, and a sell rate alert when the rate falls
+    to the threshold or below it, i.e. when the rate becomes at least as good for the user as the one they wait for.
+    """
+    id_: str
+    conversation_key: str
+    lang: Language
+    bank: BankId
+    curr: Currency
+    non_cash: bool
+    buy: bool
+    threshold: int
+    created_at: float
+
+    @property
+    def key(self) -> Tuple[bool, str, Currency, bool]:
+        """The (non_cash, rate.am bank id, currency, buy) of the rate which the alert waits for."""
+        return self.non_cash, banks.get_by_id(self.bank).rate_am_id, self.curr, self.buy
+
+    def is_reached(self, rate: int) -> bool:
+        """Checks whether the given rate in 1/100 of AMD has reached the threshold. A missing rate never does."""
+        if not rate:
+            return False
+
+        return rate >= self.threshold if self.buy else rate <= self.threshold
+
+    def describe(self, channel: str = None) -> str:
+        """Returns the message which describes the alert in its language."""
+        # Message formatting: bold
+        b = '**' if not channel == 'facebook' else ''
+
+        bank_name = getattr(banks.get_by_id(self.bank), f'{self.lang.value}_name')
+        type_msg = ResponseMsgs.get('non_cash' if self.non_cash else 'cash', self.lang)
+        currency_msg = ResponseMsgs.get('n_rur' if self.curr is Currency.rur else 'n_usd', n=1)
+        side_msg = ResponseMsgs.get('buy' if self.buy else 'sell', self.lang)
+
+        return (f"{b}{bank_name}, {type_msg}{b}\n\n"
+                f"{currency_msg} ({side_msg}) {'≥' if self.buy else '≤'} {RateAlert.format_rate(self.threshold)}")
+
+    @staticmethod
+    def format_rate(rate: int) -> str:
+        """Formats the given rate in 1/100 of AMD."""
+        return f"{Decimal(rate).scaleb(-2):.2f}"
+
+    def to_document(self) -> Dict:
+        """Encodes the alert into a plain document."""
+        return {
+            '_id': self.id_,
+            'conversation_key': self.conversation_key,
+            'lang': self.lang.value,
+            'bank': self.bank.value,
+            'curr': self.curr.value,
+            'non_cash': self.non_cash,
+            'buy': self.buy,
+            'threshold': self.threshold,
+            'created_at': self.created_at,
+        }
+
+    @staticmethod
+    def from_document(document: Dict) -> 'RateAlert':
+        """Decodes the alert from a document created by :py:meth:`to_document`."""
+        return RateAlert(document['_id'], document['conversation_key'], Language(document['lang']),
+                         BankId(document['bank']), Currency(document['curr']), document['non_cash'], document['buy'],
+                         document['threshold'], document['created_at'])
@@ -0,0 +1,221 @@
+import asyncio
+from typing import Callable, List, Set, Dict
+
+from aiohttp import web
+from botbuilder.core import BotAdapter, Storage, TurnContext
+
+from alerts.alert_index import AlertIndex
+from alerts.mongodb_alert_store import MongodbAlertStore
+from alerts.rate_alert import RateAlert
+from bot_data import Language, Currency
+from bots import DramRateBot
+from cluster import ClusterEvents
+from error_reporting import report_error
+from exchange_rates_informers import RatesSnapshot
+from metrics import REGISTRY
+from resources import ResponseMsgs
+
+
+class RateAlerts:
+    """Keeps the users' rate alerts, and sends a proactive message to the conversation of each alert, which a new
+    snapshot of the rates has reached.
+
+    The alerts are indexed by the rates they wait for, so each snapshot checks only the alerts whose thresholds the
+    rates have crossed. The messages are sent to the conversations referenced in the conversation states saved by
+    the bot, since an alert fires long after the turn in which it was created.
+    """
+
+    EVENTS_TOPIC = 'alerts'
+
+    def __init__(self, adapter: BotAdapter, storage: Storage, app_id: str = None, store: MongodbAlertStore = None,
+                 events: ClusterEvents = None, notify: Callable[[], bool] = None, max_per_conversation: int = 5,
+                 lang: Language = Language.en):
+        """Creates the alerts.
+
+        :param BotAdapter adapter: adapter by which the proactive messages are sent
+        :param Storage storage: storage of the conversation states
+        :param str app_id: id of the bot's app, which is required to send proactive messages to the channels
+        :param MongodbAlertStore store: store of the alerts, they are kept only in memory if None
+        :param ClusterEvents events: events by which the workers of the app tell each other about the created and
+                                     removed alerts
+        :param notify: function which tells whether the reached alerts should be sent and deleted from the store,
+                       e.g. only in the worker which gets the rates. The other workers only drop them. They are always
+                       sent if None.
+        :param int max_per_conversation: maximum number of alerts of a conversation
+        :param Language lang: language of the snapshots which are checked. The rates are the same in all languages.
+        """
+        self.adapter = adapter
+        self.storage = storage
+        self.app_id = app_id
+        self.store = store
+        self.events = events
+        self.notify = notify
+        self.max_per_conversation = max_per_conversation
+        self.lang = lang
+
+        self.__index = AlertIndex()
+        self.__tasks: Set[asyncio.Future] = set()
+
+        self.__alerts_gauge = REGISTRY.gauge('rate_alerts', 'Rate alerts waiting for the rates.')
+        self.__sent = REGISTRY.counter('rate_alerts_sent_total', 'Reached rate alerts by the sending result.',
+                                       ('result',))
+
+        if events is not None:
+            events.subscribe(RateAlerts.EVENTS_TOPIC, self.__on_changed_elsewhere)
+            events.subscribe(ClusterEvents.RESET, self.__on_reset)
+
+    def get_alerts(self, conversation_key: str) -> List[RateAlert]:
+        """Returns the alerts of the given conversation."""
+        return self.__index.get_conversation_alerts(conversation_key)
+
+    async def subscribe(self, alert: RateAlert) -> None:
+        """Adds the alert.
+
+        :raise ValueError: if the conversation already has the maximum number of alerts
+        """
+        if len(self.get_alerts(alert.conversation_key)) >= self.max_per_conversation:
+            raise ValueError(f"[{RateAlerts.__name__}]: conversation {alert.conversation_key} already has "
+                             f"{self.max_per_conversation} alerts.")
+
+        if self.store is not None:
+            await self.store.save(alert)
+        self.__index.add(alert)
+        self.__update_gauge()
+
+        if self.events is not None:
+            await self.events.publish(RateAlerts.EVENTS_TOPIC, {'added': [alert.to_document()]})
+
+    async def unsubscribe(self, conversation_key: str) -> int:
+        """Removes all alerts of the given conversation.
+
+        :return int: number of the removed alerts
+        """
+        alert_ids = [alert.id_ for alert in self.get_alerts(conversation_key)]
+        if not alert_ids:
+            return 0
+
+        if self.store is not None:
+            await self.store.delete(alert_ids)
+        for alert_id in alert_ids:
+            self.__index.remove(alert_id)
+        self.__update_gauge()
+
+        if self.events is not None:
+            await self.events.publish(RateAlerts.EVENTS_TOPIC, {'removed': alert_ids})
+        return len(alert_ids)
+
+    def check(self, lang: Language, non_cash: bool, snapshot: RatesSnapshot) -> None:
+        """Finds the alerts which the rates of the given snapshot have reached, and sends them in the background.
+        Can be used as an informer listener.
+
+        :param Language lang: language of the snapshot
+        :param bool non_cash: whether the snapshot has non-cash or cash rates
+        :param RatesSnapshot snapshot: the snapshot
+        """
+        if lang is not self.lang:
+            return
+
+        currencies = list(Currency)
+        reached = []
+        for bank_id, curr, buy in list(self.__index.get_rates(non_cash)):
+            bank = snapshot.get_bank(bank_id)
+            if bank is None:
+                continue
+
+            rate = bank.rates[currencies.index(curr)]
+            reached.extend(self.__index.pop_reached(non_cash, bank_id, curr, buy,
+                                                    (rate.buy if buy else rate.sell).minor_units))
+
+        if not reached:
+            return
+        self.__update_gauge()
+
+        # The other workers drop the same alerts, since they check the same snapshots
+        if self.notify is None or self.notify():
+            self.__run_in_background(self.__send_reached(reached, snapshot))
+
+    async def load(self, _app: web.Application = None) -> None:
+        """Loads the alerts from the store. Can be used as an aiohttp startup hook, so it only reports the errors,
+        not to prevent the app from starting."""
+        if self.store is None:
+            return
+
+        try:
+            await self.store.ensure_indexes()
+            alerts = await self.store.load()
+        except Exception as error:
+            report_error(RateAlerts.__name__, "failed to load the alerts", error)
+            return
+
+        self.__index.clear()
+        for alert in alerts:
+            self.__index.add(alert)
+        self.__update_gauge()
+
+    async def close(self, _app: web.Application = None) -> None:
+        """Waits for the reached alerts to be sent. Can be used as an aiohttp cleanup hook."""
+        if self.__tasks:
+            await asyncio.gather(*self.__tasks, return_exceptions=True)
+
+    async def __send_reached(self, alerts: List[RateAlert], snapshot: RatesSnapshot) -> None:
+        """Deletes the reached alerts from the store, sends them to their conversations, and tells the other workers
+        that they were removed."""
+        if self.store is not None:
+            try:
+                await self.store.delete([alert.id_ for alert in alerts])
+            except Exception as error:
+                report_error(RateAlerts.__name__, "failed to delete the reached alerts", error)
+
+        for alert in alerts:
+            result = 'sent'
+            try:
+                if not await self.__send(alert, snapshot):
+                    result = 'no_reference'
+            except Exception as error:
+                result = 'failed'
+                report_error(RateAlerts.__name__, "failed to send an alert", error)
+            self.__sent.inc(result=result)
+
+        # The alerts are sent first, since they have already been removed from the index and the store
+        if self.events is not None:
+            await self.events.publish(RateAlerts.EVENTS_TOPIC, {'removed': [alert.id_ for alert in alerts]})
+
+    async def __send(self, alert: RateAlert, snapshot: RatesSnapshot) -> bool:
+        """Sends the reached alert with the current rate to its conversation.
+
+        :return bool: whether the alert was sent, i.e. the conversation reference was found
+        """
+        reference = await DramRateBot.load_conversation_reference(self.storage, alert.conversation_key)
+        if reference is None:
+            return False
+
+        rate = snapshot.get_bank(alert.key[1]).rates[list(Currency).index(alert.curr)]
+        message = (f"{ResponseMsgs.get('alert_fired', alert.lang)}\n\n"
+                   f"{alert.describe(reference.channel_id)}\n\n"
+                   f"{ResponseMsgs.get('alert_now', alert.lang, rate=rate.buy if alert.buy else rate.sell)}")
+
+        async def send_message(turn_context: TurnContext):
+            await turn_context.send_activity(message)
+
+        await self.adapter.continue_conversation(reference, send_message, bot_id=self.app_id or None)
+        return True
+
+    def __on_changed_elsewhere(self, payload: Dict) -> None:
+        """Applies the alerts created and removed by another worker."""
+        for document in payload.get('added', ()):
+            self.__index.add(RateAlert.from_document(document))
+        for alert_id in payload.get('removed', ()):
+            self.__index.remove(alert_id)
+        self.__update_gauge()
+
+    def __on_reset(self, _payload: Dict) -> None:
+        """Loads the alerts again, since the changes made by the other workers might have been missed."""
+        self.__run_in_background(self.load())
+
+    def __run_in_background(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    def __update_gauge(self) -> None:
+        self.__alerts_gauge.set(len(self.__index))
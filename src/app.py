@@ -1,42 +1,178 @@
+import motor.motor_asyncio
 import sentry_sdk
 from aiohttp import web
-from botbuilder.core import UserState, ConversationState
+from botbuilder.core import UserState, ConversationState, MemoryStorage
 from botbuilder.core.integration import aiohttp_error_middleware
 
 from adapter import ADAPTER
-from bots import DramRateBot
-from config import WebAppConfig
+from alerts import RateAlerts, MongodbAlertStore
+from bots import DramRateBot, TurnAdmission
+from broadcasts import BroadcastEngine, MongodbBroadcastStore
+from cluster import ClusterEvents, LeaderLease
+from config import WebAppConfig, InformerConfig, HttpClientConfig, MetricsConfig, StorageConfig, ClusterConfig, \
+    AlertsConfig, BotConfig, BroadcastConfig, LoadSheddingConfig
 from dialogs.main_dialog import MainDialog
-from exchange_rates_informers import RateAmParserExchangeRatesInformer
+from exchange_rates_informers import RateAmParserExchangeRatesInformer, RatesRefresher, MongodbRatesSnapshotStore, \
+    SharedExchangeRatesInformer, RateHistory, MongodbRateHistoryStore
+from http_client import SharedHttpClient
+from msg_responders import ExchangeRateMsgResponder
+from metrics import EventLoopMonitor, CACHE_METRICS
 from routes import setup_routes
 from storage import MongodbStorage
+from storage.codecs import JsonpickleCodec, CompactCodec
+from utils.helpers import ExecutorHelper
+from utils.resilience import CircuitBreaker, LoadShedder
 
 # Create config
 CONFIG = WebAppConfig()
 
 # Initialize Sentry
 sentry_sdk.init(
-    dsn=CONFIG.SENTRY_DSN
+    dsn=CONFIG.SENTRY_DSN,
+    traces_sample_rate=CONFIG.SENTRY_TRACES_SAMPLE_RATE
 )
 
+# Create the events by which the workers tell each other about the changed rates and states, if there are several.
+#   They are followed with a long-lived cursor, so they have their own connection.
+CLUSTER = ClusterConfig.ENABLED and StorageConfig.BACKEND != 'memory'
+if CLUSTER:
+    CLUSTER_DB = motor.motor_asyncio.AsyncIOMotorClient(CONFIG.MONGO_URL)[CONFIG.MONGO_DB]
+    CLUSTER_EVENTS = ClusterEvents(CLUSTER_DB, ClusterConfig.WORKER_ID, ClusterConfig.EVENTS_COLLECTION,
+                                   ClusterConfig.EVENTS_SIZE)
+
 # Create storage and state stores
-STORAGE = MongodbStorage(CONFIG.MONGO_URL, CONFIG.MONGO_DB, CONFIG.MONGO_COL)
+if StorageConfig.BACKEND == 'memory':
+    STORAGE = MemoryStorage()
+else:
+    STORAGE = MongodbStorage(CONFIG.MONGO_URL, CONFIG.MONGO_DB, CONFIG.MONGO_COL,
+                             write_behind=StorageConfig.WRITE_BEHIND,
+                             flush_interval=StorageConfig.FLUSH_INTERVAL,
+                             max_batch_size=StorageConfig.MAX_BATCH_SIZE,
+                             cache=StorageConfig.CACHE,
+                             cache_ttl=StorageConfig.CACHE_TTL,
+                             cache_max_entries=StorageConfig.CACHE_MAX_ENTRIES,
+                             cache_max_bytes=StorageConfig.CACHE_MAX_BYTES,
+                             codec=JsonpickleCodec() if StorageConfig.CODEC == JsonpickleCodec.NAME else CompactCodec(),
+                             indexes=(MongodbStorage.parse_indexes(StorageConfig.INDEXES) if StorageConfig.INDEXES
+                                      else None),
+                             conversation_ttl=StorageConfig.CONVERSATION_TTL,
+                             events=CLUSTER_EVENTS if CLUSTER else None)
 USER_STATE = UserState(STORAGE)
 CONVERSATION_STATE = ConversationState(STORAGE)
 
+# Create the http client shared by all outgoing requests
+HTTP_CLIENT = SharedHttpClient(HttpClientConfig.MAX_CONNECTIONS, HttpClientConfig.MAX_KEEPALIVE_CONNECTIONS,
+                               HttpClientConfig.KEEPALIVE_EXPIRY, HttpClientConfig.TIMEOUT,
+                               HttpClientConfig.CONNECT_TIMEOUT, HttpClientConfig.HTTP2)
+
+# Create the informer and keep its rates warm in the background
+PARSER_EXECUTOR = ExecutorHelper.create_executor(InformerConfig.PARSER_POOL, InformerConfig.PARSER_WORKERS)
+RATE_AM_CIRCUIT_BREAKER = CircuitBreaker('rate_am', InformerConfig.FAILURE_THRESHOLD, InformerConfig.RECOVERY_TIMEOUT,
+                                         InformerConfig.MAX_RECOVERY_TIMEOUT)
+INFORMER = RateAmParserExchangeRatesInformer(HTTP_CLIENT, parser_executor=PARSER_EXECUTOR,
+                                             circuit_breaker=RATE_AM_CIRCUIT_BREAKER)
+if CLUSTER:
+    # Only the leader scrapes rate.am, and the other workers read the rates it publishes
+    RATES_LEASE = LeaderLease(CLUSTER_DB, 'rates', ClusterConfig.WORKER_ID, ClusterConfig.LEASE_TTL,
+                              ClusterConfig.LEASES_COLLECTION)
+    RATES_STORE = MongodbRatesSnapshotStore(CLUSTER_DB, ClusterConfig.RATES_COLLECTION)
+    INFORMER = SharedExchangeRatesInformer(INFORMER, RATES_STORE, RATES_LEASE, CLUSTER_EVENTS)
+
+# Record the history of the rates. It's saved to the db only by the worker which gets the rates from rate.am.
+RATE_HISTORY = RateHistory(InformerConfig.HISTORY_HOURS, InformerConfig.HISTORY_BUCKET,
+                           (MongodbRateHistoryStore(STORAGE.db, InformerConfig.HISTORY_COLLECTION)
+                            if isinstance(STORAGE, MongodbStorage) else None),
+                           persist=(lambda: RATES_LEASE.is_leader) if CLUSTER else None)
+INFORMER.add_listener(RATE_HISTORY.record)
+
+# Send the users' rate alerts, when the rates reach them. They are sent only by the worker which gets the rates.
+RATE_ALERTS = None
+if AlertsConfig.ENABLED:
+    RATE_ALERTS = RateAlerts(ADAPTER, STORAGE, BotConfig.APP_ID,
+                             (MongodbAlertStore(STORAGE.db, AlertsConfig.COLLECTION)
+                              if isinstance(STORAGE, MongodbStorage) else None),
+                             CLUSTER_EVENTS if CLUSTER else None,
+                             (lambda: RATES_LEASE.is_leader) if CLUSTER else None,
+                             AlertsConfig.MAX_PER_CONVERSATION)
+    INFORMER.add_listener(RATE_ALERTS.check)
+REFRESHER = RatesRefresher(INFORMER, InformerConfig.REFRESH_INTERVAL, InformerConfig.REFRESH_JITTER)
+
+# Expose the hit ratios of the caches
+CACHE_METRICS.register('rates', INFORMER.informer.cache if CLUSTER else INFORMER.cache)
+if CLUSTER:
+    CACHE_METRICS.register('shared_rates', INFORMER.cache)
+if isinstance(STORAGE, MongodbStorage) and STORAGE.cache is not None:
+    CACHE_METRICS.register('storage', STORAGE.cache)
+
 # Create main dialog
-INFORMER = RateAmParserExchangeRatesInformer()
-MAIN_DIALOG = MainDialog(USER_STATE, CONVERSATION_STATE, INFORMER)
+MAIN_DIALOG = MainDialog(USER_STATE, CONVERSATION_STATE, INFORMER, HTTP_CLIENT, RATE_HISTORY, RATE_ALERTS)
+
+# Create the event loop monitor to measure how long the loop is blocked
+LOOP_MONITOR = EventLoopMonitor(MetricsConfig.LOOP_MONITOR_INTERVAL)
 
 # Create the Bot
-BOT = DramRateBot(CONVERSATION_STATE, USER_STATE, MAIN_DIALOG)
+BOT = DramRateBot(CONVERSATION_STATE, USER_STATE, MAIN_DIALOG,
+                 TurnAdmission(BotConfig.DUPLICATE_WINDOW) if BotConfig.TURN_ADMISSION else None)
+
+# Create the engine which sends the broadcasts to all conversations. It streams them from the db, so it needs MongoDB.
+BROADCASTS = None
+if isinstance(STORAGE, MongodbStorage):
+    BROADCASTS = BroadcastEngine(ADAPTER, STORAGE, MongodbBroadcastStore(STORAGE.db, BroadcastConfig.COLLECTION),
+                                 ExchangeRateMsgResponder(CONVERSATION_STATE, USER_STATE, INFORMER), BotConfig.APP_ID,
+                                 BroadcastConfig.RATE, BroadcastConfig.BURST, BroadcastConfig.CONCURRENCY,
+                                 BroadcastConfig.BATCH_SIZE, BroadcastConfig.MAX_RETRIES)
+
+# Bound the turns in flight, running the turns of the cheap intents, e.g. help, first when they are queued
+MESSAGES_SHEDDER = None
+if LoadSheddingConfig.MAX_IN_FLIGHT > 0:
+    MESSAGES_SHEDDER = LoadShedder('messages', LoadSheddingConfig.MAX_IN_FLIGHT, LoadSheddingConfig.MAX_QUEUE,
+                                   LoadSheddingConfig.MAX_WAIT, LoadSheddingConfig.RETRY_AFTER)
 
 # Create the aiohttp web app
 APP = web.Application(middlewares=[aiohttp_error_middleware])
-setup_routes(APP, ADAPTER, BOT)
+setup_routes(APP, ADAPTER, BOT, BROADCASTS, BroadcastConfig.TOKEN, MESSAGES_SHEDDER,
+             lambda activity: MAIN_DIALOG.get_priority(activity.text))
+APP.on_startup.append(LOOP_MONITOR.start)
+if isinstance(STORAGE, MongodbStorage):
+    APP.on_startup.append(STORAGE.ensure_indexes)
+APP.on_startup.append(HTTP_CLIENT.start)
+if CLUSTER:
+    APP.on_startup.append(CLUSTER_EVENTS.start)
+    APP.on_startup.append(RATES_LEASE.start)
+APP.on_startup.append(RATE_HISTORY.load)
+if RATE_ALERTS is not None:
+    APP.on_startup.append(RATE_ALERTS.load)
+APP.on_startup.append(REFRESHER.start)
+APP.on_cleanup.append(REFRESHER.stop)
+if BROADCASTS is not None:
+    APP.on_cleanup.append(BROADCASTS.stop)
+APP.on_cleanup.append(RATE_HISTORY.close)
+if RATE_ALERTS is not None:
+    APP.on_cleanup.append(RATE_ALERTS.close)
+if CLUSTER:
+    APP.on_cleanup.append(RATES_LEASE.stop)
+    APP.on_cleanup.append(CLUSTER_EVENTS.stop)
+APP.on_cleanup.append(HTTP_CLIENT.close)
+APP.on_cleanup.append(LOOP_MONITOR.stop)
+if isinstance(STORAGE, MongodbStorage):
+    APP.on_cleanup.append(STORAGE.close)
+
+
+async def _shutdown_parser_executor(_app: web.Application):
+    PARSER_EXECUTOR.shutdown(wait=False)
+
+
+APP.on_cleanup.append(_shutdown_parser_executor)
+
+if CLUSTER:
+    async def _close_cluster_db(_app: web.Application):
+        CLUSTER_DB.client.close()
+
+    # The storage publishes its last changes when it's closed, so the events' connection is closed after it
+    APP.on_cleanup.append(_close_cluster_db)
 
 if __name__ == "__main__":
     try:
-        web.run_app(APP, port=CONFIG.PORT)
+        web.run_app(APP, port=CONFIG.PORT, reuse_port=CONFIG.REUSE_PORT)
     except Exception as error:
         raise error
@@ -5,3 +5,7 @@ class Currency(Enum):
     """Contains all supported currencies for the bot."""
     usd = 'usd'
     rur = 'rur'
+
+
+# Words, by which users mention russian rubles in messages. A clue ending with '*' matches any word starting with it.
+RUR_CLUES = ['₽', 'ru', 'rur', 'rub*', 'rus*', 'ру', 'руб*', 'рус*', 'рос*', 'ռուս*', 'ռուբ*']
@@ -1 +1,2 @@
 from .dram_rate_bot import DramRateBot
+from .turn_admission import TurnAdmission
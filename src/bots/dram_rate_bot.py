@@ -1,16 +1,22 @@
-from botbuilder.core import ActivityHandler, TurnContext, ConversationState, UserState
+from typing import List, Callable, Awaitable, Optional
+
+from botbuilder.core import ActivityHandler, TurnContext, ConversationState, UserState, Storage
 from botbuilder.dialogs import Dialog
+from botbuilder.schema import Activity, ResourceResponse, ConversationReference
 
-from exchange_rates_informers import RateAmParserExchangeRatesInformer
+from bots.turn_admission import TurnAdmission
+from metrics import TRACER
 from utils.helpers import DialogHelper
 
-informer = RateAmParserExchangeRatesInformer()
-
 
 class DramRateBot(ActivityHandler):
     """App's main bot, which will send dram exchange rates to the users."""
 
-    def __init__(self, conversation_state: ConversationState, user_state: UserState, dialog: Dialog) -> None:
+    # Conversation state property, in which the reference to the conversation is saved for the proactive messages
+    CONVERSATION_REFERENCE = 'conversation_reference'
+
+    def __init__(self, conversation_state: ConversationState, user_state: UserState, dialog: Dialog,
+                 admission: TurnAdmission = None) -> None:
         if conversation_state is None:
             raise TypeError(
                 f"[{DramRateBot.__name__}]: Missing parameter. conversation_state is required but None was given."
@@ -27,19 +33,72 @@ class DramRateBot(ActivityHandler):
         self.conversation_state = conversation_state
         self.user_state = user_state
         self.main_dialog = dialog
+        # Serializes the turns of each conversation and coalesces the duplicate messages, if given
+        self.admission = admission
+        self.conversation_reference_accessor = self.conversation_state.create_property(
+            DramRateBot.CONVERSATION_REFERENCE)
 
     async def on_turn(self, turn_context: TurnContext):
+        # The time until the turn starts is spent in authenticating the request and creating the turn context
+        TRACER.mark('auth')
+        turn_context.on_send_activities(DramRateBot.__trace_send_activities)
+
+        if self.admission is not None:
+            await self.admission.run(turn_context, self.__run_turn)
+        else:
+            await self.__run_turn(turn_context)
+
+    async def __run_turn(self, turn_context: TurnContext):
         await super().on_turn(turn_context)
 
-        await self.conversation_state.save_changes(turn_context)
-        await self.user_state.save_changes(turn_context)
+        with TRACER.stage('save_changes'):
+            await self.conversation_state.save_changes(turn_context)
+            await self.user_state.save_changes(turn_context)
 
     async def on_message_activity(self, turn_context: TurnContext):
         if turn_context.activity.text is None:
             return
 
+        await self.__save_conversation_reference(turn_context)
         await DialogHelper.run_dialog(
             self.main_dialog,
             turn_context,
             self.conversation_state.create_property("dialog_state"),
         )
+
+    @staticmethod
+    async def load_conversation_reference(storage: Storage, conversation_key: str) -> Optional[ConversationReference]:
+        """Loads the reference to the given conversation saved by the bot, so a proactive message can be sent to it.
+
+        :param Storage storage: storage of the conversation state
+        :param str conversation_key: storage key of the conversation state
+        :return: the reference, or None if the bot hasn't saved it
+        """
+        state = (await storage.read([conversation_key])).get(conversation_key)
+        return DramRateBot.get_conversation_reference(state)
+
+    @staticmethod
+    def get_conversation_reference(state: object) -> Optional[ConversationReference]:
+        """Returns the reference to the conversation saved by the bot in the given conversation state.
+
+        :param state: the conversation state read from the storage
+        :return: the reference, or None if the bot hasn't saved it
+        """
+        if not isinstance(state, dict) or DramRateBot.CONVERSATION_REFERENCE not in state:
+            return None
+
+        return ConversationReference.deserialize(state[DramRateBot.CONVERSATION_REFERENCE])
+
+    async def __save_conversation_reference(self, turn_context: TurnContext) -> None:
+        """Saves the reference to the turn's conversation in the conversation state. The id of the turn's activity is
+        left out, so the state changes, and is written to the storage, only when the conversation moves."""
+        reference = TurnContext.get_conversation_reference(turn_context.activity)
+        reference.activity_id = None
+        await self.conversation_reference_accessor.set(turn_context, reference.serialize())
+
+    @staticmethod
+    async def __trace_send_activities(_turn_context: TurnContext, _activities: List[Activity],
+                                      send: Callable[[], Awaitable[List[ResourceResponse]]]) -> List[ResourceResponse]:
+        """Measures sending the turn's activities to the channel."""
+        with TRACER.stage('send'):
+            return await send()
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Dict, Tuple, Optional, List, Callable, Awaitable
+
+from botbuilder.core import TurnContext
+from botbuilder.schema import Activity, ActivityTypes, DeliveryModes, ResourceResponse
+
+from metrics import REGISTRY
+
+
+class TurnAdmission:
+    """Admits the turns of the bot: runs the turns of each conversation one at a time, and coalesces the duplicate
+    messages, e.g. when a user taps a keyboard button twice.
+
+    A message with the same text from the same user in the same conversation as a message admitted less than the
+    window ago is a duplicate. It doesn't run a turn: the replies of the first message are served for it if the channel
+    expects them in the response, otherwise it's dropped, since the replies of the first message were already sent to
+    the user. The turns are serialized per conversation only within the process, so the states written by the
+    concurrent turns of a conversation don't overwrite each other.
+    """
+
+    def __init__(self, window: float = 2.0):
+        """Creates the admission.
+
+        :param float window: time in seconds after a message, during which the same message is a duplicate.
+                             The duplicates aren't detected if 0.
+        """
+        if window < 0:
+            raise ValueError(f"[{TurnAdmission.__name__}]: window must not be negative, but {window} was given.")
+
+        self.window = window
+
+        # The recently admitted messages keyed by (conversation, user, text) in the order of their times, with the
+        #   futures of their replies
+        self.__recent: 'OrderedDict[Tuple[str, str, str], Tuple[float, asyncio.Future]]' = OrderedDict()
+        # The lock of each conversation with a running turn, and the number of the turns running or waiting for it
+        self.__locks: Dict[str, List] = {}
+
+        self.__duplicates = REGISTRY.counter('turn_duplicates_total', 'Duplicate messages by how they were handled.',
+                                             ('channel', 'result'))
+        self.__waiting = REGISTRY.gauge('turns_waiting', 'Turns waiting for the previous turns of their conversation.')
+
+    async def run(self, turn_context: TurnContext, turn: Callable[[TurnContext], Awaitable]) -> None:
+        """Runs the turn, after the previous turns of its conversation, unless it's a duplicate.
+
+        :param TurnContext turn_context: context of the turn
+        :param turn: function which runs the turn
+        """
+        activity = turn_context.activity
+        key = self.__get_duplicate_key(activity)
+        replies = None
+        if key is not None:
+            now = time.monotonic()
+            self.__forget_before(now - self.window)
+
+            first = self.__recent.get(key)
+            if first is not None:
+                await self.__serve_duplicate(turn_context, first[1])
+                return
+
+            replies = asyncio.get_event_loop().create_future()
+            self.__recent[key] = (now, replies)
+
+        sent: List[Activity] = []
+        if replies is not None:
+            async def capture_replies(_turn_context: TurnContext, activities: List[Activity],
+                                      send: Callable[[], Awaitable[List[ResourceResponse]]]) -> List[ResourceResponse]:
+                responses = await send()
+                sent.extend(activities)
+                return responses
+
+            turn_context.on_send_activities(capture_replies)
+
+        try:
+            await self.__run_serialized(TurnAdmission.__get_conversation_key(activity), turn, turn_context)
+        finally:
+            # The duplicates of a failed turn get no replies
+            if replies is not None and not replies.done():
+                replies.set_result(sent if turn_context.responded else None)
+
+    async def __run_serialized(self, conversation_key: str, turn: Callable[[TurnContext], Awaitable],
+                               turn_context: TurnContext) -> None:
+        """Runs the turn holding the lock of its conversation, which is removed when no turns use it."""
+        entry = self.__locks.get(conversation_key)
+        if entry is None:
+            entry = self.__locks[conversation_key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+
+        lock: asyncio.Lock = entry[0]
+        waiting = lock.locked()
+        if waiting:
+            self.__waiting.inc()
+        try:
+            async with lock:
+                if waiting:
+                    self.__waiting.dec()
+                    waiting = False
+                await turn(turn_context)
+        finally:
+            if waiting:
+                self.__waiting.dec()
+            entry[1] -= 1
+            if not entry[1]:
+                del self.__locks[conversation_key]
+
+    async def __serve_duplicate(self, turn_context: TurnContext, replies: asyncio.Future) -> None:
+        """Serves the replies of the first message for the duplicate, if the channel expects them in the response."""
+        channel = turn_context.activity.channel_id
+        if turn_context.activity.delivery_mode != DeliveryModes.expect_replies:
+            self.__duplicates.inc(channel=channel, result='dropped')
+            return
+
+        activities: Optional[List[Activity]] = await asyncio.shield(replies)
+        if activities:
+            await turn_context.send_activities([deepcopy(activity) for activity in activities])
+        self.__duplicates.inc(channel=channel, result='served')
+
+    def __forget_before(self, since: float) -> None:
+        """Forgets the messages admitted before the given time. They are ordered by their times."""
+        while self.__recent:
+            key, (time_, _) = next(iter(self.__recent.items()))
+            if time_ >= since:
+                break
+            del self.__recent[key]
+
+    def __get_duplicate_key(self, activity: Activity) -> Optional[Tuple[str, str, str]]:
+        """Returns the key by which the duplicates of the message are detected, or None if it's not checked."""
+        if not self.window or activity.type != ActivityTypes.message or not activity.text:
+            return None
+
+        user_id = activity.from_property.id if activity.from_property is not None else None
+        return TurnAdmission.__get_conversation_key(activity), user_id, activity.text.strip()
+
+    @staticmethod
+    def __get_conversation_key(activity: Activity) -> str:
+        return f"{activity.channel_id}/conversations/{activity.conversation.id if activity.conversation else None}"
@@ -0,0 +1,3 @@
+from .broadcast import Broadcast
+from .mongodb_broadcast_store import MongodbBroadcastStore
+from .broadcast_engine import BroadcastEngine
@@ -0,0 +1,84 @@
+import time
+from typing import Dict, Optional
+
+
+class Broadcast:
+    """A message sent to all conversations of the bot, and the progress of sending it.
+
+    The conversations are visited in the order of their storage keys, so the key of the last conversation of the last
+    completed batch is the checkpoint, after which an interrupted broadcast is resumed.
+    """
+
+    # Kinds of the broadcasts: the digest of the rates of each user's bank, or a notice with the given texts
+    DIGEST = 'digest'
+    NOTICE = 'notice'
+
+    RUNNING = 'running'
+    DONE = 'done'
+    INTERRUPTED = 'interrupted'
+    FAILED = 'failed'
+
+    def __init__(self, id_: str, kind: str, texts: Dict[str, str] = None, status: str = RUNNING, after: str = None,
+                 sent: int = 0, failed: int = 0, skipped: int = 0, elapsed: float = 0, created_at: float = None,
+                 updated_at: float = None):
+        """Creates the broadcast.
+
+        :param str id_: unique id of the broadcast
+        :param str kind: :py:attr:`DIGEST` or :py:attr:`NOTICE`
+        :param texts: texts of the message keyed by the language values. A digest starts with them, if they're given.
+        :param str status: status of the broadcast
+        :param str after: storage key of the last conversation of the last completed batch
+        :param int sent: number of the conversations, to which the message was sent
+        :param int failed: number of the conversations, to which the message couldn't be sent
+        :param int skipped: number of the conversations without a reference or user preferences
+        :param float elapsed: time in seconds spent sending the message
+        :param float created_at: unix time when the broadcast was created
+        :param float updated_at: unix time when the progress was last saved
+        """
+        if kind not in (Broadcast.DIGEST, Broadcast.NOTICE):
+            raise ValueError(f"[{Broadcast.__name__}]: unknown kind {kind}.")
+        if kind == Broadcast.NOTICE and not texts:
+            raise ValueError(f"[{Broadcast.__name__}]: a notice needs the texts.")
+
+        self.id_ = id_
+        self.kind = kind
+        self.texts = texts or {}
+        self.status = status
+        self.after = after
+        self.sent = sent
+        self.failed = failed
+        self.skipped = skipped
+        self.elapsed = elapsed
+        self.created_at = created_at if created_at is not None else time.time()
+        self.updated_at = updated_at if updated_at is not None else self.created_at
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Number of the messages sent or failed per second, or None before the first batch is completed."""
+        if not self.elapsed:
+            return None
+        return (self.sent + self.failed) / self.elapsed
+
+    def to_document(self) -> Dict:
+        """Encodes the broadcast into a plain document, which also has the sending rate."""
+        return {
+            '_id': self.id_,
+            'kind': self.kind,
+            'texts': self.texts,
+            'status': self.status,
+            'after': self.after,
+            'sent': self.sent,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'elapsed': self.elapsed,
+            'rate': self.rate,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
+
+    @staticmethod
+    def from_document(document: Dict) -> 'Broadcast':
+        """Decodes the broadcast from a document created by :py:meth:`to_document`."""
+        return Broadcast(document['_id'], document['kind'], document['texts'], document['status'], document['after'],
+                         document['sent'], document['failed'], document['skipped'], document['elapsed'],
+                         document['created_at'], document['updated_at'])
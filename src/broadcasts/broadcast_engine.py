@@ -0,0 +1,261 @@
+import asyncio
+import sys
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+from botbuilder.core import BotAdapter, TurnContext
+from botbuilder.schema import ConversationReference
+
+from bot_data import Language
+from bot_data.banks import BankId
+from bots import DramRateBot
+from broadcasts.broadcast import Broadcast
+from broadcasts.mongodb_broadcast_store import MongodbBroadcastStore
+from data_models import UserPreferences
+from error_reporting import report_error
+from metrics import REGISTRY
+from msg_recognizers import RecognizedMessage, MessageIntent
+from msg_responders import BaseMsgResponder
+from resources import ResponseMsgs
+from storage import MongodbStorage
+from utils.resilience import TokenBucket
+
+
+class BroadcastEngine:
+    """Sends broadcasts, i.e. a message to all conversations of the bot, e.g. a digest of the rates or a notice.
+
+    The conversation states saved by the bot are streamed from the storage in batches, and the preferences of the
+    users of each batch are read at once. Each variant of the message, i.e. each (language, bank, channel), is
+    rendered only once. The messages are sent with a bounded concurrency, at a rate limited by a token bucket shared
+    by all broadcasts, and the ones throttled by the channel are sent again after the delay it asks for.
+    The progress is saved after each batch, so an interrupted broadcast is resumed from there.
+    """
+
+    # User state property of the user preferences
+    USER_PREFERENCES = 'user_preferences'
+
+    def __init__(self, adapter: BotAdapter, storage: MongodbStorage, store: MongodbBroadcastStore,
+                 digest_responder: BaseMsgResponder, app_id: str = None, rate: float = 20, burst: float = 20,
+                 concurrency: int = 8, batch_size: int = 100, max_retries: int = 3, retry_delay: float = 1):
+        """Creates the engine.
+
+        :param BotAdapter adapter: adapter by which the messages are sent
+        :param MongodbStorage storage: storage of the conversation and user states
+        :param MongodbBroadcastStore store: store of the broadcasts and their progress
+        :param BaseMsgResponder digest_responder: responder which renders the rates of a user's bank for a digest
+        :param str app_id: id of the bot's app, which is required to send proactive messages to the channels
+        :param float rate: maximum number of messages sent per second
+        :param float burst: maximum number of messages sent at once, after a pause
+        :param int concurrency: maximum number of messages being sent at the same time
+        :param int batch_size: number of conversations read from the storage at once, and between the checkpoints
+        :param int max_retries: number of times a throttled message is sent again
+        :param float retry_delay: time in seconds before the first retry, if the channel doesn't tell it. It's doubled
+                                  for each next retry.
+        """
+        self.adapter = adapter
+        self.storage = storage
+        self.store = store
+        self.digest_responder = digest_responder
+        self.app_id = app_id
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self.__bucket = TokenBucket(rate, burst)
+        self.__running: Dict[str, Tuple[Broadcast, asyncio.Task]] = {}
+
+        self.__messages = REGISTRY.counter('broadcast_messages_total', 'Broadcast messages by the sending result.',
+                                           ('kind', 'result'))
+        self.__retries = REGISTRY.counter('broadcast_retries_total', 'Broadcast messages throttled by the channels.')
+        self.__rate_gauge = REGISTRY.gauge('broadcast_messages_per_second',
+                                           'Sending rate of the running broadcasts.', ('broadcast',))
+
+    async def start(self, kind: str = None, texts: Dict[str, str] = None, broadcast_id: str = None) -> Broadcast:
+        """Starts a new broadcast, or resumes an interrupted one, in the background.
+
+        :param str kind: kind of a new broadcast
+        :param texts: texts of a new broadcast keyed by the language values
+        :param str broadcast_id: id of the broadcast to resume
+        :return: the broadcast
+        :raise KeyError: if there is no broadcast with the given id
+        :raise ValueError: if the kind or texts of a new broadcast are invalid
+        """
+        if broadcast_id is None:
+            broadcast = Broadcast(uuid.uuid4().hex, kind, texts)
+            await self.store.save(broadcast)
+        elif broadcast_id in self.__running:
+            return self.__running[broadcast_id][0]
+        else:
+            broadcast = await self.store.load(broadcast_id)
+            if broadcast is None:
+                raise KeyError(f"[{BroadcastEngine.__name__}]: no broadcast with id {broadcast_id}.")
+            if broadcast.status == Broadcast.DONE:
+                return broadcast
+            broadcast.status = Broadcast.RUNNING
+
+        task = asyncio.ensure_future(self.__run(broadcast))
+        self.__running[broadcast.id_] = (broadcast, task)
+        task.add_done_callback(lambda _: self.__running.pop(broadcast.id_, None))
+        return broadcast
+
+    async def get(self, broadcast_id: str) -> Optional[Broadcast]:
+        """Returns the broadcast with the given id with its current progress, or None if there is no such one."""
+        if broadcast_id in self.__running:
+            return self.__running[broadcast_id][0]
+        return await self.store.load(broadcast_id)
+
+    async def stop(self, _app: web.Application = None) -> None:
+        """Interrupts the running broadcasts, so they can be resumed later. Can be used as an aiohttp cleanup hook."""
+        tasks = [task for _, task in self.__running.values()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __run(self, broadcast: Broadcast) -> None:
+        """Sends the broadcast to the conversations after its checkpoint, saving the progress after each batch."""
+        # Messages rendered for each (lang, bank, channel)
+        variants: Dict[Tuple[Language, BankId, str], asyncio.Future] = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        started = time.monotonic()
+        try:
+            async for batch in self.storage.scan(MongodbStorage.CONVERSATION_KEY_MARKER, broadcast.after,
+                                                 self.batch_size):
+                batch_started = time.monotonic()
+
+                # Read the preferences of the batch's users at once, bypassing the cache of the active users' states
+                references = [DramRateBot.get_conversation_reference(state) for _, state in batch]
+                user_keys = [BroadcastEngine.__get_user_key(reference) for reference in references if reference]
+                user_states = await self.storage.read(user_keys, cache=False)
+
+                # The errors of a conversation are counted as its failure, so the other sends aren't left running
+                results = await asyncio.gather(*(
+                    self.__send(broadcast, reference, user_states, variants, semaphore) for reference in references),
+                    return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        report_error(BroadcastEngine.__name__, f"failed to send broadcast {broadcast.id_}", result)
+                results = ['failed' if isinstance(result, Exception) else result for result in results]
+
+                broadcast.after = batch[-1][0]
+                broadcast.sent += results.count('sent')
+                broadcast.failed += results.count('failed')
+                broadcast.skipped += results.count('skipped')
+                broadcast.elapsed += time.monotonic() - batch_started
+                await self.__save(broadcast)
+
+            broadcast.status = Broadcast.DONE
+        except asyncio.CancelledError:
+            broadcast.status = Broadcast.INTERRUPTED
+            raise
+        except Exception as error:
+            broadcast.status = Broadcast.FAILED
+            report_error(BroadcastEngine.__name__, f"broadcast {broadcast.id_} failed", error)
+        finally:
+            await self.__save(broadcast)
+            self.__rate_gauge.set(0, broadcast=broadcast.id_)
+            print(f"\n [{BroadcastEngine.__name__}] broadcast {broadcast.id_} is {broadcast.status}: "
+                  f"{broadcast.sent} sent, {broadcast.failed} failed, {broadcast.skipped} skipped in "
+                  f"{time.monotonic() - started:.1f}s.", file=sys.stderr)
+
+    async def __send(self, broadcast: Broadcast, reference: Optional[ConversationReference], user_states: Dict,
+                     variants: Dict[Tuple, asyncio.Future], semaphore: asyncio.Semaphore) -> str:
+        """Sends the broadcast to the given conversation, retrying when the channel throttles it.
+
+        :return str: 'sent', 'failed' or 'skipped' if the conversation has no reference, its user no preferences, or
+                     the user's bank has no rates for the digest
+        """
+        user_state = user_states.get(BroadcastEngine.__get_user_key(reference)) if reference is not None else None
+        preferences = user_state.get(BroadcastEngine.USER_PREFERENCES) if isinstance(user_state, dict) else None
+        if preferences is None or preferences.lang is None:
+            self.__messages.inc(kind=broadcast.kind, result='skipped')
+            return 'skipped'
+
+        key = (preferences.lang, preferences.bank, reference.channel_id)
+        render = variants.get(key)
+        if render is None:
+            render = variants[key] = asyncio.ensure_future(self.__render(broadcast, *key))
+        try:
+            message = await render
+        except Exception as error:
+            # The bank isn't on the rate.am page now
+            result = 'skipped' if isinstance(error, KeyError) else 'failed'
+
+            # A failed variant is rendered again for the next conversations, e.g. when rate.am is back. The failure
+            #   is reported once, by the conversation which removes it.
+            if variants.get(key) is render:
+                del variants[key]
+                if result == 'failed':
+                    report_error(BroadcastEngine.__name__, f"failed to render broadcast {broadcast.id_}", error)
+
+            self.__messages.inc(kind=broadcast.kind, result=result)
+            return result
+
+        async def send_message(turn_context: TurnContext):
+            await turn_context.send_activity(message)
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.__bucket.acquire()
+                try:
+                    await self.adapter.continue_conversation(reference, send_message, bot_id=self.app_id or None)
+                    self.__messages.inc(kind=broadcast.kind, result='sent')
+                    return 'sent'
+                except Exception as error:
+                    status, retry_after = BroadcastEngine.__get_throttling(error)
+                    if status == 429 and attempt < self.max_retries:
+                        # Slow down all broadcasts, since the channel limits the bot, not the conversation
+                        self.__bucket.pause(retry_after if retry_after is not None else self.retry_delay * 2 ** attempt)
+                        self.__retries.inc()
+                        continue
+
+                    # Users who blocked the bot aren't reported
+                    if status not in (403, 404):
+                        report_error(BroadcastEngine.__name__, f"failed to send broadcast {broadcast.id_}", error)
+                    self.__messages.inc(kind=broadcast.kind, result='failed')
+                    return 'failed'
+
+    async def __render(self, broadcast: Broadcast, lang: Language, bank: BankId, channel: str) -> str:
+        """Renders the variant of the broadcast's message for the given language, bank and channel."""
+        text = broadcast.texts.get(lang.value) or broadcast.texts.get(Language.en.value, '')
+        if broadcast.kind == Broadcast.NOTICE:
+            return text
+
+        rates = await self.digest_responder.create_response(RecognizedMessage(MessageIntent.exchange_rate, 'mybank',
+                                                                              ['']),
+                                                            channel, '', UserPreferences(lang, bank))
+        return f"{text or ResponseMsgs.get('digest', lang)}\n\n{rates}"
+
+    async def __save(self, broadcast: Broadcast) -> None:
+        """Saves the progress of the broadcast, and exposes its sending rate."""
+        broadcast.updated_at = time.time()
+        self.__rate_gauge.set(broadcast.rate or 0, broadcast=broadcast.id_)
+        try:
+            await self.store.save(broadcast)
+        except Exception as error:
+            report_error(BroadcastEngine.__name__, f"failed to save broadcast {broadcast.id_}", error)
+
+    @staticmethod
+    def __get_user_key(reference: ConversationReference) -> str:
+        """Returns the storage key of the user state of the given conversation's user."""
+        return f"{reference.channel_id}/users/{reference.user.id}"
+
+    @staticmethod
+    def __get_throttling(error: Exception) -> Tuple[Optional[int], Optional[float]]:
+        """Returns the HTTP status of the channel's response which caused the error, and the delay in seconds after
+        which the request can be retried, if the channel tells it."""
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+
+        retry_after = None
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            retry_after = float(headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            pass
+
+        return status, retry_after
@@ -0,0 +1,31 @@
+from typing import Optional
+
+import motor.motor_asyncio
+
+from broadcasts.broadcast import Broadcast
+
+
+class MongodbBroadcastStore:
+    """Keeps the broadcasts with their progress checkpoints in MongoDB, so the interrupted ones can be resumed."""
+
+    def __init__(self, db: motor.motor_asyncio.AsyncIOMotorDatabase, collection: str = 'broadcasts'):
+        """Creates the store.
+
+        :param db: db in which the broadcasts collection is
+        :param str collection: name of the collection of the broadcasts
+        """
+        self.db = db
+        self.collection_name = collection
+
+    async def save(self, broadcast: Broadcast) -> None:
+        """Saves the broadcast with its progress."""
+        await self.__collection.replace_one({'_id': broadcast.id_}, broadcast.to_document(), upsert=True)
+
+    async def load(self, broadcast_id: str) -> Optional[Broadcast]:
+        """Loads the broadcast with the given id, or returns None if there is no such broadcast."""
+        document = await self.__collection.find_one({'_id': broadcast_id})
+        return Broadcast.from_document(document) if document is not None else None
+
+    @property
+    def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        return self.db[self.collection_name]
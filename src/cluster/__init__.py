@@ -0,0 +1,2 @@
+from .cluster_events import ClusterEvents
+from .leader_lease import LeaderLease
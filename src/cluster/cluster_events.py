@@ -0,0 +1,140 @@
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import motor.motor_asyncio
+from aiohttp import web
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+from error_reporting import report_error
+from metrics import REGISTRY
+
+
+class ClusterEvents:
+    """Delivers events between the worker processes of the app through a capped MongoDB collection.
+
+    Each worker follows the collection with a tailable cursor, and calls the handlers subscribed to the topic of each
+    event published by the other workers. Events are best-effort: the ones published while a worker isn't following
+    the collection are lost, so the workers are told to drop everything they've learned from the events with
+    a :py:attr:`RESET` event when they start following it again.
+    """
+
+    # Delivered locally when the events published by the other workers might have been missed
+    RESET = 'reset'
+
+    __SUBSCRIBED = 'subscribed'
+
+    def __init__(self, db: motor.motor_asyncio.AsyncIOMotorDatabase, worker_id: str,
+                 collection: str = 'cluster_events', size: int = 1024 * 1024, retry_interval: float = 1):
+        """Creates the events.
+
+        :param db: db in which the events collection is
+        :param str worker_id: unique id of this worker, so it doesn't handle its own events
+        :param str collection: name of the capped collection of the events
+        :param int size: maximum size in bytes of the collection, which is created if it doesn't exist
+        :param float retry_interval: time in seconds after which the collection is followed again, if it fails
+        """
+        self.db = db
+        self.worker_id = worker_id
+        self.collection_name = collection
+        self.size = size
+        self.retry_interval = retry_interval
+
+        self.__handlers: Dict[str, List[Callable[[Dict], None]]] = defaultdict(list)
+        self.__task: Optional[asyncio.Task] = None
+
+        self.__published = REGISTRY.counter(
+            'cluster_events_published_total', 'Events published to the other workers.', ('topic',))
+        self.__received = REGISTRY.counter(
+            'cluster_events_received_total', 'Events received from the other workers.', ('topic',))
+
+    def subscribe(self, topic: str, handler: Callable[[Dict], None]) -> None:
+        """Calls the given handler with the payload of each event of the given topic published by the other workers.
+        Handlers are called on the event loop, so they must not block it.
+
+        :param str topic: topic of the events, or :py:attr:`RESET`
+        :param handler: function which is called with the event payload
+        """
+        self.__handlers[topic].append(handler)
+
+    async def publish(self, topic: str, payload: Dict = None) -> None:
+        """Publishes an event to the other workers. Failures are only reported, since a lost event only delays what
+        the other workers would have done on it.
+
+        :param str topic: topic of the event
+        :param dict payload: data of the event
+        """
+        try:
+            await self.__collection.insert_one({'topic': topic, 'origin': self.worker_id, 'payload': payload or {}})
+            self.__published.inc(topic=topic)
+        except Exception as error:
+            report_error(ClusterEvents.__name__, f"failed to publish a {topic} event", error)
+
+    async def start(self, _app: web.Application = None) -> None:
+        """Starts following the events collection in the background. Can be used as an aiohttp startup hook."""
+        if self.__task is None:
+            self.__task = asyncio.ensure_future(self.__run())
+
+    async def stop(self, _app: web.Application = None) -> None:
+        """Stops following the events collection. Can be used as an aiohttp cleanup hook."""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def __run(self) -> None:
+        """Follows the events collection until cancelled, starting again after failures."""
+        following = False
+        while True:
+            try:
+                await self.__follow(reset=following)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                report_error(ClusterEvents.__name__, "failed to follow the events", error)
+
+            following = True
+            await asyncio.sleep(self.retry_interval)
+
+    async def __follow(self, reset: bool) -> None:
+        """Follows the events collection from now on, until the cursor dies.
+
+        The ids of the events created by different workers aren't ordered, so the cursor reads the collection in its
+        natural (insertion) order from the beginning, and skips the events up to the marker inserted by this worker.
+        """
+        # The collection must be created as capped before anything is inserted into it
+        try:
+            await self.db.create_collection(self.collection_name, capped=True, size=self.size)
+        except CollectionInvalid:
+            pass
+
+        marker = await self.__collection.insert_one(
+            {'topic': ClusterEvents.__SUBSCRIBED, 'origin': self.worker_id, 'payload': {}})
+        if reset:
+            self.__dispatch(ClusterEvents.RESET, {})
+
+        cursor = self.__collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+        skipping = True
+        while cursor.alive:
+            async for event in cursor:
+                if skipping:
+                    skipping = event['_id'] != marker.inserted_id
+                elif event.get('origin') != self.worker_id and event['topic'] != ClusterEvents.__SUBSCRIBED:
+                    self.__received.inc(topic=event['topic'])
+                    self.__dispatch(event['topic'], event.get('payload', {}))
+
+    def __dispatch(self, topic: str, payload: Dict) -> None:
+        """Calls the handlers of the given topic, reporting their errors, so they don't stop the others."""
+        for handler in self.__handlers.get(topic, ()):
+            try:
+                handler(payload)
+            except Exception as error:
+                report_error(ClusterEvents.__name__, f"{topic} handler failed", error)
+
+    @property
+    def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        return self.db[self.collection_name]
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import motor.motor_asyncio
+from aiohttp import web
+from pymongo.errors import DuplicateKeyError
+
+from error_reporting import report_error
+from metrics import REGISTRY
+
+
+class LeaderLease:
+    """Elects a single leader among the worker processes of the app with a lease document in MongoDB.
+
+    The worker which holds the lease renews it in the background, and the other workers try to take it over, so
+    the leadership moves to another worker within the lease TTL when the leader stops. The lease expiration is
+    compared with the workers' clocks, so they should be synchronized.
+    """
+
+    def __init__(self, db: motor.motor_asyncio.AsyncIOMotorDatabase, name: str, worker_id: str, ttl: float = 15,
+                 collection: str = 'cluster_leases'):
+        """Creates the lease.
+
+        :param db: db in which the leases collection is
+        :param str name: name of the lease, i.e. of the work which only the leader does
+        :param str worker_id: unique id of this worker
+        :param float ttl: time in seconds after the last renewal, after which the lease can be taken over. It's
+                          renewed every third of it.
+        :param str collection: name of the collection of the leases
+        """
+        if ttl <= 0:
+            raise ValueError(f"[{LeaderLease.__name__}]: ttl must be positive, but {ttl} was given.")
+
+        self.db = db
+        self.name = name
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.collection_name = collection
+
+        # This worker considers itself the leader until this (monotonic) time, which comes before the lease expires
+        #   in the db, so it stops acting as the leader before another worker can take over
+        self.__leader_until = 0.0
+        self.__task: Optional[asyncio.Task] = None
+
+        self.__leader_gauge = REGISTRY.gauge('cluster_leader', 'Whether this worker holds the lease.', ('lease',))
+        self.__leader_gauge.set(0, lease=name)
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this worker holds the lease."""
+        return time.monotonic() < self.__leader_until
+
+    async def start(self, _app: web.Application = None) -> None:
+        """Starts acquiring and renewing the lease in the background. Can be used as an aiohttp startup hook."""
+        if self.__task is None:
+            await self.renew()
+            self.__task = asyncio.ensure_future(self.__run())
+
+    async def stop(self, _app: web.Application = None) -> None:
+        """Stops renewing the lease and releases it, so another worker can take it over right away.
+        Can be used as an aiohttp cleanup hook."""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+        if self.is_leader:
+            self.__set_leader_until(0.0)
+            try:
+                await self.__collection.delete_one({'_id': self.name, 'owner': self.worker_id})
+            except Exception as error:
+                report_error(LeaderLease.__name__, f"failed to release the {self.name} lease", error)
+
+    async def renew(self) -> bool:
+        """Acquires the lease if it's free or expired, or renews it if this worker holds it.
+
+        :return bool: whether this worker holds the lease
+        """
+        started = time.monotonic()
+        now = datetime.utcnow()
+        try:
+            await self.__collection.find_one_and_update(
+                {'_id': self.name, '$or': [{'owner': self.worker_id}, {'expires_at': {'$lte': now}}]},
+                {'$set': {'owner': self.worker_id, 'expires_at': now + timedelta(seconds=self.ttl)}},
+                upsert=True)
+            self.__set_leader_until(started + self.ttl)
+        except DuplicateKeyError:
+            # Another worker holds the lease, so the filter didn't match, and the upsert conflicted with its document
+            self.__set_leader_until(0.0)
+        except Exception as error:
+            # Keep acting as the leader until the lease would expire, since the other workers can't take it over
+            #   before either
+            report_error(LeaderLease.__name__, f"failed to renew the {self.name} lease", error)
+
+        return self.is_leader
+
+    async def __run(self) -> None:
+        """Renews the lease until cancelled."""
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self.renew()
+
+    def __set_leader_until(self, leader_until: float) -> None:
+        self.__leader_until = leader_until
+        self.__leader_gauge.set(1 if leader_until else 0, lease=self.name)
+
+    @property
+    def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        return self.db[self.collection_name]
@@ -1,17 +1,140 @@
 import os
+import socket
 
 
 class WebAppConfig:
     """ Web App Configuration """
     PORT = os.environ.get("PORT", 3978)
+    # Let several processes listen on the port and the kernel balance the connections between them. Set by the launcher
+    REUSE_PORT = os.environ.get("WEB_REUSE_PORT", "0") == "1"
     SENTRY_DSN = os.environ.get("SENTRY_DSN", '')
+    # Share of the requests sent to Sentry performance monitoring, with the spans of the turns' stages. Off if 0
+    SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get("SENTRY_TRACES_SAMPLE_RATE", 0))
     MONGO_URL = os.environ.get("MONGO_URL", '')
     MONGO_DB = os.environ.get("MONGO_DB", '')
     MONGO_COL = os.environ.get("MONGO_COL", '')
 
 
+class ClusterConfig:
+    """ Multi-Worker Configuration """
+    # Number of worker processes started by src/launcher.py, which accept connections on the same port
+    WORKERS = int(os.environ.get("WEB_WORKERS", 1))
+    # The workers share the rates and tell each other about the changed states through MongoDB. On by default with
+    #   more than one worker, and should be turned on when the app is run by several processes in another way,
+    #   e.g. by gunicorn with aiohttp.GunicornWebWorker, or on several dynos.
+    ENABLED = os.environ.get("CLUSTER_ENABLED", "1" if WORKERS > 1 else "0") == "1"
+    WORKER_ID = os.environ.get("CLUSTER_WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+    # Only the worker holding the lease scrapes rate.am. It's taken over by another worker within this number of
+    #   seconds after the leader stops
+    LEASE_TTL = float(os.environ.get("CLUSTER_LEASE_TTL", 15))
+    EVENTS_COLLECTION = os.environ.get("CLUSTER_EVENTS_COLLECTION", "cluster_events")
+    EVENTS_SIZE = int(os.environ.get("CLUSTER_EVENTS_SIZE", 1024 * 1024))
+    LEASES_COLLECTION = os.environ.get("CLUSTER_LEASES_COLLECTION", "cluster_leases")
+    RATES_COLLECTION = os.environ.get("CLUSTER_RATES_COLLECTION", "rates_snapshots")
+
+
 class BotConfig:
     """ Bot Configuration """
     APP_ID = os.environ.get("MicrosoftAppId", "")
     APP_PASSWORD = os.environ.get("MicrosoftAppPassword", "")
     FB_TOKEN = os.environ.get("FB_TOKEN", "")
+    # Seconds during which the same message from a user is a duplicate, e.g. a double-tapped button. Not checked if 0
+    DUPLICATE_WINDOW = float(os.environ.get("BOT_DUPLICATE_WINDOW", 2))
+    # Whether the turns of each conversation run one at a time and the duplicate messages are coalesced
+    TURN_ADMISSION = os.environ.get("BOT_TURN_ADMISSION", "1") == "1"
+
+
+class InformerConfig:
+    """ Exchange Rates Informer Configuration """
+    # The cache TTL should be longer than the refresh interval (plus jitter), so the refreshed rates never expire
+    #   between two refreshes and users' turns are always served from memory.
+    CACHE_TTL = float(os.environ.get("INFORMER_CACHE_TTL", 60))
+    CACHE_MAX_SIZE = int(os.environ.get("INFORMER_CACHE_MAX_SIZE", 16))
+    REFRESH_INTERVAL = float(os.environ.get("INFORMER_REFRESH_INTERVAL", 30))
+    REFRESH_JITTER = float(os.environ.get("INFORMER_REFRESH_JITTER", 5))
+    # Pages are parsed off the event loop in a 'thread' or 'process' pool
+    PARSER_POOL = os.environ.get("INFORMER_PARSER_POOL", "thread")
+    PARSER_WORKERS = int(os.environ.get("INFORMER_PARSER_WORKERS", 2))
+    # Pages are downloaded only up to the end of the rates table, and parsed incrementally keeping only the table
+    STREAMING_PARSER = os.environ.get("INFORMER_STREAMING_PARSER", "1") == "1"
+    # Expired rates are still served for this number of seconds while they are being revalidated, or rate.am is down
+    STALE_TTL = float(os.environ.get("INFORMER_STALE_TTL", 6 * 60 * 60))
+    # Users are told how old the rates are, if they are older than this number of seconds
+    STALE_NOTICE_AGE = float(os.environ.get("INFORMER_STALE_NOTICE_AGE", 5 * 60))
+    # rate.am isn't requested after this number of consecutive failures, until a probe request succeeds.
+    #   The first probe is sent after the recovery timeout, which is doubled after each failed probe.
+    FAILURE_THRESHOLD = int(os.environ.get("INFORMER_FAILURE_THRESHOLD", 5))
+    RECOVERY_TIMEOUT = float(os.environ.get("INFORMER_RECOVERY_TIMEOUT", 5))
+    MAX_RECOVERY_TIMEOUT = float(os.environ.get("INFORMER_MAX_RECOVERY_TIMEOUT", 300))
+    # The history of the rates is kept for this number of hours, in buckets of this number of seconds
+    HISTORY_HOURS = float(os.environ.get("INFORMER_HISTORY_HOURS", 48))
+    HISTORY_BUCKET = float(os.environ.get("INFORMER_HISTORY_BUCKET", 60 * 60))
+    HISTORY_COLLECTION = os.environ.get("INFORMER_HISTORY_COLLECTION", "rate_history")
+    # Base url of rate.am, can be pointed to a local stand-in, e.g. for load tests
+    RATE_AM_URL = os.environ.get("INFORMER_RATE_AM_URL", "http://rate.am")
+
+
+class AlertsConfig:
+    """ Rate Alerts Configuration """
+    ENABLED = os.environ.get("ALERTS_ENABLED", "1") == "1"
+    MAX_PER_CONVERSATION = int(os.environ.get("ALERTS_MAX_PER_CONVERSATION", 5))
+    COLLECTION = os.environ.get("ALERTS_COLLECTION", "rate_alerts")
+
+
+class BroadcastConfig:
+    """ Broadcasts Configuration """
+    # Bearer token of the broadcasts API, which is disabled if empty
+    TOKEN = os.environ.get("BROADCAST_TOKEN", "")
+    # Messages per second, and the messages sent at once after a pause
+    RATE = float(os.environ.get("BROADCAST_RATE", 20))
+    BURST = float(os.environ.get("BROADCAST_BURST", 20))
+    CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", 8))
+    BATCH_SIZE = int(os.environ.get("BROADCAST_BATCH_SIZE", 100))
+    MAX_RETRIES = int(os.environ.get("BROADCAST_MAX_RETRIES", 3))
+    COLLECTION = os.environ.get("BROADCAST_COLLECTION", "broadcasts")
+
+
+class LoadSheddingConfig:
+    """ Load Shedding Configuration of the messages route """
+    # Maximum number of turns processed at the same time. Unlimited if 0
+    MAX_IN_FLIGHT = int(os.environ.get("LOAD_MAX_IN_FLIGHT", 64))
+    MAX_QUEUE = int(os.environ.get("LOAD_MAX_QUEUE", 256))
+    # Seconds a turn may wait in the queue before it's rejected with 503
+    MAX_WAIT = float(os.environ.get("LOAD_MAX_WAIT", 2))
+    RETRY_AFTER = float(os.environ.get("LOAD_RETRY_AFTER", 1))
+
+
+class HttpClientConfig:
+    """ Shared HTTP Client Configuration """
+    MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+    MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+    TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 10))
+    CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+    HTTP2 = os.environ.get("HTTP_HTTP2", "1") == "1"
+
+
+class MetricsConfig:
+    """ Metrics Configuration """
+    LOOP_MONITOR_INTERVAL = float(os.environ.get("METRICS_LOOP_MONITOR_INTERVAL", 0.5))
+
+
+class StorageConfig:
+    """ Storage Configuration """
+    # 'mongodb', or 'memory' to keep the states in memory, e.g. for local runs and load tests
+    BACKEND = os.environ.get("STORAGE_BACKEND", "mongodb")
+    # In write-behind mode the writes of many concurrent turns are gathered into one bulk write
+    WRITE_BEHIND = os.environ.get("STORAGE_WRITE_BEHIND", "0") == "1"
+    FLUSH_INTERVAL = float(os.environ.get("STORAGE_FLUSH_INTERVAL", 0.05))
+    MAX_BATCH_SIZE = int(os.environ.get("STORAGE_MAX_BATCH_SIZE", 500))
+    # User and conversation states are cached in memory, so the common turn doesn't read them from the db
+    CACHE = os.environ.get("STORAGE_CACHE", "1") == "1"
+    CACHE_TTL = float(os.environ.get("STORAGE_CACHE_TTL", 300))
+    CACHE_MAX_ENTRIES = int(os.environ.get("STORAGE_CACHE_MAX_ENTRIES", 10000))
+    CACHE_MAX_BYTES = int(os.environ.get("STORAGE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    # 'compact/1' or 'jsonpickle'
+    CODEC = os.environ.get("STORAGE_CODEC", "compact/1")
+    # JSON list of index specs, e.g. '[{"keys": [["real_id", 1]], "unique": true}]'. A unique index on the id if empty
+    INDEXES = os.environ.get("STORAGE_INDEXES", "")
+    # Conversation states are deleted after this number of seconds without writes. Never if 0
+    CONVERSATION_TTL = int(os.environ.get("STORAGE_CONVERSATION_TTL", 0))
@@ -1,17 +1,20 @@
-from typing import List
+from typing import List, Optional
 
 from botbuilder.core import UserState, ConversationState, MessageFactory
 from botbuilder.dialogs import (
     ComponentDialog, Dialog, WaterfallDialog, WaterfallStepContext, DialogTurnResult)
 from botbuilder.schema import ActivityTypes
 
+from alerts import RateAlerts
 from data_models import UserPreferences
 from dialogs import UserPreferencesDialog
-from exchange_rates_informers import ExchangeRatesInformer
+from exchange_rates_informers import ExchangeRatesInformer, RateHistory
+from http_client import SharedHttpClient
+from metrics import TRACER
 from msg_responders import BaseMsgResponder, HelpMsgResponder, ChangePrefMsgResponder, ExchangeRateMsgResponder, \
-    ContactMsgResponder, ConvertMsgResponder
+    ContactMsgResponder, ConvertMsgResponder, AlertMsgResponder
 from msg_recognizers import BaseMsgRecognizer, HelpMsgRecognizer, UserPrefMsgRecognizer, ExchangeRateMsgRecognizer, \
-    RecognizedMessage, MessageIntent, ContactMsgRecognizer, ConvertMsgRecognizer
+    RecognizedMessage, ContactMsgRecognizer, ConvertMsgRecognizer, IntentMatcher, AlertMsgRecognizer, MessageIntent
 from resources import ResponseMsgs
 
 
@@ -20,7 +23,11 @@ class MainDialog(ComponentDialog):
     # Nested dialog ids
     WATERFALL_DIALOG_ID = 'waterfall'
 
-    def __init__(self, user_state: UserState, conversation_state: ConversationState, informer: ExchangeRatesInformer):
+    # Intents which are answered without the rates, so their turns are run first under load
+    CHEAP_INTENTS = (MessageIntent.help, MessageIntent.contact, MessageIntent.unknown_intent)
+
+    def __init__(self, user_state: UserState, conversation_state: ConversationState, informer: ExchangeRatesInformer,
+                 http_client: SharedHttpClient, history: RateHistory = None, alerts: RateAlerts = None):
         # Validate input params
         if conversation_state is None:
             raise TypeError(
@@ -37,12 +44,14 @@ class MainDialog(ComponentDialog):
         self.user_preferences_accessor = self.user_state.create_property("user_preferences")
 
         # Setup msg recognizers and responders
-        self.msg_recognizers: List[BaseMsgRecognizer] = self.__create_msg_recognizers()
-        self.msg_responders: List[BaseMsgResponder] = self.__create_msg_responders(informer)
+        self.msg_recognizers: List[BaseMsgRecognizer] = self.__create_msg_recognizers(alerts is not None)
+        self.intent_matcher = IntentMatcher(self.msg_recognizers)
+        self.msg_responders: List[BaseMsgResponder] = self.__create_msg_responders(informer, http_client, history,
+                                                                                   alerts)
 
         # Setup dialogs
         self.user_preferences_dialog_id = 'welcome_user_prefs'
-        self.add_dialog(UserPreferencesDialog(self.user_preferences_dialog_id, user_state))
+        self.add_dialog(UserPreferencesDialog(self.user_preferences_dialog_id, user_state, http_client))
 
         self.add_dialog(
             WaterfallDialog(
@@ -55,6 +64,16 @@ class MainDialog(ComponentDialog):
         )
         self.initial_dialog_id = MainDialog.WATERFALL_DIALOG_ID
 
+    def get_priority(self, message: Optional[str]) -> int:
+        """Returns the priority of the turn of the given message under load, the lower the sooner it's run.
+
+        :param str message: text of the message, or None if the activity isn't a message
+        :return int: 0 for the messages with the cheap intents, 1 for the others
+        """
+        if message is not None and self.intent_matcher.recognize(message).intent in MainDialog.CHEAP_INTENTS:
+            return 0
+        return 1
+
     async def initial_step(
             self, step_context: WaterfallStepContext
     ) -> DialogTurnResult:
@@ -85,12 +104,16 @@ class MainDialog(ComponentDialog):
             return await step_context.begin_dialog(self.user_preferences_dialog_id)
         else:
             # Recognize the message
-            rec_msg = await self.__recognize_message(message)
+            with TRACER.stage('recognize'):
+                rec_msg = await self.__recognize_message(message)
+            TRACER.set_intent(rec_msg.intent.name)
 
             # Find the msg responder which can respond to current message, create a respond and set it to the user.
             for msg_responder in self.msg_responders:
                 if await msg_responder.can_respond(rec_msg, channel):
-                    res = await msg_responder.create_response(rec_msg, channel, message, user_preferences)
+                    with TRACER.stage('render'):
+                        res = await msg_responder.create_response(rec_msg, channel, message, user_preferences,
+                                                                  turn_context=turn_context)
                     if isinstance(res, list) or isinstance(res, tuple):
                         for msg in res:
                             await turn_context.send_activity(msg)
@@ -125,17 +148,23 @@ class MainDialog(ComponentDialog):
         return await step_context.end_dialog()
 
     @staticmethod
-    def __create_msg_recognizers() -> List[BaseMsgRecognizer]:
+    def __create_msg_recognizers(alerts: bool = False) -> List[BaseMsgRecognizer]:
         """Creates and returns message recognizers."""
-        return [HelpMsgRecognizer(), ContactMsgRecognizer(), UserPrefMsgRecognizer(), ExchangeRateMsgRecognizer(),
-                ConvertMsgRecognizer()]
-
-    def __create_msg_responders(self, informer: ExchangeRatesInformer) -> List[BaseMsgResponder]:
+        return [HelpMsgRecognizer(), ContactMsgRecognizer(), UserPrefMsgRecognizer(),
+                # Alert messages contain the exchange rate commands (e.g. 'al') and numbers, so they are recognized
+                #   before the exchange rate and convert messages
+                *([AlertMsgRecognizer()] if alerts else []),
+                ExchangeRateMsgRecognizer(), ConvertMsgRecognizer()]
+
+    def __create_msg_responders(self, informer: ExchangeRatesInformer, http_client: SharedHttpClient,
+                                history: RateHistory = None, alerts: RateAlerts = None) -> List[BaseMsgResponder]:
         """Creates and returns message responders."""
-        return [ChangePrefMsgResponder(self.conversation_state, self.user_state),
+        return [ChangePrefMsgResponder(self.conversation_state, self.user_state, http_client),
                 ContactMsgResponder(self.conversation_state, self.user_state),
-                ExchangeRateMsgResponder(self.conversation_state, self.user_state, informer),
+                ExchangeRateMsgResponder(self.conversation_state, self.user_state, informer, history),
                 ConvertMsgResponder(self.conversation_state, self.user_state, informer),
+                *([AlertMsgResponder(self.conversation_state, self.user_state, informer, alerts)]
+                  if alerts is not None else []),
                 # HelpMsgResponder is the default responder, so if no responder responds to a message,
                 #   this one will do.
                 HelpMsgResponder(self.conversation_state, self.user_state), ]
@@ -147,12 +176,7 @@ class MainDialog(ComponentDialog):
         :return RecognizedMessage: recognized message with intent and action attributes,
                     or instance of RecognizedMessage with the unrecognized intent.
         """
-        # Try to recognize the message
-        for recognizer in self.msg_recognizers:
-            rec_message = recognizer.recognize(message)
-            if rec_message is not None:
-                return rec_message
-
-        # If none of the recognizers managed to recognize the message, then return
+        # Try to recognize the message with all recognizers in one pass.
+        # If none of the recognizers managed to recognize the message, then the matcher returns
         #   an instance of RecognizedMessage with unrecognized intent.
-        return RecognizedMessage(MessageIntent.unknown_intent)
+        return self.intent_matcher.recognize(message)
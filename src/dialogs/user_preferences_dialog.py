@@ -1,6 +1,5 @@
 from typing import Dict
 
-import httpx
 from botbuilder.core import MessageFactory, UserState
 from botbuilder.dialogs import (
     ComponentDialog,
@@ -18,6 +17,7 @@ from bot_data import banks
 from bot_data.language import Language
 from config import BotConfig
 from data_models import UserPreferences
+from http_client import SharedHttpClient
 from resources import ResponseMsgs
 
 
@@ -30,9 +30,10 @@ class UserPreferencesDialog(ComponentDialog):
 
     FB_USER_SETTINGS_URL = 'https://graph.facebook.com/v5.0/me/custom_user_settings'
 
-    def __init__(self, dialog_id: str, user_state: UserState):
+    def __init__(self, dialog_id: str, user_state: UserState, http_client: SharedHttpClient):
         super(UserPreferencesDialog, self).__init__(dialog_id)
 
+        self.http_client = http_client
         self.user_preferences_accessor = user_state.create_property("user_preferences")
 
         # Setup dialogs
@@ -135,8 +136,7 @@ class UserPreferencesDialog(ComponentDialog):
         if step_context.context.activity.channel_id == 'facebook':
             # noinspection PyBroadException
             try:
-                await UserPreferencesDialog.__make_fb_keyboard(step_context.context.activity.from_property.id,
-                                                               chosen_lang)
+                await self.__make_fb_keyboard(step_context.context.activity.from_property.id, chosen_lang)
             except Exception:
                 pass
 
@@ -165,26 +165,24 @@ class UserPreferencesDialog(ComponentDialog):
             }
         }
 
-    @staticmethod
-    async def __make_fb_keyboard(psid: int, lang: Language):
+    async def __make_fb_keyboard(self, psid: int, lang: Language):
         """Makes an http request to FB API to make a persistent menu appear for the given user."""
         all_usd = ResponseMsgs.get('all_usd', lang)
         all_rur = ResponseMsgs.get('all_rur', lang)
         my_bank = ResponseMsgs.get('my_bank', lang)
 
-        async with httpx.AsyncClient() as client:
-            await client.post(UserPreferencesDialog.FB_USER_SETTINGS_URL, params={
-                "access_token": BotConfig.FB_TOKEN
-            }, json={
-                "psid": psid,
-                "persistent_menu": [
-                    {
-                        "locale": "default",
-                        "call_to_actions": [
-                            {"type": "postback", "title": all_usd, "payload": all_usd},
-                            {"type": "postback", "title": all_rur, "payload": all_rur},
-                            {"type": "postback", "title": my_bank, "payload": my_bank},
-                        ]
-                    }
-                ]
-            })
+        await self.http_client.client.post(UserPreferencesDialog.FB_USER_SETTINGS_URL, params={
+            "access_token": BotConfig.FB_TOKEN
+        }, json={
+            "psid": psid,
+            "persistent_menu": [
+                {
+                    "locale": "default",
+                    "call_to_actions": [
+                        {"type": "postback", "title": all_usd, "payload": all_usd},
+                        {"type": "postback", "title": all_rur, "payload": all_rur},
+                        {"type": "postback", "title": my_bank, "payload": my_bank},
+                    ]
+                }
+            ]
+        })
@@ -0,0 +1,14 @@
+import sys
+
+from sentry_sdk import capture_exception
+
+
+def report_error(source: str, message: str, error: Exception) -> None:
+    """Reports an error which is handled without failing, e.g. of a background task: sends it to sentry and logs it.
+
+    :param str source: name of the class which handled the error
+    :param str message: what has failed
+    :param Exception error: the error
+    """
+    capture_exception(error)
+    print(f"\n [{source}] {message}: {error!r}", file=sys.stderr)
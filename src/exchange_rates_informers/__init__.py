@@ -1,5 +1,13 @@
+from .rate import Rate
 from .bank import Bank
 from .exchange_rate import ExchangeRate
+from .rates_snapshot import RatesSnapshot
+from .rate_matrix import RateMatrix
 from .exchange_rates_informer import ExchangeRatesInformer
 from exchange_rates_informers.rate_am_parser.rate_am_parser_exchange_rates_informer import \
     RateAmParserExchangeRatesInformer
+from .rates_refresher import RatesRefresher
+from .mongodb_rates_snapshot_store import MongodbRatesSnapshotStore
+from .shared_exchange_rates_informer import SharedExchangeRatesInformer
+from .rate_history import RateHistory, RateStats, RatesBucket
+from .mongodb_rate_history_store import MongodbRateHistoryStore
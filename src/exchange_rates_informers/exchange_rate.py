@@ -1,7 +1,10 @@
-class ExchangeRate:
-    """Represents AMD exchange rate for both buy and sell types."""
+from typing import NamedTuple
+
+from .rate import Rate
 
-    def __init__(self, cur: str, buy: str = None, sell: str = None):
-        self.cur = cur
-        self.buy = buy
-        self.sell = sell
+
+class ExchangeRate(NamedTuple):
+    """Represents AMD exchange rate for both buy and sell types."""
+    cur: str
+    buy: Rate = Rate.EMPTY
+    sell: Rate = Rate.EMPTY
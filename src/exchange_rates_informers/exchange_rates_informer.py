@@ -1,13 +1,34 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from typing import List, Tuple, Callable
+
 
 from bot_data import Language, Currency
-from exchange_rates_informers import Bank
+from error_reporting import report_error
+from exchange_rates_informers import Bank, RatesSnapshot
 
 
 class ExchangeRatesInformer(ABC):
     """Defines methods which need to be implemented in exchange rates informer classes to get ADM exchange rates."""
 
+    def __init__(self):
+        self.__listeners: List[Callable[[Language, bool, RatesSnapshot], None]] = []
+
+    def add_listener(self, listener: Callable[[Language, bool, RatesSnapshot], None]) -> None:
+        """Calls the given listener with each new snapshot got by the informer, i.e. whenever the rates change.
+        Listeners are called on the event loop, so they must not block it.
+
+        :param listener: function which is called with the language, the non_cash flag and the snapshot
+        """
+        self.__listeners.append(listener)
+
+    def _notify_listeners(self, lang: Language, non_cash: bool, snapshot: RatesSnapshot) -> None:
+        """Calls the listeners with the new snapshot. A failing listener is reported, and doesn't stop the others."""
+        for listener in self.__listeners:
+            try:
+                listener(lang, non_cash, snapshot)
+            except Exception as error:
+                report_error(type(self).__name__, "rates listener failed", error)
+
     @abstractmethod
     async def get_banks(self, lang: Language) -> List[str]:
         """Gets all banks.
@@ -30,3 +51,25 @@ class ExchangeRatesInformer(ABC):
     async def get_bank_rates(self, bank_id: str, lang: Language, non_cash: bool = True) -> Bank:
         """Gets AMD exchange rates set by the given bank."""
         pass
+
+    @abstractmethod
+    async def get_snapshot(self, lang: Language, non_cash: bool = True) -> RatesSnapshot:
+        """Gets the current snapshot of AMD exchange rates set by all banks.
+
+        A new snapshot, with a new version, is returned only when the rates are updated, so the responses built from
+        a snapshot can be reused until its version changes.
+
+        :param Language lang: The language in which banks names should be
+        :param bool non_cash: get exchange rates for non_cash or cash types
+        """
+        pass
+
+    async def refresh(self, lang: Language, non_cash: bool = True) -> None:
+        """Refreshes the rates kept in memory by the informer, so the next requests don't wait for them.
+
+        Informers which don't keep rates in memory don't need to override this method.
+
+        :param Language lang: The language in which banks names should be
+        :param bool non_cash: refresh exchange rates for non_cash or cash types
+        """
+        pass
@@ -0,0 +1,93 @@
+import sys
+from array import array
+from typing import Dict, List
+
+import motor.motor_asyncio
+import pymongo
+from bson import Binary
+
+from exchange_rates_informers.rate_history import RatesBucket
+
+
+class MongodbRateHistoryStore:
+    """Keeps the time buckets of the rate history in MongoDB, one document per bucket of each (cash/non-cash) type.
+
+    The times and the banks' columns of rates are stored as little-endian binary arrays, so a bucket is saved and
+    loaded without converting each rate.
+    """
+
+    def __init__(self, db: motor.motor_asyncio.AsyncIOMotorDatabase, collection: str = 'rate_history'):
+        """Creates the store.
+
+        :param db: db in which the history collection is
+        :param str collection: name of the collection of the buckets
+        """
+        self.db = db
+        self.collection_name = collection
+
+    async def ensure_indexes(self) -> None:
+        """Creates the index by which the buckets are loaded, if it doesn't exist."""
+        await self.__collection.create_index([('type', pymongo.ASCENDING), ('start', pymongo.ASCENDING)],
+                                             unique=True)
+
+    async def save(self, non_cash: bool, bucket: RatesBucket) -> None:
+        """Saves the bucket, replacing its stored state.
+
+        :param bool non_cash: whether the bucket has non-cash or cash rates
+        :param RatesBucket bucket: the bucket
+        """
+        document = MongodbRateHistoryStore.__encode(non_cash, bucket)
+        await self.__collection.replace_one({'type': document['type'], 'start': bucket.start}, document, upsert=True)
+
+    async def load(self, non_cash: bool, since: float) -> List[RatesBucket]:
+        """Loads the buckets of the given type which have records after the given time.
+
+        :param bool non_cash: whether to load the non-cash or the cash buckets
+        :param float since: unix time after which the records are needed
+        :return: the buckets ordered by their start
+        """
+        cursor = self.__collection.find({'type': MongodbRateHistoryStore.__get_type(non_cash),
+                                         'end': {'$gt': since}}).sort('start', pymongo.ASCENDING)
+        return [MongodbRateHistoryStore.__decode(document) async for document in cursor]
+
+    @staticmethod
+    def __encode(non_cash: bool, bucket: RatesBucket) -> Dict:
+        return {
+            'type': MongodbRateHistoryStore.__get_type(non_cash),
+            'start': bucket.start,
+            'end': bucket.times[-1] if bucket.times else bucket.start,
+            'times': Binary(MongodbRateHistoryStore.__to_bytes(bucket.times)),
+            'banks': {bank_id: Binary(MongodbRateHistoryStore.__to_bytes(column))
+                      for bank_id, column in bucket.columns.items()},
+        }
+
+    @staticmethod
+    def __decode(document: Dict) -> RatesBucket:
+        return RatesBucket(document['start'], MongodbRateHistoryStore.__from_bytes('d', document['times']),
+                           {bank_id: MongodbRateHistoryStore.__from_bytes('q', column)
+                            for bank_id, column in document['banks'].items()})
+
+    @staticmethod
+    def __to_bytes(values: array) -> bytes:
+        if sys.byteorder == 'little':
+            return values.tobytes()
+
+        values = array(values.typecode, values)
+        values.byteswap()
+        return values.tobytes()
+
+    @staticmethod
+    def __from_bytes(typecode: str, data: bytes) -> array:
+        values = array(typecode)
+        values.frombytes(data)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    @staticmethod
+    def __get_type(non_cash: bool) -> str:
+        return 'non_cash' if non_cash else 'cash'
+
+    @property
+    def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        return self.db[self.collection_name]
@@ -0,0 +1,101 @@
+from typing import Dict, Optional, Tuple
+
+import motor.motor_asyncio
+
+from bot_data import Language, Currency
+from exchange_rates_informers.bank import Bank
+from exchange_rates_informers.exchange_rate import ExchangeRate
+from exchange_rates_informers.rate import Rate
+from exchange_rates_informers.rates_snapshot import RatesSnapshot
+
+
+class MongodbRatesSnapshotStore:
+    """Keeps the latest rates snapshot of each (language x cash/non-cash) page in MongoDB, so it can be shared by
+    the worker processes of the app.
+
+    Each stored snapshot has a revision, which changes only when the rates change, so the workers decode a snapshot
+    only once per revision, and keep the version of their decoded snapshot while its revision is the same.
+    """
+
+    def __init__(self, db: motor.motor_asyncio.AsyncIOMotorDatabase, collection: str = 'rates_snapshots'):
+        """Creates the store.
+
+        :param db: db in which the snapshots collection is
+        :param str collection: name of the collection of the snapshots
+        """
+        self.db = db
+        self.collection_name = collection
+
+    async def save(self, lang: Language, non_cash: bool, revision: str, snapshot: RatesSnapshot) -> None:
+        """Saves the snapshot of the given page, replacing the stored one.
+
+        :param Language lang: language of the page
+        :param bool non_cash: whether it's the non-cash or the cash page
+        :param str revision: unique revision of the snapshot's rates
+        :param RatesSnapshot snapshot: the snapshot
+        """
+        document = MongodbRatesSnapshotStore.__encode(snapshot)
+        document['revision'] = revision
+        await self.__collection.replace_one({'_id': MongodbRatesSnapshotStore.__get_id(lang, non_cash)}, document,
+                                            upsert=True)
+
+    async def touch(self, lang: Language, non_cash: bool, revision: str, created_at: float) -> None:
+        """Updates the time when the stored rates were got, if they are still of the given revision.
+
+        :param Language lang: language of the page
+        :param bool non_cash: whether it's the non-cash or the cash page
+        :param str revision: revision of the rates which were got again
+        :param float created_at: unix time when the rates were got again
+        """
+        await self.__collection.update_one(
+            {'_id': MongodbRatesSnapshotStore.__get_id(lang, non_cash), 'revision': revision},
+            {'$set': {'created_at': created_at}})
+
+    async def load(self, lang: Language, non_cash: bool,
+                   known: Tuple[str, RatesSnapshot] = None) -> Optional[Tuple[str, RatesSnapshot]]:
+        """Loads the stored snapshot of the given page.
+
+        :param Language lang: language of the page
+        :param bool non_cash: whether it's the non-cash or the cash page
+        :param known: the (revision, snapshot) loaded before. If the stored revision is the same, the known snapshot
+                      is revalidated instead of decoding the stored one.
+        :return: the (revision, snapshot), or None if no snapshot has been stored
+        """
+        document = await self.__collection.find_one({'_id': MongodbRatesSnapshotStore.__get_id(lang, non_cash)})
+        if document is None:
+            return None
+
+        revision = document['revision']
+        if known is not None and known[0] == revision:
+            return revision, known[1].revalidated(document['created_at'])
+
+        return revision, MongodbRatesSnapshotStore.__decode(document)
+
+    @staticmethod
+    def __encode(snapshot: RatesSnapshot) -> Dict:
+        """Encodes the snapshot's source data. The rates are kept as their texts, which they are parsed from."""
+        return {
+            'created_at': snapshot.created_at,
+            'banks': [[bank.id_, bank.name, bank.update_time,
+                       [[rate.cur, str(rate.buy), str(rate.sell)] for rate in bank.rates]]
+                      for bank in snapshot.banks],
+            'best': {curr.value: [str(rate) for rate in snapshot.get_best(curr)] for curr in Currency},
+        }
+
+    @staticmethod
+    def __decode(document: Dict) -> RatesSnapshot:
+        banks = [Bank(id_, name, update_time,
+                      tuple(ExchangeRate(cur, Rate.parse(buy), Rate.parse(sell)) for cur, buy, sell in rates))
+                 for id_, name, update_time, rates in document['banks']]
+        best = {Currency(curr): (Rate.parse(buy), Rate.parse(sell))
+                for curr, (buy, sell) in document['best'].items()}
+
+        return RatesSnapshot(banks, best, document['created_at'])
+
+    @staticmethod
+    def __get_id(lang: Language, non_cash: bool) -> str:
+        return f"{lang.value}/{'non_cash' if non_cash else 'cash'}"
+
+    @property
+    def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
+        return self.db[self.collection_name]
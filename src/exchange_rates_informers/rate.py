@@ -0,0 +1,85 @@
+from decimal import Decimal
+from functools import lru_cache
+
+
+class Rate:
+    """An immutable AMD exchange rate value, which keeps both the amount in minor units and the display text."""
+
+    __slots__ = ('__minor_units', '__text')
+
+    def __init__(self, minor_units: int = 0, text: str = ''):
+        """Creates the rate. Use :py:meth:`parse` to create a rate from a text.
+
+        :param int minor_units: the rate in 1/100 of AMD, 0 if there is no rate
+        :param str text: the rate as it should be displayed to users
+        """
+        object.__setattr__(self, '_Rate__minor_units', minor_units)
+        object.__setattr__(self, '_Rate__text', text)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse(text: str) -> 'Rate':
+        """Parses the given rate text, so it always has a fractional part. Returns an empty rate for a missing or
+        invalid text.
+
+        The same texts are repeated across banks and pages, so the parsed rates are cached and shared.
+        """
+        text = text.strip() if text else ''
+        if not text:
+            return Rate.EMPTY
+
+        try:
+            value = Decimal(text)
+            # NaN and infinity can't be converted to minor units
+            if not value.is_finite():
+                return Rate.EMPTY
+            minor_units = int(value.scaleb(2).to_integral_value())
+        except ArithmeticError:
+            return Rate.EMPTY
+
+        if '.' not in text:
+            text = f"{text}.00"
+        return Rate(minor_units, text)
+
+    @property
+    def minor_units(self) -> int:
+        """The rate in 1/100 of AMD, 0 if there is no rate."""
+        return self.__minor_units
+
+    @property
+    def value(self) -> Decimal:
+        """The exact rate."""
+        return Decimal(self.__minor_units).scaleb(-2)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"[{Rate.__name__}]: rates are immutable.")
+
+    def __reduce__(self):
+        return Rate, (self.__minor_units, self.__text)
+
+    def __bool__(self) -> bool:
+        return self.__minor_units != 0
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Rate):
+            return self.__minor_units == other.__minor_units
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.__minor_units)
+
+    def __float__(self) -> float:
+        return self.__minor_units / 100
+
+    def __str__(self) -> str:
+        return self.__text
+
+    def __format__(self, format_spec: str) -> str:
+        return format(self.__text, format_spec)
+
+    def __repr__(self) -> str:
+        return f"{Rate.__name__}({self.__text!r})"
+
+
+# A missing rate
+Rate.EMPTY = Rate()
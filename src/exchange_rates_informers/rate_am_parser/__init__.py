@@ -1 +1,3 @@
+from .rate_am_page_parser import RateAmPageParser
 from .rate_am_parser_exchange_rates_informer import RateAmParserExchangeRatesInformer
+from .rates_table_scanner import RatesTableScanner
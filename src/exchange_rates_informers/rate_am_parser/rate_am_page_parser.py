@@ -0,0 +1,148 @@
+import hashlib
+import re
+from typing import Tuple, List, Iterator
+
+from lxml import html, etree
+
+from bot_data import Currency
+from exchange_rates_informers.bank import Bank
+from exchange_rates_informers.exchange_rate import ExchangeRate
+from exchange_rates_informers.rate import Rate
+from exchange_rates_informers.rate_am_parser.rates_table_scanner import RatesTableScanner
+from exchange_rates_informers.rates_snapshot import RatesSnapshot
+
+
+class RateAmPageParser:
+    """Parses a rate.am page into a snapshot of all banks' rates for all supported currencies."""
+
+    # Index of the buy cell of each currency in a bank row. The sell cell comes right after the buy one.
+    #   In the best rates rows the cells of each currency are shifted left by 4.
+    __CURRENCY_COLUMNS = {
+        Currency.usd: 5,
+        Currency.rur: 9,
+    }
+    __BEST_ROWS_SHIFT = 4
+
+    # Size of the chunks in which a page is fed to the incremental parser
+    __CHUNK_SIZE = 16 * 1024
+
+    __RATES_TABLE_START = re.compile(r'<table\b[^>]*\bid=["\']?rb\b[^>]*>', re.IGNORECASE)
+
+    @staticmethod
+    def parse(page_source: str) -> RatesSnapshot:
+        """Parses the given rate.am page source.
+
+        :param str page_source: html source of a rate.am page
+        :return RatesSnapshot:
+        """
+        parsed_source = html.fromstring(page_source)
+        banks_trs = parsed_source.xpath('//*[@id="rb"]/tr')
+
+        return RatesSnapshot(RateAmPageParser.__parse_banks(banks_trs), RateAmPageParser.__parse_best(banks_trs))
+
+    @staticmethod
+    def parse_streaming(page_source: str) -> RatesSnapshot:
+        """Parses the given rate.am page source like :py:meth:`parse`, but incrementally and only the rates table.
+
+        The page before the table is skipped without being parsed, and the table is fed to an incremental parser
+        chunk by chunk until it's closed, so the rest of the page isn't parsed either, and only the table is kept
+        in memory.
+
+        :param str page_source: html source of a rate.am page
+        :return RatesSnapshot:
+        """
+        match = RateAmPageParser.__RATES_TABLE_START.search(page_source)
+
+        table = None
+        if match is not None:
+            for element in RateAmPageParser.__iter_closed_tables(page_source, match.start()):
+                if element.get('id') == 'rb':
+                    table = element
+                    break
+
+        banks_trs = table.findall('tr') if table is not None else []
+        return RatesSnapshot(RateAmPageParser.__parse_banks(banks_trs), RateAmPageParser.__parse_best(banks_trs))
+
+    @staticmethod
+    def get_rates_digest(page_source: str) -> str:
+        """Returns a digest of the rates table of the given page, which is cheap compared to parsing the page.
+        Pages with the same digest have the same rates, even if the rest of their content differs.
+
+        :param str page_source: html source of a rate.am page
+        :return str:
+        """
+        table = RatesTableScanner.find_table(page_source)
+        if table is None:
+            table = page_source
+
+        return hashlib.blake2b(table.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def __iter_closed_tables(page_source: str, start: int) -> Iterator[etree.ElementBase]:
+        """Feeds the page from the given position to an incremental parser chunk by chunk, and yields the tables as
+        soon as they are closed. Stopping the iteration stops the parsing."""
+        parser = etree.HTMLPullParser(events=('end',), tag='table')
+        for offset in range(start, len(page_source), RateAmPageParser.__CHUNK_SIZE):
+            parser.feed(page_source[offset:offset + RateAmPageParser.__CHUNK_SIZE])
+            for _, element in parser.read_events():
+                yield element
+
+        parser.close()
+        for _, element in parser.read_events():
+            yield element
+
+    @staticmethod
+    def __parse_banks(banks_trs: List[html.HtmlElement]) -> List[Bank]:
+        """Parses the banks rows of the rates table."""
+        rate_am_banks = []
+
+        # skip non-bank trs
+        for bank_tr in banks_trs[2:-5]:
+            try:
+                bank_tds = bank_tr.xpath('./td')
+
+                id_ = bank_tr.attrib['id']
+                name = bank_tds[1].xpath('a[1]')[0].text
+                update_time = bank_tds[4].text
+            except (IndexError, KeyError):
+                continue
+
+            rates = tuple(
+                ExchangeRate(curr.value, RateAmPageParser.__get_cell_rate(bank_tds, column),
+                             RateAmPageParser.__get_cell_rate(bank_tds, column + 1))
+                for curr, column in RateAmPageParser.__columns())
+
+            rate_am_banks.append(Bank(id_, name, update_time, rates))
+
+        return rate_am_banks
+
+    @staticmethod
+    def __parse_best(banks_trs: List[html.HtmlElement]) -> dict:
+        """Parses the best rates rows of the rates table: the maximum buy and the minimum sell rates."""
+        best = {}
+        for curr, column in RateAmPageParser.__columns():
+            # noinspection PyBroadException
+            try:
+                maximum = banks_trs[-3].xpath('./td')[column - RateAmPageParser.__BEST_ROWS_SHIFT].text
+                minimum = banks_trs[-4].xpath('./td')[column + 1 - RateAmPageParser.__BEST_ROWS_SHIFT].text
+                best[curr] = Rate.parse(maximum), Rate.parse(minimum)
+            except Exception:
+                best[curr] = (Rate.EMPTY, Rate.EMPTY)
+
+        return best
+
+    @staticmethod
+    def __columns() -> List[Tuple[Currency, int]]:
+        """Returns the buy cell index of each supported currency in the order of :py:class:`Currency`."""
+        return [(curr, RateAmPageParser.__CURRENCY_COLUMNS[curr]) for curr in Currency]
+
+    @staticmethod
+    def __get_cell_rate(tds: List[html.HtmlElement], index: int) -> Rate:
+        """Returns the rate from the given cell, or an empty rate if there is no rate."""
+        try:
+            td = tds[index]
+            text = td.text if td.text is not None else td.xpath('./*[1]')[0].text
+        except IndexError:
+            return Rate.EMPTY
+
+        return Rate.parse(text)
@@ -1,139 +1,205 @@
-from typing import List, Tuple
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import List, Tuple, Dict, NamedTuple, Optional
 
 import httpx
-from lxml import html
 
-from exchange_rates_informers import ExchangeRate
+from config import InformerConfig
+from error_reporting import report_error
 from exchange_rates_informers.exchange_rates_informer import ExchangeRatesInformer
 from exchange_rates_informers.bank import Bank
+from exchange_rates_informers.rates_snapshot import RatesSnapshot
+from exchange_rates_informers.rate_am_parser.rate_am_page_parser import RateAmPageParser
+from exchange_rates_informers.rate_am_parser.rates_table_scanner import RatesTableScanner
 from bot_data import Language, Currency
+from http_client import SharedHttpClient
+from metrics import TRACER, REGISTRY
+from utils.caching import AsyncLoadingCache, TTLCache
+from utils.resilience import CircuitBreaker, CircuitOpenError
+
+
+class _Page(NamedTuple):
+    """The last downloaded rate.am page: its validators for conditional requests and the snapshot parsed from it."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    snapshot: RatesSnapshot
 
 
 class RateAmParserExchangeRatesInformer(ExchangeRatesInformer):
     """Informs AMD exchange rates by parsing the rate.am web page."""
 
-    __URL = 'http://rate.am/{}/armenian-dram-exchange-rates/banks/{}'
+    __URL = '{}/{}/armenian-dram-exchange-rates/banks/{}'
+
+    def __init__(self, http_client: SharedHttpClient, cache_ttl: float = InformerConfig.CACHE_TTL,
+                 cache_max_size: int = InformerConfig.CACHE_MAX_SIZE, parser_executor: Executor = None,
+                 base_url: str = InformerConfig.RATE_AM_URL, stale_ttl: float = InformerConfig.STALE_TTL,
+                 circuit_breaker: CircuitBreaker = None, streaming_parser: bool = InformerConfig.STREAMING_PARSER):
+        """Creates the informer.
+
+        :param SharedHttpClient http_client: app's shared http client used to download pages
+        :param float cache_ttl: time in seconds during which a page snapshot is reused instead of being downloaded again
+        :param int cache_max_size: maximum number of page snapshots kept in the cache
+        :param Executor parser_executor: thread or process pool in which pages are parsed, so parsing doesn't block
+                                         the event loop. The loop's default executor is used if None.
+        :param str base_url: base url of rate.am
+        :param float stale_ttl: time in seconds after the cache TTL, during which the last snapshot is still served
+                                while a new one is being downloaded, or rate.am is unavailable
+        :param CircuitBreaker circuit_breaker: circuit breaker which protects rate.am from the requests while it's
+                                               failing. A circuit breaker with the default settings is used if None.
+        :param bool streaming_parser: download pages only up to the end of the rates table, and parse them
+                                      incrementally keeping only the table, instead of building the whole page tree
+        """
+        super(RateAmParserExchangeRatesInformer, self).__init__()
+
+        self.http_client = http_client
+        self.parser_executor = parser_executor
+        self.base_url = base_url.rstrip('/')
+        self.streaming_parser = streaming_parser
+
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker('rate_am')
+
+        # The last downloaded pages keyed by url, so the next download of a page can be conditional, and an unchanged
+        #   page doesn't have to be parsed again.
+        self.__pages: Dict[str, _Page] = {}
+
+        # Snapshots of parsed pages keyed by (lang, non_cash). Concurrent misses for the same page are collapsed into
+        #   a single download, so a burst of requests doesn't turn into a burst of scrapes. Expired snapshots are
+        #   served while they are being revalidated, so users don't wait for rate.am, even when it's down.
+        self.__snapshots = AsyncLoadingCache(self.__load_snapshot, cache_ttl, cache_max_size, stale_ttl,
+                                             RateAmParserExchangeRatesInformer.__report_revalidation_error)
+
+        self.__fetch_seconds = REGISTRY.histogram(
+            'rate_am_fetch_seconds', 'Duration of the rate.am page downloads.', ('lang', 'type'))
+        self.__fetch_failures = REGISTRY.counter(
+            'rate_am_fetch_failures_total', 'Failed rate.am page downloads.', ('lang', 'type'))
+        self.__parse_seconds = REGISTRY.histogram(
+            'rate_am_parse_seconds', 'Duration of parsing the rate.am pages, including waiting for the executor.',
+            ('lang', 'type'))
+        self.__unchanged = REGISTRY.counter(
+            'rate_am_unchanged_total', 'rate.am page downloads which reused the last snapshot: not_modified - the '
+                                       'page was not modified, same_rates - the page has the same rates table.',
+            ('lang', 'type', 'reason'))
+
+    @property
+    def cache(self) -> TTLCache:
+        """The cache of the page snapshots."""
+        return self.__snapshots.entries
 
     async def get_banks(self, lang: Language) -> List[str]:
-        page_source = await self.__get_page_source(lang)
-
-        parsed_source = html.fromstring(page_source)
-        banks_tds = parsed_source.xpath('//td[@class="bank"]/a')
-        banks_names = [bank_td.text for bank_td in banks_tds]
-
-        return banks_names
+        snapshot = await self.__get_snapshot(lang)
+        return [bank.name for bank in snapshot.banks]
 
     async def get_all(self, lang: Language, curr: Currency, non_cash: bool = True) -> Tuple[Tuple, List[Bank]]:
-        # Get page source
-        page_source = await self.__get_page_source(lang, non_cash)
-        parsed_source = html.fromstring(page_source)
-        banks_trs = parsed_source.xpath('//*[@id="rb"]/tr')
+        snapshot = await self.__get_snapshot(lang, non_cash)
+        return snapshot.get_best(curr), list(snapshot.get_banks(curr))
 
-        # Get an offset from usd cells based on curr
-        offset = 0
-        if curr is Currency.rur:
-            offset = 4
-
-        best = ('', '')
-
-        # noinspection PyBroadException
-        try:
-            max_tr = banks_trs[-3]
-            max_tds = max_tr.xpath('./td')
-            maximum = max_tds[1 + offset].text
-            if maximum is None:
-                maximum = ''
-            elif '.' not in maximum:
-                maximum = f"{maximum}.00"
-
-            min_tr = banks_trs[-4]
-            min_tds = min_tr.xpath('./td')
-            minimum = min_tds[2 + offset].text
-            if minimum is None:
-                minimum = ''
-            elif '.' not in minimum:
-                minimum = f"{minimum}.00"
-
-            best = maximum, minimum
-        except Exception:
-            pass
-
-        # skip non-bank trs
-        banks_trs = banks_trs[2:-5]
-
-        rate_am_banks = []
-        for bank_tr in banks_trs:
-            try:
-                bank_tds = bank_tr.xpath('./td')
+    async def get_bank_rates(self, bank_id: str, lang: Language, non_cash: bool = True) -> Bank:
+        snapshot = await self.__get_snapshot(lang, non_cash)
+        bank = snapshot.get_bank(bank_id)
+        if bank is None:
+            raise KeyError(f"[{RateAmParserExchangeRatesInformer.__name__}]: no bank with id {bank_id}.")
 
-                id_ = bank_tr.attrib['id']
-                name = bank_tds[1].xpath('a[1]')[0].text
+        return bank
 
-                buy = bank_tds[5 + offset].text if bank_tds[5 + offset].text is not None else \
-                    bank_tds[5 + offset].xpath('./*[1]')[0].text
-                if '.' not in buy:
-                    buy = f"{buy}.00"
+    async def get_snapshot(self, lang: Language, non_cash: bool = True) -> RatesSnapshot:
+        return await self.__get_snapshot(lang, non_cash)
 
-                sell = bank_tds[6 + offset].text if bank_tds[6 + offset].text is not None else \
-                    bank_tds[6 + offset].xpath('./*[1]')[0].text
-                if '.' not in sell:
-                    sell = f"{sell}.00"
+    async def refresh(self, lang: Language, non_cash: bool = True) -> None:
+        await self.__snapshots.refresh((lang, non_cash))
 
-                ex_rate = ExchangeRate(curr.value, buy, sell)
+    async def __get_snapshot(self, lang: Language, non_cash: bool = True) -> RatesSnapshot:
+        """Gets the snapshot of the rate.am page from the cache, downloading and parsing the page if needed."""
+        with TRACER.stage('rates'):
+            return await self.__snapshots.get((lang, non_cash))
 
-                rate_am_banks.append(Bank(id_, name, ex_rates=[ex_rate]))
-            except IndexError:
-                pass
+    async def __load_snapshot(self, key: Tuple[Language, bool]) -> RatesSnapshot:
+        """Downloads and parses the rate.am page for the given (lang, non_cash) key."""
+        lang, non_cash = key
+        labels = {'lang': lang.value, 'type': 'non_cash' if non_cash else 'cash'}
 
-        return best, rate_am_banks
+        url_lang = lang.value if lang != Language.hy else 'am'
+        url = RateAmParserExchangeRatesInformer.__URL.format(self.base_url, url_lang,
+                                                             'non-cash' if non_cash else 'cash')
+        page = self.__pages.get(url)
 
-    async def get_bank_rates(self, bank_id: str, lang: Language, non_cash: bool = True) -> Bank:
-        # Get page source
-        page_source = await self.__get_page_source(lang, non_cash)
-        parsed_source = html.fromstring(page_source)
-        bank_tr = parsed_source.xpath(f'//tr[@id="{bank_id}"]')[0]
+        started = time.perf_counter()
+        try:
+            r, page_source = await self.circuit_breaker.call(self.__get_page, url, page)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self.__fetch_failures.inc(**labels)
+            raise
+        finally:
+            self.__fetch_seconds.observe(time.perf_counter() - started, **labels)
+
+        if r.status_code == httpx.codes.NOT_MODIFIED:
+            self.__unchanged.inc(reason='not_modified', **labels)
+            snapshot = page.snapshot.revalidated()
+            self.__pages[url] = page._replace(etag=r.headers.get('etag', page.etag),
+                                              last_modified=r.headers.get('last-modified', page.last_modified),
+                                              snapshot=snapshot)
+            return snapshot
+
+        digest = RateAmPageParser.get_rates_digest(page_source)
+        if page is not None and page.digest == digest:
+            # Only the rest of the page has changed, e.g. the ads
+            self.__unchanged.inc(reason='same_rates', **labels)
+            snapshot = page.snapshot.revalidated()
+        else:
+            # Parsing a page is CPU-bound, so it runs in the executor to keep the event loop responsive.
+            started = time.perf_counter()
+            loop = asyncio.get_event_loop()
+            parse = RateAmPageParser.parse_streaming if self.streaming_parser else RateAmPageParser.parse
+            snapshot = await loop.run_in_executor(self.parser_executor, parse, page_source)
+            self.__parse_seconds.observe(time.perf_counter() - started, **labels)
+            self._notify_listeners(lang, non_cash, snapshot)
+
+        self.__pages[url] = _Page(r.headers.get('etag'), r.headers.get('last-modified'), digest, snapshot)
+        return snapshot
+
+    async def __get_page(self, url: str, page: Optional[_Page]) -> Tuple[httpx.Response, Optional[str]]:
+        """Downloads the rate.am page, if it has been modified since the given last download of it.
+        Returns the response and the page source, which is None if the page hasn't been modified.
+
+        The client asks for the compressed page in all the encodings it can decode (gzip, deflate, and br if
+        the brotli package is installed).
+        """
+        headers = {
+            'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                          'Chrome/79.0.3945.130 Safari/537.36'}
+        if page is not None and page.etag is not None:
+            headers['if-none-match'] = page.etag
+        if page is not None and page.last_modified is not None:
+            headers['if-modified-since'] = page.last_modified
 
-        bank_tds = bank_tr.xpath('./td')
-        name = bank_tds[1].xpath('a[1]')[0].text
-        update_time = bank_tds[4].text
+        async with self.http_client.client.stream('GET', url, headers=headers) as r:
+            if r.status_code == httpx.codes.NOT_MODIFIED and page is not None:
+                return r, None
 
-        try:
-            usd_buy = bank_tds[5].text if bank_tds[5].text is not None else \
-                bank_tds[5].xpath('./*[1]')[0].text
-        except IndexError:
-            usd_buy = ''
-        try:
-            usd_sell = bank_tds[6].text if bank_tds[6].text is not None else \
-                bank_tds[6].xpath('./*[1]')[0].text
-        except IndexError:
-            usd_sell = ''
-        bank = Bank(bank_id, name, update_time, [ExchangeRate('usd', usd_buy, usd_sell)])
+            # Error pages have no rates, so fail instead of replacing the last good snapshot with an empty one
+            r.raise_for_status()
 
-        try:
-            rur_buy = bank_tds[9].text if bank_tds[9].text is not None else \
-                bank_tds[9].xpath('./*[1]')[0].text
-        except IndexError:
-            rur_buy = ''
-        try:
-            rur_sell = bank_tds[10].text if bank_tds[10].text is not None else \
-                bank_tds[10].xpath('./*[1]')[0].text
-        except IndexError:
-            rur_sell = ''
+            if not self.streaming_parser:
+                await r.aread()
+                return r, r.text
 
-        bank.rates.append(ExchangeRate('rur', rur_buy, rur_sell))
+            # The rest of the page after the rates table isn't needed. Closing the response before it's read to
+            #   the end costs a new connection over HTTP/1.1, but only the stream over HTTP/2.
+            scanner = RatesTableScanner()
+            async for chunk in r.aiter_text():
+                if scanner.feed(chunk):
+                    break
 
-        return bank
+            return r, scanner.source
 
     @staticmethod
-    async def __get_page_source(lang: Language, non_cash: bool = True):
-        """Gets rate.am page source."""
-        url_lang = lang.value if lang != Language.hy else 'am'
-
-        url = RateAmParserExchangeRatesInformer.__URL.format(url_lang, 'non-cash' if non_cash else 'cash')
-        headers = {
-            'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
-                          'Chrome/79.0.3945.130 Safari/537.36'}
+    def __report_revalidation_error(error: Exception) -> None:
+        """Reports a failed background download. The rejections of the open circuit are expected, so they aren't
+        reported."""
+        if isinstance(error, CircuitOpenError):
+            return
 
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url, headers=headers)
-            return r.text
+        report_error(RateAmParserExchangeRatesInformer.__name__, "revalidation failed", error)
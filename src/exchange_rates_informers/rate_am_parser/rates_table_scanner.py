@@ -0,0 +1,85 @@
+import re
+from typing import List, Optional
+
+
+class RatesTableScanner:
+    """Scans a rate.am page while it's being downloaded, and tells when the rates table has been received, so the rest
+    of the page can be skipped.
+
+    The tables nested in the rates table are tracked, so the table ends only at its own closing tag.
+    """
+
+    __TABLE_START = re.compile(r'<table\b[^>]*\bid=["\']?rb\b[^>]*>', re.IGNORECASE)
+    # An opening or (with the slash group) a closing table tag
+    __TABLE_TAG = re.compile(r'<(/?)table\b[^>]*>', re.IGNORECASE)
+
+    # Number of characters at the end of the scanned chunks which are scanned again along with the next chunk, so
+    #   a tag split between two chunks is still found. The tags found are never scanned again.
+    __OVERLAP = 256
+
+    def __init__(self):
+        self.__chunks: List[str] = []
+        self.__received = 0
+        self.__tail = ''
+        # Number of the open tables from the rates table down, 0 before the rates table starts
+        self.__depth = 0
+        self.__table_start: Optional[int] = None
+        self.__table_end: Optional[int] = None
+
+    @property
+    def table_ended(self) -> bool:
+        """Whether the end of the rates table has been received."""
+        return self.__table_end is not None
+
+    @property
+    def source(self) -> str:
+        """The page source received so far."""
+        return ''.join(self.__chunks)
+
+    @property
+    def table(self) -> Optional[str]:
+        """The source of the rates table, from its opening to its closing tag, or None if it hasn't ended yet."""
+        if self.__table_end is None:
+            return None
+        return self.source[self.__table_start:self.__table_end]
+
+    def feed(self, chunk: str) -> bool:
+        """Adds the next chunk of the page.
+
+        :param str chunk: the next chunk of the page source
+        :return bool: whether the end of the rates table has been received
+        """
+        self.__chunks.append(chunk)
+        if self.table_ended:
+            return True
+
+        # Offset of the window in the page
+        offset = self.__received - len(self.__tail)
+        window = self.__tail + chunk
+        self.__received += len(chunk)
+
+        scanned = 0
+        if self.__table_start is None:
+            match = RatesTableScanner.__TABLE_START.search(window)
+            if match is not None:
+                self.__table_start = offset + match.start()
+                self.__depth = 1
+                scanned = match.end()
+
+        if self.__depth:
+            for match in RatesTableScanner.__TABLE_TAG.finditer(window, scanned):
+                scanned = match.end()
+                self.__depth += -1 if match.group(1) else 1
+                if not self.__depth:
+                    self.__table_end = offset + scanned
+                    break
+
+        self.__tail = window[max(scanned, len(window) - RatesTableScanner.__OVERLAP):]
+        return self.table_ended
+
+    @staticmethod
+    def find_table(page_source: str) -> Optional[str]:
+        """Returns the source of the rates table of the given page, or None if the page has no complete rates table."""
+        scanner = RatesTableScanner()
+        scanner.feed(page_source)
+        return scanner.table
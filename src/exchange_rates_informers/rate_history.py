@@ -0,0 +1,228 @@
+import asyncio
+import bisect
+import math
+import time
+from array import array
+from collections import deque
+from typing import Dict, Deque, Tuple, Optional, NamedTuple, Callable, Sequence, List
+
+from aiohttp import web
+
+from bot_data import Language, Currency
+from error_reporting import report_error
+from exchange_rates_informers.rates_snapshot import RatesSnapshot
+
+# Number of values recorded for each bank: the buy and sell rates of each currency in the order of Currency
+ROW_WIDTH = 2 * len(Currency)
+
+
+class RateStats(NamedTuple):
+    """Movement of a rate during a period, in 1/100 of AMD."""
+    first: int
+    last: int
+    low: int
+    high: int
+
+    @property
+    def delta(self) -> int:
+        """Change of the rate during the period."""
+        return self.last - self.first
+
+
+class RatesBucket:
+    """The rates of all banks recorded during a time bucket, stored by columns.
+
+    Each bank has a column of signed 64-bit rates in 1/100 of AMD, which has a row of :py:data:`ROW_WIDTH` values per
+    recorded time. A bank which has no rates at some time has zeros in its row.
+    """
+
+    __slots__ = ('start', 'times', 'columns')
+
+    def __init__(self, start: float, times: array = None, columns: Dict[str, array] = None):
+        """Creates the bucket.
+
+        :param float start: unix time when the bucket starts
+        :param times: unix times of the records
+        :param columns: columns of the banks' rates keyed by the banks' ids
+        """
+        self.start = start
+        self.times = times if times is not None else array('d')
+        self.columns = columns if columns is not None else {}
+
+    def append(self, time_: float, rows: Dict[str, Sequence[int]]) -> None:
+        """Records the banks' rows of rates at the given time."""
+        for bank_id, column in self.columns.items():
+            column.extend(rows.get(bank_id, (0,) * ROW_WIDTH))
+
+        for bank_id, row in rows.items():
+            if bank_id not in self.columns:
+                # The bank has no rates in the previous records
+                column = array('q', bytes(column_size(len(self.times))))
+                column.extend(row)
+                self.columns[bank_id] = column
+
+        self.times.append(time_)
+
+    def get_rows(self, index: int) -> Dict[str, Tuple[int, ...]]:
+        """Returns the banks' rows of rates of the record with the given index."""
+        start = index * ROW_WIDTH if index >= 0 else (len(self.times) + index) * ROW_WIDTH
+        return {bank_id: tuple(column[start:start + ROW_WIDTH]) for bank_id, column in self.columns.items()}
+
+
+def column_size(records: int) -> int:
+    """Returns the size in bytes of a bank's column of the given number of records."""
+    return records * ROW_WIDTH * array('q').itemsize
+
+
+class RateHistory:
+    """Keeps the history of the rates of all banks for the last hours, and answers how the rates have moved.
+
+    The history is recorded from the snapshots of the informer it listens to. A snapshot is appended to the current
+    time bucket only if its rates have changed, and the buckets are kept in a ring buffer which holds the given number
+    of hours. Each changed bucket is saved to the store, so the history is loaded back when the app restarts.
+    """
+
+    def __init__(self, hours: float = 48, bucket_seconds: float = 60 * 60, store=None,
+                 persist: Callable[[], bool] = None, lang: Language = Language.en):
+        """Creates the history.
+
+        :param float hours: number of last hours which are kept
+        :param float bucket_seconds: duration in seconds of a time bucket, which is saved as one document
+        :param MongodbRateHistoryStore store: store of the buckets, the history is kept only in memory if None
+        :param persist: function which tells whether the recorded buckets should be saved to the store, e.g. only in
+                        the worker which gets the rates. They are always saved if None.
+        :param Language lang: language of the snapshots which are recorded. The rates are the same in all languages.
+        """
+        if hours <= 0 or bucket_seconds <= 0:
+            raise ValueError(f"[{RateHistory.__name__}]: hours and bucket_seconds must be positive, "
+                             f"but {hours} and {bucket_seconds} were given.")
+
+        self.hours = hours
+        self.bucket_seconds = bucket_seconds
+        self.store = store
+        self.persist = persist
+        self.lang = lang
+
+        max_buckets = math.ceil(hours * 60 * 60 / bucket_seconds) + 1
+        self.__buckets: Dict[bool, Deque[RatesBucket]] = {True: deque(maxlen=max_buckets),
+                                                          False: deque(maxlen=max_buckets)}
+        # The last recorded rows of rates keyed by non_cash, so the unchanged snapshots aren't recorded
+        self.__last_rows: Dict[bool, Dict[str, Tuple[int, ...]]] = {}
+
+        # The changed buckets waiting to be saved keyed by their starts, and the tasks saving them, keyed by non_cash
+        self.__unsaved: Dict[bool, Dict[float, RatesBucket]] = {True: {}, False: {}}
+        self.__saving: Dict[bool, asyncio.Task] = {}
+
+    def record(self, lang: Language, non_cash: bool, snapshot: RatesSnapshot) -> None:
+        """Records the rates of the given snapshot, if they have changed. Can be used as an informer listener.
+
+        :param Language lang: language of the snapshot
+        :param bool non_cash: whether the snapshot has non-cash or cash rates
+        :param RatesSnapshot snapshot: the snapshot
+        """
+        if lang is not self.lang:
+            return
+
+        rows = RateHistory.__get_known_rows(
+            {bank.id_: tuple(units for rate in bank.rates for units in (rate.buy.minor_units, rate.sell.minor_units))
+             for bank in snapshot.banks})
+        if rows == self.__last_rows.get(non_cash):
+            return
+        self.__last_rows[non_cash] = rows
+
+        buckets = self.__buckets[non_cash]
+        start = snapshot.created_at - snapshot.created_at % self.bucket_seconds
+        if not buckets or start > buckets[-1].start:
+            buckets.append(RatesBucket(start))
+
+        bucket = buckets[-1]
+        bucket.append(snapshot.created_at, rows)
+        self.__save(non_cash, bucket)
+
+    def get_stats(self, non_cash: bool, bank_id: str, curr: Currency,
+                  since: float) -> Optional[Tuple[Optional[RateStats], Optional[RateStats]]]:
+        """Returns how the buy and sell rates of the given bank have moved since the given time.
+
+        The rates in effect at the given time are the first ones of the period, and the missing rates are skipped.
+
+        :param bool non_cash: whether to use the non-cash or the cash rates
+        :param str bank_id: id of the bank
+        :param Currency curr: currency of the rates
+        :param float since: unix time when the period starts
+        :return: the (buy, sell) stats, each of which is None if there are no such rates, or None if there are no
+                 rates at all
+        """
+        offset = 2 * list(Currency).index(curr)
+
+        series: Tuple[List[int], List[int]] = ([], [])
+        for bucket in self.__buckets[non_cash]:
+            column = bucket.columns.get(bank_id)
+            if column is None:
+                continue
+
+            # The records before the period are skipped, except the last one, which is in effect when it starts
+            before = bisect.bisect_right(bucket.times, since)
+            first = max(0, before - 1)
+            for side, values in enumerate(series):
+                if before:
+                    values.clear()
+                values.extend(column[first * ROW_WIDTH + offset + side::ROW_WIDTH])
+
+        stats = tuple(RateStats(rates[0], rates[-1], min(rates), max(rates)) if rates else None
+                      for rates in ([value for value in values if value] for values in series))
+        return stats if any(stats) else None
+
+    async def load(self, _app: web.Application = None) -> None:
+        """Loads the history of the last hours from the store. Can be used as an aiohttp startup hook, so it only
+        reports the errors, not to prevent the app from starting."""
+        if self.store is None:
+            return
+
+        try:
+            await self.store.ensure_indexes()
+            for non_cash, buckets in self.__buckets.items():
+                loaded = await self.store.load(non_cash, time.time() - self.hours * 60 * 60)
+
+                # Keep the buckets recorded while loading
+                recorded = list(buckets)
+                buckets.clear()
+                buckets.extend(bucket for bucket in loaded if not recorded or bucket.start < recorded[0].start)
+                buckets.extend(recorded)
+
+                if buckets and not recorded and buckets[-1].times:
+                    self.__last_rows[non_cash] = RateHistory.__get_known_rows(buckets[-1].get_rows(-1))
+        except Exception as error:
+            report_error(RateHistory.__name__, "failed to load the history", error)
+
+    async def close(self, _app: web.Application = None) -> None:
+        """Waits for the changed buckets to be saved. Can be used as an aiohttp cleanup hook."""
+        if self.__saving:
+            await asyncio.gather(*self.__saving.values(), return_exceptions=True)
+
+    def __save(self, non_cash: bool, bucket: RatesBucket) -> None:
+        """Saves the changed bucket in the background. The buckets of each type are saved one at a time, so an older
+        state of a bucket never overwrites a newer one."""
+        if self.store is None or (self.persist is not None and not self.persist()):
+            return
+
+        self.__unsaved[non_cash][bucket.start] = bucket
+        if non_cash not in self.__saving:
+            task = asyncio.ensure_future(self.__save_unsaved(non_cash))
+            self.__saving[non_cash] = task
+            task.add_done_callback(lambda _: self.__saving.pop(non_cash, None))
+
+    async def __save_unsaved(self, non_cash: bool) -> None:
+        """Saves the changed buckets of the given type, until there are no more of them."""
+        unsaved = self.__unsaved[non_cash]
+        while unsaved:
+            bucket = unsaved.pop(next(iter(unsaved)))
+            try:
+                await self.store.save(non_cash, bucket)
+            except Exception as error:
+                report_error(RateHistory.__name__, "failed to save the history", error)
+
+    @staticmethod
+    def __get_known_rows(rows: Dict[str, Tuple[int, ...]]) -> Dict[str, Tuple[int, ...]]:
+        """Returns the rows which have rates. A bank without rates is recorded the same way as a bank which isn't on
+        the page, e.g. one which has left it, so they are compared the same way."""
+        return {bank_id: row for bank_id, row in rows.items() if any(row)}
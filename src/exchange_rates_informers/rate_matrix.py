@@ -0,0 +1,122 @@
+from array import array
+from decimal import Decimal
+from typing import Tuple, List, Optional
+
+from bot_data import Currency
+from exchange_rates_informers.bank import Bank
+from exchange_rates_informers.rates_snapshot import RatesSnapshot
+
+
+class RateMatrix:
+    """A numeric matrix of the rates of all banks for both non-cash and cash types, used for conversions.
+
+    Rates are kept in minor units (1/100 of AMD) in a flat array laid out as banks × types × currencies × (buy, sell),
+    so all rates of a bank are a contiguous row and a rate of all banks is a strided column. A missing rate is 0.
+    Conversions are done in integers and rounded half up to minor units, so they are exact.
+    """
+
+    BUY = 0
+    SELL = 1
+
+    __CURRENCIES = tuple(Currency)
+    __TYPE_SIZE = len(__CURRENCIES) * 2
+    __ROW_SIZE = __TYPE_SIZE * 2
+
+    def __init__(self, non_cash: RatesSnapshot, cash: RatesSnapshot):
+        """Creates the matrix.
+
+        :param RatesSnapshot non_cash: snapshot of non-cash rates
+        :param RatesSnapshot cash: snapshot of cash rates
+        """
+        self.versions = (non_cash.version, cash.version)
+        self.created_at = min(non_cash.created_at, cash.created_at)
+
+        # Banks which have only cash or only non-cash rates get zeroes for the other type.
+        banks_ = list(non_cash.banks)
+        banks_.extend(bank for bank in cash.banks if non_cash.get_bank(bank.id_) is None)
+        self.banks: Tuple[Bank, ...] = tuple(banks_)
+        self.__rows = {bank.id_: row for row, bank in enumerate(self.banks)}
+
+        self.__rates = array('q', bytes(8 * RateMatrix.__ROW_SIZE * len(self.banks)))
+        for row, bank in enumerate(self.banks):
+            for type_index, snapshot in enumerate((non_cash, cash)):
+                type_bank = snapshot.get_bank(bank.id_)
+                if type_bank is None:
+                    continue
+                for curr_index, rate in enumerate(type_bank.rates):
+                    offset = RateMatrix.__offset(row, type_index, curr_index, RateMatrix.BUY)
+                    self.__rates[offset] = rate.buy.minor_units
+                    self.__rates[offset + 1] = rate.sell.minor_units
+
+    def get_bank(self, bank_id: str) -> Optional[Bank]:
+        """Returns the bank with the given id, or None if there is no such bank."""
+        row = self.__rows.get(bank_id)
+        return self.banks[row] if row is not None else None
+
+    def get_row(self, bank_id: str) -> Optional[array]:
+        """Returns all rates of the given bank in minor units, in the order of types, currencies and (buy, sell).
+
+        :param str bank_id: id of the bank
+        :return: the row, or None if there is no such bank
+        """
+        row = self.__rows.get(bank_id)
+        if row is None:
+            return None
+
+        start = row * RateMatrix.__ROW_SIZE
+        return self.__rates[start:start + RateMatrix.__ROW_SIZE]
+
+    def get_column(self, curr: Currency, side: int, non_cash: bool = True) -> array:
+        """Returns the given rate of all banks in minor units, in the order of :py:attr:`banks`."""
+        offset = RateMatrix.__offset(0, 0 if non_cash else 1, RateMatrix.__CURRENCIES.index(curr), side)
+        return self.__rates[offset::RateMatrix.__ROW_SIZE]
+
+    def convert_bank(self, bank_id: str, amount: int, to_amd: bool = True) -> Optional[List[Optional[int]]]:
+        """Converts the amount with all rates of the given bank.
+
+        :param str bank_id: id of the bank
+        :param int amount: amount in minor units
+        :param bool to_amd: convert the amount from the foreign currencies to AMD, or from AMD to them
+        :return: converted amounts in minor units laid out as :py:meth:`get_row`, None for missing rates
+        """
+        row = self.get_row(bank_id)
+        if row is None:
+            return None
+
+        return RateMatrix.convert(row, amount, to_amd)
+
+    def convert_all(self, curr: Currency, side: int, amount: int, non_cash: bool = True,
+                    to_amd: bool = True) -> List[Optional[int]]:
+        """Converts the amount with the given rate of all banks.
+
+        :return: converted amounts in minor units in the order of :py:attr:`banks`, None for missing rates
+        """
+        return RateMatrix.convert(self.get_column(curr, side, non_cash), amount, to_amd)
+
+    @staticmethod
+    def convert(rates: array, amount: int, to_amd: bool = True) -> List[Optional[int]]:
+        """Converts the amount with each of the given rates, rounding the results half up.
+
+        :param array rates: rates in minor units, 0 for missing ones
+        :param int amount: amount in minor units
+        :param bool to_amd: multiply the amount by the rates, or divide it by them
+        :return: converted amounts in minor units, None for missing rates
+        """
+        if to_amd:
+            # amount * rate / 100
+            double_amount = 2 * amount
+            return [(double_amount * rate + 100) // 200 if rate else None for rate in rates]
+
+        # amount / (rate / 100)
+        scaled_amount = 200 * amount
+        return [(scaled_amount + rate) // (2 * rate) if rate else None for rate in rates]
+
+    @staticmethod
+    def from_minor_units(value: int) -> Decimal:
+        """Converts the given minor units to a Decimal amount."""
+        return Decimal(value).scaleb(-2)
+
+    @staticmethod
+    def __offset(row: int, type_index: int, curr_index: int, side: int) -> int:
+        """Returns the index of the given rate in the flat array."""
+        return row * RateMatrix.__ROW_SIZE + type_index * RateMatrix.__TYPE_SIZE + curr_index * 2 + side
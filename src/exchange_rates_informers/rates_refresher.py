@@ -0,0 +1,67 @@
+import asyncio
+import random
+from typing import Optional
+
+from aiohttp import web
+
+from bot_data import Language
+from error_reporting import report_error
+from exchange_rates_informers.exchange_rates_informer import ExchangeRatesInformer
+from utils.resilience import CircuitOpenError
+
+
+class RatesRefresher:
+    """Periodically refreshes all (language x cash/non-cash) rates of an informer in the background.
+
+    Keeping the informer warm means that users' turns read the rates from memory and never wait for the upstream,
+    and the upstream load stays fixed regardless of the traffic.
+    """
+
+    def __init__(self, informer: ExchangeRatesInformer, interval: float, jitter: float = 0):
+        """Creates the refresher.
+
+        :param ExchangeRatesInformer informer: informer which rates should be refreshed
+        :param float interval: time in seconds between two refreshes
+        :param float jitter: maximum random deviation in seconds added to each interval
+        """
+        if interval <= 0:
+            raise ValueError(f"[{RatesRefresher.__name__}]: interval must be positive, but {interval} was given.")
+
+        self.informer = informer
+        self.interval = interval
+        self.jitter = min(abs(jitter), interval)
+
+        self.__task: Optional[asyncio.Task] = None
+
+    async def start(self, _app: web.Application = None) -> None:
+        """Starts refreshing in the background. Can be used as an aiohttp startup hook."""
+        if self.__task is None:
+            self.__task = asyncio.ensure_future(self.__run())
+
+    async def stop(self, _app: web.Application = None) -> None:
+        """Stops refreshing. Can be used as an aiohttp cleanup hook."""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def refresh_all(self) -> None:
+        """Refreshes the rates for all languages and both cash and non-cash types concurrently."""
+        results = await asyncio.gather(
+            *(self.informer.refresh(lang, non_cash) for lang in Language for non_cash in (True, False)),
+            return_exceptions=True)
+
+        # A failed refresh must not stop the others, so just report it. While the upstream's circuit is open
+        #   the refreshes are rejected without requesting it, which is expected.
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, CircuitOpenError):
+                report_error(RatesRefresher.__name__, "refresh failed", result)
+
+    async def __run(self) -> None:
+        """Refreshes the rates until cancelled."""
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.interval + random.uniform(-self.jitter, self.jitter))
@@ -0,0 +1,103 @@
+import itertools
+import time
+from types import MappingProxyType
+from typing import Iterable, Tuple, Dict, Mapping, Optional
+
+from bot_data import Currency
+from exchange_rates_informers.bank import Bank
+from exchange_rates_informers.rate import Rate
+
+# Versions of the snapshots created in this process. Snapshots parsed in a process pool are recreated on unpickling,
+#   so they get their versions here as well.
+_VERSIONS = itertools.count(1)
+
+
+class RatesSnapshot:
+    """An immutable snapshot of the exchange rates of all banks for all supported currencies.
+
+    A snapshot is created once per parsed page, and all the lookups on it are O(1), so it can be shared by all
+    the requests until the rates are updated.
+    """
+
+    __slots__ = ('__version', '__created_at', '__banks', '__banks_by_id', '__best', '__views')
+
+    def __init__(self, banks_: Iterable[Bank], best: Dict[Currency, Tuple[Rate, Rate]], created_at: float = None):
+        """Creates the snapshot.
+
+        :param banks_: all banks, each one having rates for all supported currencies in the order of
+                       :py:class:`Currency`
+        :param best: the best (buy, sell) rates for each currency
+        :param created_at: unix time when the rates were got, now if None
+        """
+        self.__version = next(_VERSIONS)
+        self.__created_at = created_at if created_at is not None else time.time()
+        self.__banks = tuple(banks_)
+        self.__banks_by_id = MappingProxyType({bank.id_: bank for bank in self.__banks})
+        self.__best = MappingProxyType(dict(best))
+
+        # Precompute the per-currency views of banks, which contain only the rates for the given currency, and only
+        #   the banks which have both buy and sell rates for it.
+        views = {}
+        for i, curr in enumerate(Currency):
+            views[curr] = tuple(
+                Bank(bank.id_, bank.name, bank.update_time, (bank.rates[i],))
+                for bank in self.__banks if bank.rates[i].buy and bank.rates[i].sell)
+        self.__views = MappingProxyType(views)
+
+    def __reduce__(self):
+        # Snapshots are pickled when they are created in a process pool. Only the source data is pickled, the indexes
+        #   and views are rebuilt on unpickling.
+        return RatesSnapshot, (self.__banks, dict(self.__best), self.__created_at)
+
+    def revalidated(self, created_at: float = None) -> 'RatesSnapshot':
+        """Returns a copy of the snapshot for the rates which were got again and haven't changed. The copy has
+        the same version, so anything computed from the snapshot stays valid.
+
+        :param created_at: unix time when the rates were got again, now if None
+        """
+        snapshot = RatesSnapshot.__new__(RatesSnapshot)
+        snapshot.__version = self.__version
+        snapshot.__created_at = created_at if created_at is not None else time.time()
+        snapshot.__banks = self.__banks
+        snapshot.__banks_by_id = self.__banks_by_id
+        snapshot.__best = self.__best
+        snapshot.__views = self.__views
+
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        """Unique version of the snapshot, which can be used to key anything computed from it."""
+        return self.__version
+
+    @property
+    def created_at(self) -> float:
+        """Unix time when the rates were got."""
+        return self.__created_at
+
+    @property
+    def age(self) -> float:
+        """Time in seconds since the rates were got."""
+        return time.time() - self.__created_at
+
+    @property
+    def banks(self) -> Tuple[Bank, ...]:
+        """All banks in the order they appear at the source."""
+        return self.__banks
+
+    @property
+    def banks_by_id(self) -> Mapping[str, Bank]:
+        """All banks indexed by their ids."""
+        return self.__banks_by_id
+
+    def get_bank(self, bank_id: str) -> Optional[Bank]:
+        """Returns the bank with the given id, which contains the rates for all supported currencies."""
+        return self.__banks_by_id.get(bank_id)
+
+    def get_banks(self, curr: Currency) -> Tuple[Bank, ...]:
+        """Returns the banks which have rates for the given currency. Each bank contains only that currency rates."""
+        return self.__views[curr]
+
+    def get_best(self, curr: Currency) -> Tuple[Rate, Rate]:
+        """Returns the best (buy, sell) rates for the given currency."""
+        return self.__best.get(curr, (Rate.EMPTY, Rate.EMPTY))
@@ -0,0 +1,147 @@
+from typing import List, Tuple, Dict
+
+
+from bot_data import Language, Currency
+from cluster import ClusterEvents, LeaderLease
+from config import InformerConfig
+from error_reporting import report_error
+from exchange_rates_informers.bank import Bank
+from exchange_rates_informers.exchange_rates_informer import ExchangeRatesInformer
+from exchange_rates_informers.mongodb_rates_snapshot_store import MongodbRatesSnapshotStore
+from exchange_rates_informers.rates_snapshot import RatesSnapshot
+from utils.caching import AsyncLoadingCache, TTLCache
+
+
+class SharedExchangeRatesInformer(ExchangeRatesInformer):
+    """Shares the rates of an informer between the worker processes of the app.
+
+    Only the worker holding the lease gets the rates from the wrapped informer, i.e. scrapes rate.am, and publishes
+    the new snapshots to the store. The other workers read the snapshots from the store, as soon as the leader
+    announces them, so the upstream load doesn't grow with the number of workers.
+    """
+
+    EVENTS_TOPIC = 'rates'
+
+    def __init__(self, informer: ExchangeRatesInformer, store: MongodbRatesSnapshotStore, lease: LeaderLease,
+                 events: ClusterEvents, cache_ttl: float = InformerConfig.CACHE_TTL,
+                 cache_max_size: int = InformerConfig.CACHE_MAX_SIZE, stale_ttl: float = InformerConfig.STALE_TTL):
+        """Creates the informer.
+
+        :param ExchangeRatesInformer informer: informer which gets the rates in the leader
+        :param MongodbRatesSnapshotStore store: store of the snapshots shared by the workers
+        :param LeaderLease lease: lease which elects the worker getting the rates
+        :param ClusterEvents events: events by which the leader announces the new snapshots
+        :param float cache_ttl: time in seconds during which a shared snapshot is reused instead of being loaded again
+        :param int cache_max_size: maximum number of shared snapshots kept in the cache
+        :param float stale_ttl: time in seconds after the cache TTL, during which the last shared snapshot is still
+                                served while a new one is being loaded
+        """
+        super(SharedExchangeRatesInformer, self).__init__()
+
+        self.informer = informer
+        self.store = store
+        self.lease = lease
+        self.events = events
+
+        # Shared snapshots loaded by a follower, keyed by (lang, non_cash)
+        self.__snapshots = AsyncLoadingCache(self.__load_snapshot, cache_ttl, cache_max_size, stale_ttl,
+                                             SharedExchangeRatesInformer.__report_error)
+        # The (revision, snapshot) loaded by a follower, and the (version, created_at) published by the leader, keyed
+        #   by (lang, non_cash)
+        self.__loaded: Dict[Tuple[Language, bool], Tuple[str, RatesSnapshot]] = {}
+        self.__published: Dict[Tuple[Language, bool], Tuple[int, float]] = {}
+
+        events.subscribe(SharedExchangeRatesInformer.EVENTS_TOPIC, self.__on_published)
+        events.subscribe(ClusterEvents.RESET, self.__on_reset)
+        informer.add_listener(self.__on_informer_snapshot)
+
+    @property
+    def cache(self) -> TTLCache:
+        """The cache of the shared snapshots loaded by a follower."""
+        return self.__snapshots.entries
+
+    async def get_banks(self, lang: Language) -> List[str]:
+        snapshot = await self.get_snapshot(lang)
+        return [bank.name for bank in snapshot.banks]
+
+    async def get_all(self, lang: Language, curr: Currency, non_cash: bool = True) -> Tuple[Tuple, List[Bank]]:
+        snapshot = await self.get_snapshot(lang, non_cash)
+        return snapshot.get_best(curr), list(snapshot.get_banks(curr))
+
+    async def get_bank_rates(self, bank_id: str, lang: Language, non_cash: bool = True) -> Bank:
+        snapshot = await self.get_snapshot(lang, non_cash)
+        bank = snapshot.get_bank(bank_id)
+        if bank is None:
+            raise KeyError(f"[{SharedExchangeRatesInformer.__name__}]: no bank with id {bank_id}.")
+
+        return bank
+
+    async def get_snapshot(self, lang: Language, non_cash: bool = True) -> RatesSnapshot:
+        if self.lease.is_leader:
+            return await self.informer.get_snapshot(lang, non_cash)
+        return await self.__snapshots.get((lang, non_cash))
+
+    async def refresh(self, lang: Language, non_cash: bool = True) -> None:
+        """Gets the rates and publishes them if they have changed in the leader, or loads the shared ones in
+        a follower."""
+        if not self.lease.is_leader:
+            # Another worker may publish other snapshots until this one leads again
+            self.__published.clear()
+            await self.__snapshots.refresh((lang, non_cash))
+            return
+
+        await self.informer.refresh(lang, non_cash)
+        snapshot = await self.informer.get_snapshot(lang, non_cash)
+
+        key = (lang, non_cash)
+        revision = f'{self.lease.worker_id}/{snapshot.version}'
+        published = self.__published.get(key)
+        if published is None or published[0] != snapshot.version:
+            await self.store.save(lang, non_cash, revision, snapshot)
+            await self.events.publish(SharedExchangeRatesInformer.EVENTS_TOPIC,
+                                      {'lang': lang.value, 'non_cash': non_cash})
+        elif published[1] != snapshot.created_at:
+            # The rates haven't changed, so the followers only need the time when they were got, which they load
+            #   with their next refresh
+            await self.store.touch(lang, non_cash, revision, snapshot.created_at)
+
+        self.__published[key] = (snapshot.version, snapshot.created_at)
+
+    async def __load_snapshot(self, key: Tuple[Language, bool]) -> RatesSnapshot:
+        """Loads the shared snapshot for the given (lang, non_cash) key. The wrapped informer gets the rates itself,
+        if the leader hasn't published them yet, or the store is unavailable."""
+        lang, non_cash = key
+        try:
+            loaded = await self.store.load(lang, non_cash, self.__loaded.get(key))
+        except Exception as error:
+            SharedExchangeRatesInformer.__report_error(error)
+            loaded = None
+
+        if loaded is None:
+            return await self.informer.get_snapshot(lang, non_cash)
+
+        known = self.__loaded.get(key)
+        self.__loaded[key] = loaded
+        if known is None or known[0] != loaded[0]:
+            self._notify_listeners(lang, non_cash, loaded[1])
+
+        return loaded[1]
+
+    def __on_informer_snapshot(self, lang: Language, non_cash: bool, snapshot: RatesSnapshot) -> None:
+        """Passes the new snapshots got by the wrapped informer to the listeners, while they are the shared ones."""
+        if self.lease.is_leader:
+            self._notify_listeners(lang, non_cash, snapshot)
+
+    def __on_published(self, payload: Dict) -> None:
+        """Drops the snapshot announced by the leader, so it's loaded with the next request."""
+        self.__snapshots.invalidate((Language(payload['lang']), payload['non_cash']))
+
+    def __on_reset(self, _payload: Dict) -> None:
+        """Drops all snapshots, since the announcements of the new ones might have been missed."""
+        for lang in Language:
+            for non_cash in (True, False):
+                self.__snapshots.invalidate((lang, non_cash))
+
+    @staticmethod
+    def __report_error(error: Exception) -> None:
+        report_error(SharedExchangeRatesInformer.__name__, "failed to load the shared rates", error)
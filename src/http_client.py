@@ -0,0 +1,49 @@
+import importlib.util
+from typing import Optional
+
+import httpx
+from aiohttp import web
+
+
+class SharedHttpClient:
+    """Owns a single long-lived httpx client, so all outgoing requests of the app reuse pooled keep-alive connections.
+
+    The client is created and closed through aiohttp startup/cleanup hooks, and is given to the components which make
+    http requests by injection.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30, timeout: float = 10, connect_timeout: float = 5, http2: bool = True):
+        """Creates the shared client holder. The client itself is created on :py:meth:`start` or on the first use.
+
+        :param int max_connections: maximum number of concurrent connections
+        :param int max_keepalive_connections: maximum number of idle connections kept in the pool
+        :param float keepalive_expiry: time in seconds after which an idle connection is closed
+        :param float timeout: default timeout in seconds for reading, writing and acquiring a connection
+        :param float connect_timeout: timeout in seconds for establishing a connection
+        :param bool http2: use HTTP/2 when the server supports it and the h2 package is installed
+        """
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2 and importlib.util.find_spec('h2') is not None
+
+        self.__client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Returns the shared client, creating it if it hasn't been created yet."""
+        if self.__client is None or self.__client.is_closed:
+            self.__client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+        return self.__client
+
+    async def start(self, _app: web.Application = None) -> None:
+        """Creates the shared client. Can be used as an aiohttp startup hook."""
+        _ = self.client
+
+    async def close(self, _app: web.Application = None) -> None:
+        """Closes the shared client and all its connections. Can be used as an aiohttp cleanup hook."""
+        if self.__client is not None:
+            await self.__client.aclose()
+            self.__client = None
@@ -0,0 +1,102 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+from config import ClusterConfig, StorageConfig
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+
+class WorkerLauncher:
+    """Runs the app in several worker processes, which accept connections on the same port, and restarts the workers
+    which exit.
+
+    Each worker is a separate `python src/app.py` process, so the app uses as many cores as there are workers. They
+    share the port with SO_REUSEPORT, so the kernel balances the connections between them.
+    """
+
+    def __init__(self, workers: int, script: str = APP_SCRIPT, restart_delay: float = 1, stop_timeout: float = 10):
+        """Creates the launcher.
+
+        :param int workers: number of worker processes
+        :param str script: the app script run by each worker
+        :param float restart_delay: time in seconds after which a worker which has exited is started again
+        :param float stop_timeout: time in seconds the workers are given to stop, before they are killed
+        """
+        if workers <= 0:
+            raise ValueError(f"[{WorkerLauncher.__name__}]: workers must be positive, but {workers} was given.")
+
+        self.workers = workers
+        self.script = script
+        self.restart_delay = restart_delay
+        self.stop_timeout = stop_timeout
+
+        self.__processes: List[Optional[subprocess.Popen]] = [None] * workers
+        self.__stopping = False
+
+    def run(self) -> int:
+        """Starts the workers and keeps them running until the launcher gets SIGTERM or SIGINT, which is passed to
+        the workers.
+
+        :return int: exit code of the launcher
+        """
+        signal.signal(signal.SIGTERM, self.__stop)
+        signal.signal(signal.SIGINT, self.__stop)
+
+        env = {**os.environ, 'WEB_REUSE_PORT': '1'}
+        while not self.__stopping:
+            for index, process in enumerate(self.__processes):
+                if process is not None and process.poll() is None:
+                    continue
+                if process is not None:
+                    print(f"\n [{WorkerLauncher.__name__}] worker {index} exited with {process.returncode}, "
+                          f"restarting it.", file=sys.stderr)
+                    time.sleep(self.restart_delay)
+                if self.__stopping:
+                    break
+
+                self.__processes[index] = subprocess.Popen([sys.executable, self.script], env=env)
+
+            time.sleep(0.5)
+
+        return self.__wait()
+
+    def __stop(self, signum, _frame) -> None:
+        """Stops restarting the workers, and passes the signal to them."""
+        self.__stopping = True
+        for process in self.__processes:
+            if process is not None and process.poll() is None:
+                process.send_signal(signum)
+
+    def __wait(self) -> int:
+        """Waits for the workers to exit, killing the ones which don't exit in time."""
+        deadline = time.monotonic() + self.stop_timeout
+        for process in self.__processes:
+            if process is None:
+                continue
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        return 0
+
+
+def main():
+    if ClusterConfig.WORKERS <= 1:
+        # A single worker doesn't need supervising, so the launcher is replaced by it
+        os.execv(sys.executable, [sys.executable, APP_SCRIPT])
+
+    if StorageConfig.BACKEND == 'memory':
+        print(f"\n [{WorkerLauncher.__name__}] WARNING: the workers don't share their states with the memory "
+              f"storage backend.", file=sys.stderr)
+
+    sys.exit(WorkerLauncher(ClusterConfig.WORKERS).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+from .registry import MetricsRegistry, Metric, Counter, Gauge, Histogram, REGISTRY
+from .event_loop_monitor import EventLoopMonitor
+from .tracing import Tracer, TurnTrace, TRACER
+from .exposition import render_text, CONTENT_TYPE
+from .cache_metrics import CacheMetrics, CACHE_METRICS
@@ -0,0 +1,48 @@
+from typing import Dict
+
+from metrics.registry import MetricsRegistry, REGISTRY, LabelValues
+
+
+class CacheMetrics:
+    """Exposes the hit ratios and sizes of the app's caches.
+
+    The values are read from the caches' own counters when the metrics are collected, so the lookups themselves
+    don't do any extra work.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        """Creates the metrics.
+
+        :param MetricsRegistry registry: registry to expose the metrics in
+        """
+        self.__caches = {}
+
+        registry.gauge('cache_hit_ratio', 'Ratio of the hits to all lookups of the cache.', ('cache',),
+                       callback=self.__hit_ratios)
+        registry.counter('cache_lookups_total', 'Lookups of the cache.', ('cache', 'result'), callback=self.__lookups)
+        registry.gauge('cache_entries', 'Entries in the cache.', ('cache',), callback=self.__entries)
+
+    def register(self, name: str, cache) -> None:
+        """Exposes the metrics of the given cache.
+
+        :param str name: name of the cache, used as the cache label value
+        :param cache: the cache, which has hits, misses and hit_ratio attributes and a length, e.g. a TTLCache
+        """
+        self.__caches[name] = cache
+
+    def __hit_ratios(self) -> Dict[LabelValues, float]:
+        return {(name,): cache.hit_ratio for name, cache in self.__caches.items()}
+
+    def __lookups(self) -> Dict[LabelValues, float]:
+        lookups = {}
+        for name, cache in self.__caches.items():
+            lookups[(name, 'hit')] = cache.hits
+            lookups[(name, 'miss')] = cache.misses
+        return lookups
+
+    def __entries(self) -> Dict[LabelValues, float]:
+        return {(name,): len(cache) for name, cache in self.__caches.items()}
+
+
+# The app-wide cache metrics
+CACHE_METRICS = CacheMetrics()
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Optional
+
+from aiohttp import web
+
+from metrics.registry import MetricsRegistry, REGISTRY
+
+
+class EventLoopMonitor:
+    """Measures how long the event loop is blocked, by checking how late a periodic sleep wakes up.
+
+    A wake-up delay means that some code has been running on the loop without yielding, so all the other
+    coroutines, e.g. webhook handlers, had to wait for it.
+    """
+
+    def __init__(self, interval: float = 0.5, registry: MetricsRegistry = REGISTRY):
+        """Creates the monitor.
+
+        :param float interval: time in seconds between two measurements
+        :param MetricsRegistry registry: registry to record the measurements in
+        """
+        self.interval = interval
+
+        self.lag = registry.histogram(
+            'event_loop_lag_seconds', 'Delay of the event loop wake-ups, i.e. the time the loop was blocked.',
+            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+        self.blocked = registry.counter(
+            'event_loop_blocked_seconds_total', 'Total time the event loop was blocked for longer than 5ms.')
+
+        self.__task: Optional[asyncio.Task] = None
+
+    async def start(self, _app: web.Application = None) -> None:
+        """Starts monitoring. Can be used as an aiohttp startup hook."""
+        if self.__task is None:
+            self.__task = asyncio.ensure_future(self.__run())
+
+    async def stop(self, _app: web.Application = None) -> None:
+        """Stops monitoring. Can be used as an aiohttp cleanup hook."""
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def __run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0)
+
+            self.lag.observe(lag)
+            if lag > 0.005:
+                self.blocked.inc(lag)
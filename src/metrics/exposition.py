@@ -0,0 +1,61 @@
+from typing import Dict, Tuple, List
+
+from metrics.registry import MetricsRegistry, Metric, Histogram, REGISTRY
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def render_text(registry: MetricsRegistry = REGISTRY) -> str:
+    """Renders the registry's metrics in the Prometheus text exposition format.
+
+    The metrics are pre-aggregated, so rendering only formats their current values.
+    """
+    lines: List[str] = []
+    for metric in registry.metrics:
+        lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {metric.type_}")
+
+        # Copy the values, so the ones recorded while rendering don't change the dict being iterated
+        values = dict(metric.values)
+        if isinstance(metric, Histogram):
+            _render_histogram(metric, values, lines)
+        else:
+            for label_values, value in values.items():
+                lines.append(f"{metric.name}{_labels(metric, label_values)} {_number(value)}")
+
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def _render_histogram(metric: Histogram, values: Dict[Tuple[str, ...], List], lines: List[str]) -> None:
+    bounds = [_number(bound) for bound in metric.buckets] + ['+Inf']
+    for label_values, (counts, total, count) in values.items():
+        cumulative = 0
+        for bound, bucket_count in zip(bounds, counts):
+            cumulative += bucket_count
+            lines.append(f"{metric.name}_bucket{_labels(metric, label_values, ('le', bound))} {cumulative}")
+        lines.append(f"{metric.name}_sum{_labels(metric, label_values)} {_number(total)}")
+        lines.append(f"{metric.name}_count{_labels(metric, label_values)} {count}")
+
+
+def _labels(metric: Metric, label_values: Tuple[str, ...], extra: Tuple[str, str] = None) -> str:
+    pairs = list(zip(metric.label_names, label_values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -0,0 +1,154 @@
+import bisect
+from typing import Dict, Tuple, Iterable, Sequence, Callable, Optional, List
+
+# Default histogram buckets in seconds, suitable for latencies from a millisecond up to tens of seconds.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """Base class for metrics. A metric holds pre-aggregated values for each combination of its label values."""
+
+    type_ = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _label_values(self, labels: Dict[str, object]) -> LabelValues:
+        """Returns the values of the given labels in the order of :py:attr:`label_names`."""
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"[{type(self).__name__}]: {self.name} expects labels {self.label_names}, "
+                             f"but {tuple(labels)} were given.")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+class Counter(Metric):
+    """A monotonically increasing value. It can also be read by a callback at the collection time."""
+
+    type_ = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 callback: Callable[[], Dict[LabelValues, float]] = None):
+        """Creates the counter.
+
+        :param callback: optional function, which returns the values keyed by label values, when the counter is
+                         collected, e.g. from the counts kept by the measured object. The values must never decrease.
+        """
+        super(Counter, self).__init__(name, documentation, labels)
+        self.callback = callback
+        self.__values: Dict[LabelValues, float] = {}
+
+    @property
+    def values(self) -> Dict[LabelValues, float]:
+        if self.callback is not None:
+            return self.callback()
+        return self.__values
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        self.__values[key] = self.__values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value which can go up and down. It can also be computed by a callback at the collection time."""
+
+    type_ = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 callback: Callable[[], Dict[LabelValues, float]] = None):
+        """Creates the gauge.
+
+        :param callback: optional function, which returns the values keyed by label values, when the gauge is
+                         collected. It should be cheap, since it's called on each collection.
+        """
+        super(Gauge, self).__init__(name, documentation, labels)
+        self.callback = callback
+        self.__values: Dict[LabelValues, float] = {}
+
+    @property
+    def values(self) -> Dict[LabelValues, float]:
+        if self.callback is not None:
+            return self.callback()
+        return self.__values
+
+    def set(self, value: float, **labels) -> None:
+        self.__values[self._label_values(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._label_values(labels)
+        self.__values[key] = self.__values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Counts observed values in cumulative buckets and keeps their sum and count."""
+
+    type_ = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+        # label values -> [per-bucket counts (not cumulative, the last one is +Inf), sum, count]
+        self.values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._label_values(labels)
+        data = self.values.get(key)
+        if data is None:
+            data = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+        data[0][bisect.bisect_left(self.buckets, value)] += 1
+        data[1] += value
+        data[2] += 1
+
+
+class MetricsRegistry:
+    """Holds the app's metrics."""
+
+    def __init__(self):
+        self.__metrics: Dict[str, Metric] = {}
+
+    @property
+    def metrics(self) -> List[Metric]:
+        return list(self.__metrics.values())
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self.__metrics.get(name)
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = (),
+                callback: Callable[[], Dict[LabelValues, float]] = None) -> Counter:
+        """Returns the counter with the given name, registering it if it doesn't exist."""
+        return self.__register(Counter(name, documentation, labels, callback))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (),
+              callback: Callable[[], Dict[LabelValues, float]] = None) -> Gauge:
+        """Returns the gauge with the given name, registering it if it doesn't exist."""
+        return self.__register(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns the histogram with the given name, registering it if it doesn't exist."""
+        return self.__register(Histogram(name, documentation, labels, buckets))
+
+    def __register(self, metric: Metric):
+        """Registers the given metric, or returns the already registered one with the same name and type."""
+        existing = self.__metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                raise ValueError(f"[{MetricsRegistry.__name__}]: metric {metric.name} is already registered "
+                                 f"as {existing.type_} with labels {existing.label_names}.")
+            return existing
+
+        self.__metrics[metric.name] = metric
+        return metric
+
+
+# The app-wide registry
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,118 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Tuple
+
+import sentry_sdk
+
+from metrics.registry import MetricsRegistry, REGISTRY
+
+# Buckets of the stage durations in seconds. Most stages take from tens of microseconds to tens of milliseconds.
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class TurnTrace:
+    """Collects the durations of the stages of a single turn."""
+
+    __slots__ = ('channel', 'intent', 'started', 'stages')
+
+    def __init__(self, channel: str):
+        self.channel = channel or 'unknown'
+        self.intent = 'none'
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+
+class Tracer:
+    """Records the durations of the stages of the turn pipeline.
+
+    The stages of a turn are collected in its :py:class:`TurnTrace` and recorded as histograms when the turn ends,
+    so they can be tagged with the turn's intent, which is known only after the message is recognized. If Sentry
+    performance monitoring samples the request, each stage is also sent as a span of its transaction.
+    Stages outside of a turn, e.g. in background refreshes, aren't recorded.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        """Creates the tracer.
+
+        :param MetricsRegistry registry: registry to record the durations in
+        """
+        self.stage_seconds = registry.histogram(
+            'turn_stage_seconds', 'Duration of the stages of the turns.', ('stage', 'intent', 'channel'),
+            STAGE_BUCKETS)
+        self.turn_seconds = registry.histogram(
+            'turn_duration_seconds', 'Duration of the turns, from receiving the activity to responding to it.',
+            ('intent', 'channel'), STAGE_BUCKETS)
+        self.turns = registry.counter('turns_total', 'Processed turns.', ('intent', 'channel'))
+        self.in_flight = registry.gauge('turns_in_flight', 'Turns being processed.')
+        self.in_flight.set(0)
+
+        self.__current: ContextVar[Optional[TurnTrace]] = ContextVar('turn_trace', default=None)
+
+    @property
+    def current(self) -> Optional[TurnTrace]:
+        """The trace of the turn which is being processed in the current context, if any."""
+        return self.__current.get()
+
+    @contextmanager
+    def turn(self, channel: str):
+        """Traces a turn: the stages run within this context are recorded when it exits.
+
+        :param str channel: channel id of the turn's activity
+        """
+        trace = TurnTrace(channel)
+        token = self.__current.set(trace)
+        self.in_flight.inc()
+        try:
+            yield trace
+        finally:
+            self.__current.reset(token)
+            self.in_flight.dec()
+
+            labels = {'intent': trace.intent, 'channel': trace.channel}
+            self.turns.inc(**labels)
+            self.turn_seconds.observe(time.perf_counter() - trace.started, **labels)
+            for stage, duration in trace.stages:
+                self.stage_seconds.observe(duration, stage=stage, **labels)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Measures the duration of the code run within this context as the given stage of the current turn."""
+        trace = self.__current.get()
+        if trace is None:
+            yield
+            return
+
+        span = Tracer.__start_span(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.stages.append((name, time.perf_counter() - started))
+            if span is not None:
+                span.finish()
+
+    def mark(self, name: str) -> None:
+        """Records the time from the start of the current turn until now as the given stage."""
+        trace = self.__current.get()
+        if trace is not None:
+            trace.stages.append((name, time.perf_counter() - trace.started))
+
+    def set_intent(self, intent: str) -> None:
+        """Tags the current turn with the given intent."""
+        trace = self.__current.get()
+        if trace is not None:
+            trace.intent = intent
+            sentry_sdk.set_tag('intent', intent)
+
+    @staticmethod
+    def __start_span(name: str):
+        """Starts a Sentry span for the stage, if the current request is sampled for performance monitoring."""
+        parent = sentry_sdk.get_current_span()
+        if parent is None or not parent.sampled:
+            return None
+        return parent.start_child(op=f'turn.{name}', description=name)
+
+
+# The app-wide tracer
+TRACER = Tracer()
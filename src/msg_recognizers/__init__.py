@@ -6,3 +6,5 @@ from .convert_msg_recognizer import ConvertMsgRecognizer
 from .exchange_rate_msg_recognizer import ExchangeRateMsgRecognizer
 from .help_messages_recognizer import HelpMsgRecognizer
 from .user_pref_msg_recognizer import UserPrefMsgRecognizer
+from .alert_msg_recognizer import AlertMsgRecognizer
+from .intent_matcher import IntentMatcher
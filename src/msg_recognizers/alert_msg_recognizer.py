@@ -0,0 +1,45 @@
+from typing import Dict, List
+
+from msg_recognizers import MessageIntent, BaseMsgRecognizer
+
+# The last matched command wins, so the commands containing the others come after them
+_COMMANDS = {
+    'alert': [
+        'alert',
+        'notify',
+        'уведомить',
+        'уведоми',
+        'оповестить',
+        'ծանուցել',
+        'ծանուցիր',
+        'ծանուցում',
+    ],
+    'alerts': [
+        'alerts',
+        'my alerts',
+        'уведомления',
+        'оповещения',
+        'ծանուցումներ',
+    ],
+    'stop_alerts': [
+        'stop alerts',
+        'alerts off',
+        'cancel alerts',
+        'отключить уведомления',
+        'отменить уведомления',
+        'չեղարկել ծանուցումները',
+        'անջատել ծանուցումները',
+    ],
+}
+
+
+class AlertMsgRecognizer(BaseMsgRecognizer):
+    """Recognizes messages which are intended for managing rate alerts."""
+
+    @property
+    def _commands(self) -> Dict[str, List[str]]:
+        return _COMMANDS
+
+    @property
+    def _intent(self) -> MessageIntent:
+        return MessageIntent.alert
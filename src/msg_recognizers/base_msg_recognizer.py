@@ -19,12 +19,13 @@ class BaseMsgRecognizer(ABC):
         """Message intent for all messages which will be recognized by this recognizer."""
         pass
 
-    def recognize(self, message: str) -> Optional[RecognizedMessage]:
+    @staticmethod
+    def normalize(message: str) -> str:
         """
-        Tries to recognize the given message, by searching a command from :py:attr:`_commands` in that message.
+        Prepares the given message for recognition.
 
         :param message: Message which should be recognized
-        :return RecognizedMessage:
+        :return str:
         """
         # Convert the message to lowercase letters,
         #   remove the very first '/' sign and replace all '_' signs with spaces (' '),
@@ -34,6 +35,16 @@ class BaseMsgRecognizer(ABC):
         message = message.replace('_', ' ')
         if message.startswith('/'):
             message = message[1:]
+        return message
+
+    def recognize(self, message: str) -> Optional[RecognizedMessage]:
+        """
+        Tries to recognize the given message, by searching a command from :py:attr:`_commands` in that message.
+
+        :param message: Message which should be recognized
+        :return RecognizedMessage:
+        """
+        message = BaseMsgRecognizer.normalize(message)
 
         # For each command (and its synonyms) check whether the message contains it
         #   and if so, then set that command as the message action, and the other words as params.
@@ -20,14 +20,7 @@ class ConvertMsgRecognizer(BaseMsgRecognizer):
         :param message: Message which should be recognized
         :return RecognizedMessage:
         """
-        # Convert the message to lowercase letters,
-        #   remove the very first '/' sign and replace all '_' signs with spaces (' '),
-        #   which are used for commands in telegram
-        message = message.lower()
-        message = message.strip()
-        message = message.replace('_', ' ')
-        if message.startswith('/'):
-            message = message[1:]
+        message = BaseMsgRecognizer.normalize(message)
 
         # Try to find the first number in the message. Return None if there is no one, because this message is not
         #   recognizable.
@@ -41,6 +41,15 @@ _COMMANDS = {
         'իմբանկեր',
         'իմբանկը',
         'իմբանկ',
+    ],
+    'trend': [
+        'trend',
+        'trends',
+        'тренд',
+        'тренды',
+        'динамика',
+        'միտում',
+        'դինամիկա',
     ]
 }
 
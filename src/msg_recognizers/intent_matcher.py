@@ -0,0 +1,144 @@
+from collections import deque
+from typing import List, Dict, Tuple, Set
+
+from msg_recognizers import RecognizedMessage, MessageIntent, BaseMsgRecognizer
+
+
+class IntentMatcher:
+    """Recognizes a message with the given recognizers in a single pass over the message.
+
+    All the command synonyms of all the recognizers are compiled into one Aho-Corasick automaton, which finds every
+    synonym occurring in the message at once, instead of scanning the message for each synonym separately.
+    The result is the same as trying the recognizers one by one in the given order: the first recognizer which
+    recognizes the message wins, and within a recognizer the same command and synonym as in
+    :py:meth:`BaseMsgRecognizer.recognize` are chosen. Recognizers which override ``recognize`` are called as usual
+    at their position.
+    """
+
+    def __init__(self, recognizers: List[BaseMsgRecognizer]):
+        """Compiles the matcher.
+
+        :param recognizers: recognizers in the order of their priority
+        """
+        self.recognizers = list(recognizers)
+
+        # Pattern id -> (recognizer index, command index, synonym index)
+        self.__patterns: List[Tuple[int, int, int]] = []
+        # Recognizer index -> its commands in the order of the commands dict, and their synonyms
+        self.__commands: Dict[int, List[Tuple[str, List[str]]]] = {}
+        # Recognizer index -> pattern ids of its empty synonyms, which are contained in any message
+        self.__empty_patterns: Dict[int, List[int]] = {}
+
+        # The automaton: transitions, failure links and the pattern ids matched in each state
+        self.__goto: List[Dict[str, int]] = [{}]
+        self.__fail: List[int] = [0]
+        self.__output: List[Tuple[int, ...]] = [()]
+
+        for recognizer_index, recognizer in enumerate(self.recognizers):
+            if IntentMatcher.__has_custom_recognize(recognizer):
+                continue
+
+            commands = list(recognizer._commands.items())  # pylint: disable=protected-access
+            self.__commands[recognizer_index] = commands
+            for command_index, (_, synonyms) in enumerate(commands):
+                for synonym_index, synonym in enumerate(synonyms):
+                    pattern_id = len(self.__patterns)
+                    self.__patterns.append((recognizer_index, command_index, synonym_index))
+                    if synonym:
+                        self.__add_pattern(synonym, pattern_id)
+                    else:
+                        self.__empty_patterns.setdefault(recognizer_index, []).append(pattern_id)
+
+        self.__build_failure_links()
+
+    def recognize(self, message: str) -> RecognizedMessage:
+        """Recognizes the given message.
+
+        :param str message: message which needs to be recognized
+        :return RecognizedMessage: recognized message with intent and action attributes,
+                    or instance of RecognizedMessage with the unrecognized intent.
+        """
+        normalized = BaseMsgRecognizer.normalize(message)
+        matches = self.__find_matches(normalized)
+
+        for recognizer_index, recognizer in enumerate(self.recognizers):
+            if recognizer_index not in self.__commands:
+                rec_message = recognizer.recognize(message)
+                if rec_message is not None:
+                    return rec_message
+                continue
+
+            # The last matched command wins, with its first matched synonym.
+            best = None
+            for pattern_id in matches.get(recognizer_index, ()):
+                _, command_index, synonym_index = self.__patterns[pattern_id]
+                if best is None or command_index > best[0] or command_index == best[0] and synonym_index < best[1]:
+                    best = (command_index, synonym_index)
+
+            if best is not None:
+                command, synonyms = self.__commands[recognizer_index][best[0]]
+                params = normalized.replace(synonyms[best[1]], '', 1).strip().split(' ')
+                return RecognizedMessage(recognizer._intent, command, params)  # pylint: disable=protected-access
+
+        return RecognizedMessage(MessageIntent.unknown_intent)
+
+    def __find_matches(self, message: str) -> Dict[int, Set[int]]:
+        """Finds all synonyms contained in the message in one pass.
+
+        :return: matched pattern ids grouped by recognizer index
+        """
+        goto = self.__goto
+        fail = self.__fail
+        output = self.__output
+        patterns = self.__patterns
+
+        matched = set()
+        state = 0
+        for char in message:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matched.update(output[state])
+
+        matches = {}
+        for pattern_id in matched:
+            matches.setdefault(patterns[pattern_id][0], set()).add(pattern_id)
+        for recognizer_index, pattern_ids in self.__empty_patterns.items():
+            matches.setdefault(recognizer_index, set()).update(pattern_ids)
+
+        return matches
+
+    def __add_pattern(self, pattern: str, pattern_id: int) -> None:
+        """Adds the pattern to the automaton's trie."""
+        state = 0
+        for char in pattern:
+            next_state = self.__goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.__goto)
+                self.__goto[state][char] = next_state
+                self.__goto.append({})
+                self.__fail.append(0)
+                self.__output.append(())
+            state = next_state
+
+        self.__output[state] += (pattern_id,)
+
+    def __build_failure_links(self) -> None:
+        """Computes the failure links breadth-first, and merges the outputs of the states linked by them."""
+        queue = deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.__goto[state].items():
+                queue.append(next_state)
+
+                fail_state = self.__fail[state]
+                while fail_state and char not in self.__goto[fail_state]:
+                    fail_state = self.__fail[fail_state]
+                self.__fail[next_state] = self.__goto[fail_state].get(char, 0)
+                self.__output[next_state] += self.__output[self.__fail[next_state]]
+
+    @staticmethod
+    def __has_custom_recognize(recognizer: BaseMsgRecognizer) -> bool:
+        """Checks whether the recognizer doesn't use the generic command-words logic."""
+        return type(recognizer).recognize is not BaseMsgRecognizer.recognize
@@ -7,5 +7,6 @@ class MessageIntent(Enum):
     contact = 10
     preferences = 20
     exchange_rate = 30
+    alert = 35
     currency_converter = 40
     unknown_intent = 100
@@ -4,3 +4,4 @@ from .contact_msg_responder import ContactMsgResponder
 from .convert_msg_responder import ConvertMsgResponder
 from .exchange_rate_msg_responder import ExchangeRateMsgResponder
 from .help_msg_responder import HelpMsgResponder
+from .alert_msg_responder import AlertMsgResponder
@@ -0,0 +1,123 @@
+import re
+import time
+import uuid
+from typing import Union, List, Tuple
+
+from botbuilder.core import ConversationState, UserState, TurnContext
+from botbuilder.dialogs import Dialog
+from botbuilder.schema import Activity
+
+from alerts import RateAlert, RateAlerts
+from bot_data import banks, Currency
+from bot_data.currency import RUR_CLUES
+from data_models import UserPreferences
+from exchange_rates_informers import ExchangeRatesInformer, Rate
+from msg_recognizers import RecognizedMessage, MessageIntent
+from msg_responders import BaseMsgResponder
+from resources import ResponseMsgs
+
+# Words, by which users mention the sell rate and the cash rates in messages
+_SELL_CLUES = ['sell', 'վաճառք', 'վաճառքի', 'продажа', 'продажу', 'продажи']
+_CASH_CLUES = ['cash', 'կանխիկ', 'наличные', 'наличный', 'наличка']
+
+
+class AlertMsgResponder(BaseMsgResponder):
+    """Represents a message responder which creates responses for messages concerning rate alerts."""
+
+    def __init__(self, conversation_state: ConversationState, user_state: UserState,
+                 informer: ExchangeRatesInformer, alerts: RateAlerts):
+        super(AlertMsgResponder, self).__init__(conversation_state, user_state)
+        self.informer = informer
+        self.alerts = alerts
+
+        self.actions = {
+            'alert': self._add_alert,
+            'alerts': self._get_alerts,
+            'stop_alerts': self._stop_alerts,
+        }
+
+    async def can_respond(self, recognized_message: RecognizedMessage, channel: str, **kwargs) -> bool:
+        return recognized_message.intent is MessageIntent.alert and recognized_message.action in self.actions
+
+    async def create_response(self, recognized_message: RecognizedMessage, channel: str,
+                              original_msg: str,
+                              user_preferences: UserPreferences, **kwargs) \
+            -> Union[str, Activity, Tuple, List[str], Dialog]:
+        action = self.actions.get(recognized_message.action)
+
+        # Raise an exception if the action is not supported.
+        # This situation is typical for cases when this method is called without first calling :py:meth:`can_respond`.
+        if action is None:
+            raise Exception(f"{AlertMsgResponder.__name__}: unsupported action {recognized_message.action}.")
+
+        # Alerts belong to the conversation, to which they will be sent
+        turn_context: TurnContext = kwargs['turn_context']
+        conversation_key = self.conversation_state.get_storage_key(turn_context)
+
+        return await action(recognized_message=recognized_message, user_preferences=user_preferences,
+                            channel=channel, conversation_key=conversation_key)
+
+    async def _add_alert(self, recognized_message: RecognizedMessage, user_preferences: UserPreferences,
+                         channel: str, conversation_key: str, **kwargs) -> str:
+        """Adds an alert for the rate of user bank given in the message, e.g. 'alert sell ₽ cash 6.2'.
+
+        :param RecognizedMessage recognized_message: recognized message which contains the params of the alert
+        :param UserPreferences user_preferences: user preferences
+        :param str channel: channel id from which the message came
+        :param str conversation_key: storage key of the conversation
+        :return str: message which tells whether the alert was added
+        """
+        lang = user_preferences.lang
+
+        # Get the threshold from the message params. Without it, tell how to add an alert.
+        n_re = re.search(r"\d+([.,]\d+)?", ' '.join(recognized_message.params))
+        if n_re is None:
+            return ResponseMsgs.get('alert_usage', lang)
+
+        if len(self.alerts.get_alerts(conversation_key)) >= self.alerts.max_per_conversation:
+            return ResponseMsgs.get('alert_limit', lang, n=self.alerts.max_per_conversation)
+
+        alert = RateAlert(
+            uuid.uuid4().hex, conversation_key, lang, banks.get_by_id(user_preferences.bank).id_,
+            Currency.rur if self._has_clue(recognized_message.params, RUR_CLUES) else Currency.usd,
+            not self._has_clue(recognized_message.params, _CASH_CLUES),
+            not self._has_clue(recognized_message.params, _SELL_CLUES),
+            Rate.parse(n_re.group().replace(',', '.')).minor_units, time.time())
+
+        # Check the alert against the current rate, since it's sent only when the rate reaches the threshold
+        snapshot = await self.informer.get_snapshot(lang, alert.non_cash)
+        bank = snapshot.get_bank(alert.key[1])
+        if bank is None:
+            raise KeyError(f"[{AlertMsgResponder.__name__}]: no bank with id {alert.key[1]}.")
+
+        exchange_rate = bank.rates[list(Currency).index(alert.curr)]
+        rate = exchange_rate.buy if alert.buy else exchange_rate.sell
+        if not rate:
+            return ResponseMsgs.get('no_rate', lang)
+
+        now_msg = ResponseMsgs.get('alert_now', lang, rate=rate)
+        if alert.is_reached(rate.minor_units):
+            return f"{ResponseMsgs.get('alert_reached', lang)}\n\n{alert.describe(channel)}\n\n{now_msg}"
+
+        await self.alerts.subscribe(alert)
+        return f"{ResponseMsgs.get('alert_saved', lang)}\n\n{alert.describe(channel)}\n\n{now_msg}"
+
+    async def _get_alerts(self, user_preferences: UserPreferences, channel: str, conversation_key: str,
+                          **kwargs) -> str:
+        """Returns the alerts of the conversation."""
+        lang = user_preferences.lang
+
+        alerts = self.alerts.get_alerts(conversation_key)
+        if not alerts:
+            return ResponseMsgs.get('no_alerts', lang)
+
+        return ResponseMsgs.get('alerts', lang) + '<br/>'.join(alert.describe(channel) + '\n\n' for alert in alerts)
+
+    async def _stop_alerts(self, user_preferences: UserPreferences, conversation_key: str, **kwargs) -> str:
+        """Removes all alerts of the conversation."""
+        lang = user_preferences.lang
+
+        if not await self.alerts.unsubscribe(conversation_key):
+            return ResponseMsgs.get('no_alerts', lang)
+
+        return ResponseMsgs.get('alerts_stopped', lang)
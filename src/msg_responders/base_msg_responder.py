@@ -1,12 +1,16 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Dict, Iterable
 
 from botbuilder.core import ConversationState, UserState
 from botbuilder.dialogs import Dialog
 from botbuilder.schema import Activity
 
+from bot_data import Language
+from config import InformerConfig
 from data_models import UserPreferences
 from msg_recognizers import RecognizedMessage
+from resources import ResponseMsgs
 
 
 class BaseMsgResponder(ABC):
@@ -40,3 +44,28 @@ class BaseMsgResponder(ABC):
                     or Dialog to run it
         """
         pass
+
+    @staticmethod
+    def _has_clue(params: Union[Dict, List], clues: Iterable[str]) -> bool:
+        """Checks whether any of the clues is in params. A clue ending with '*' matches any param starting with it."""
+        if isinstance(params, dict):
+            params = params.values()
+        params = list(params)
+
+        return any(
+            any(param.startswith(clue[:-1]) if clue.endswith('*') else clue == param for param in params)
+            for clue in clues)
+
+    @staticmethod
+    def _get_stale_notice(lang: Language, created_at: float) -> str:
+        """Returns a notice of how old the rates are, if they are too old, e.g. because rate.am is unavailable.
+        Returns an empty string for fresh rates.
+
+        :param Language lang: language of the notice
+        :param float created_at: unix time when the rates were got
+        """
+        age = time.time() - created_at
+        if age < InformerConfig.STALE_NOTICE_AGE:
+            return ''
+
+        return ResponseMsgs.get('stale_rates', lang, minutes=int(age // 60))
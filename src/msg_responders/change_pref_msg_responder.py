@@ -6,6 +6,7 @@ from botbuilder.schema import Activity
 
 from data_models import UserPreferences
 from dialogs import UserPreferencesDialog
+from http_client import SharedHttpClient
 from msg_responders import BaseMsgResponder
 from msg_recognizers import RecognizedMessage, MessageIntent
 
@@ -13,9 +14,9 @@ from msg_recognizers import RecognizedMessage, MessageIntent
 class ChangePrefMsgResponder(BaseMsgResponder):
     """Represents a message responder which creates responses for messages concerning user preferences."""
 
-    def __init__(self, conversation_state: ConversationState, user_state: UserState):
+    def __init__(self, conversation_state: ConversationState, user_state: UserState, http_client: SharedHttpClient):
         super(ChangePrefMsgResponder, self).__init__(conversation_state, user_state)
-        self.user_pref_dialog = UserPreferencesDialog('user_prefs', user_state)
+        self.user_pref_dialog = UserPreferencesDialog('user_prefs', user_state, http_client)
         pass
 
     async def can_respond(self, recognized_message: RecognizedMessage, channel: str, **kwargs) -> bool:
@@ -1,13 +1,15 @@
 import asyncio
-from typing import Union, Tuple, List, Dict
+from decimal import Decimal
+from typing import Union, Tuple, List, Dict, Optional
 
 from botbuilder.core import ConversationState, UserState
 from botbuilder.dialogs import Dialog
 from botbuilder.schema import Activity
 
-from bot_data import banks, Language
+from bot_data import banks, Language, Currency
+from bot_data.currency import RUR_CLUES
 from data_models import UserPreferences
-from exchange_rates_informers import ExchangeRatesInformer, ExchangeRate, Bank
+from exchange_rates_informers import ExchangeRatesInformer, RateMatrix
 from msg_responders import BaseMsgResponder
 from msg_recognizers import RecognizedMessage, MessageIntent
 from resources import ResponseMsgs
@@ -17,12 +19,17 @@ class ConvertMsgResponder(BaseMsgResponder):
     """Represents a message responder which creates responses for messages concerning currency conversions."""
 
     __AMD = ['֏', 'amd', 'dram', 'drams', 'драм', 'драмов', 'драмы', 'драма', 'դրամ']
+    # Words, by which users ask to convert with the rates of all banks. Clues ending with '*' match word beginnings.
+    __BEST = ['best', 'лучш*', 'լավագույն*']
 
     def __init__(self, conversation_state: ConversationState, user_state: UserState,
                  informer: ExchangeRatesInformer):
         super(ConvertMsgResponder, self).__init__(conversation_state, user_state)
         self.informer = informer
 
+        # Rate matrices keyed by language, each one built from the latest snapshots of the informer
+        self.__matrices: Dict[Language, RateMatrix] = {}
+
     async def can_respond(self, recognized_message: RecognizedMessage, channel: str, **kwargs) -> bool:
         return recognized_message.intent is MessageIntent.currency_converter
 
@@ -32,10 +39,6 @@ class ConvertMsgResponder(BaseMsgResponder):
         lang = user_preferences.lang
         bank_id = banks.get_by_id(user_preferences.bank).rate_am_id
 
-        b_non_cash, b_cash = await asyncio.gather(
-            self.informer.get_bank_rates(bank_id, lang),
-            self.informer.get_bank_rates(bank_id, lang, non_cash=False))
-
         # Try to get the amount from params
         n = ConvertMsgResponder.__get_param(recognized_message.params, 'amount', 0)
         if n is not None:
@@ -49,7 +52,7 @@ class ConvertMsgResponder(BaseMsgResponder):
                 if len(int_part) > 9:
                     return ResponseMsgs.get('err_n_big', lang)
 
-                n = float(f"{int_part}.{fr_part}")
+                n = Decimal(f"{int_part}.{fr_part}")
 
                 if n == 0:
                     # n == 0
@@ -57,7 +60,7 @@ class ConvertMsgResponder(BaseMsgResponder):
                         return ResponseMsgs.get('err_n_0', lang)
                     # n < 0.01
                     return ResponseMsgs.get('err_n_small', lang)
-            except ValueError:
+            except ArithmeticError:
                 n = None
 
         if n is None:
@@ -67,30 +70,50 @@ class ConvertMsgResponder(BaseMsgResponder):
         to_amd = not any(
             ConvertMsgResponder.__check_param(recognized_message.params, dram) for dram in ConvertMsgResponder.__AMD)
 
-        # Convert currencies
-        convert = (lambda x: float(x) * n) if to_amd else (lambda x: n / float(x))
-        for data in (b_non_cash, b_cash):
-            rates = []
-            for rate in data.rates:
-                buy = convert(rate.buy) if rate.buy else ''
-                sell = convert(rate.sell) if rate.sell else ''
-                rates.append(ExchangeRate(rate.cur, buy, sell))
-            data.rates = rates
+        amount = int(n.scaleb(2))
+        matrix = await self.__get_matrix(lang)
+
+        # Convert with the rates of all banks if the user asks for the best ones
+        if self._has_clue(recognized_message.params, ConvertMsgResponder.__BEST):
+            cur = Currency.rur if self._has_clue(recognized_message.params, RUR_CLUES) else Currency.usd
+            res_msgs = ConvertMsgResponder.__create_best_res_msgs(matrix, amount, cur, lang, channel, bank_id, to_amd)
+            return res_msgs[0], res_msgs[1] + self._get_stale_notice(lang, matrix.created_at)
+
+        # Convert with all rates of the user bank
+        bank = matrix.get_bank(bank_id)
+        if bank is None:
+            raise KeyError(f"[{ConvertMsgResponder.__name__}]: no bank with id {bank_id}.")
+        converted = matrix.convert_bank(bank_id, amount, to_amd)
 
         # Message formatting: bold
         b = '**' if not channel == 'facebook' else ''
 
         # Construct the result message
-        header = f"{b}{b_non_cash.name} ({b_non_cash.update_time}){b}\n\n"
+        header = f"{b}{bank.name} ({bank.update_time}){b}\n\n"
         non_cash = f"<br/>{ResponseMsgs.get('non_cash', lang)}\n\n---\n\n"
         cash = f"<br/>{ResponseMsgs.get('cash', lang)}\n\n---\n\n"
 
-        rate_msgs = []
+        # The converted amounts of non-cash rates come first, then the ones of cash rates
+        half = len(converted) // 2
+        rate_msgs = [ConvertMsgResponder.__create_res_msg(rates, n, lang, to_amd)
+                     for rates in (converted[:half], converted[half:])]
 
-        for data in (b_non_cash, b_cash):
-            rate_msgs.append(ConvertMsgResponder.__create_res_msg(data, n, lang, to_amd))
+        return header + non_cash + rate_msgs[0] + cash + rate_msgs[1] + self._get_stale_notice(lang, matrix.created_at)
 
-        return header + non_cash + rate_msgs[0] + cash + rate_msgs[1]
+    async def __get_matrix(self, lang: Language) -> RateMatrix:
+        """Returns the rate matrix of the current snapshots, building it only once per snapshots versions."""
+        snapshot_non_cash, snapshot_cash = await asyncio.gather(
+            self.informer.get_snapshot(lang), self.informer.get_snapshot(lang, non_cash=False))
+
+        matrix = self.__matrices.get(lang)
+        if matrix is None or matrix.versions != (snapshot_non_cash.version, snapshot_cash.version):
+            matrix = RateMatrix(snapshot_non_cash, snapshot_cash)
+            self.__matrices[lang] = matrix
+        else:
+            # The rates are the same, but they may have been got again since the matrix was built
+            matrix.created_at = min(snapshot_non_cash.created_at, snapshot_cash.created_at)
+
+        return matrix
 
     @staticmethod
     def __get_param(params: Union[Dict, List], name: str, pos: int = None):
@@ -111,28 +134,70 @@ class ConvertMsgResponder(BaseMsgResponder):
         return value in params
 
     @staticmethod
-    def __create_res_msg(bank: Bank, n: float, lang: Language, to_amd=True):
+    def __create_best_res_msgs(matrix: RateMatrix, amount: int, cur: Currency, lang: Language, channel: str,
+                               user_bank: str, to_amd=True) -> Tuple[str, str]:
+        """Creates messages with the amount converted with the rates of all banks, the best ones first.
+
+        The amount is converted with buy rates to AMD and with sell rates from AMD, so in both cases the more
+        the user gets the better.
+        """
+        # Message formatting: bold and italic
+        b = '**'
+        i = '*'
+        if channel == 'facebook':
+            b = ''
+            i = "'"
+
+        cur_msg = 'n_rur' if cur is Currency.rur else 'n_usd'
+        from_msg, to_msg = (cur_msg, 'n_amd') if to_amd else ('n_amd', cur_msg)
+        side, side_msg = (RateMatrix.BUY, 'buy') if to_amd else (RateMatrix.SELL, 'sell')
+        amount_msg = ResponseMsgs.get(from_msg, n=RateMatrix.from_minor_units(amount))
+
+        res_msgs = []
+        for non_cash in (True, False):
+            converted = matrix.convert_all(cur, side, amount, non_cash, to_amd)
+            results = sorted(((value, bank) for value, bank in zip(converted, matrix.banks) if value is not None),
+                             key=lambda x: (-x[0], x[1].name))
+
+            rows = '\n\n'.join(
+                f"{ResponseMsgs.get(to_msg, n=RateMatrix.from_minor_units(value))} | " +
+                (f'{i}{bank.name}{i}' if bank.id_ == user_bank else bank.name)
+                for value, bank in results)
+
+            res_msgs.append(
+                f"{b}{amount_msg}, {ResponseMsgs.get('non_cash' if non_cash else 'cash', lang)} "
+                f"({ResponseMsgs.get(side_msg, lang)}){b}\n\n"
+                "-----\n\n"
+                f"{rows}\n\n")
+
+        return res_msgs[0], res_msgs[1]
+
+    @staticmethod
+    def __create_res_msg(rates: List[Optional[int]], n: Decimal, lang: Language, to_amd=True):
+        """Creates a message with the amount converted with the (usd buy, usd sell, rur buy, rur sell) rates."""
+        usd_buy, usd_sell, rur_buy, rur_sell = (
+            RateMatrix.from_minor_units(rate) if rate is not None else None for rate in rates)
         if to_amd:
             return (
                 f"{ResponseMsgs.get('n_usd', n=n)} ({ResponseMsgs.get('buy', lang)}) - "
-                f"{ResponseMsgs.get('n_amd', n=bank.rates[0].buy) if bank.rates[0].buy else ''}\n\n"
+                f"{ResponseMsgs.get('n_amd', n=usd_buy) if usd_buy else ''}\n\n"
                 f"{ResponseMsgs.get('n_usd', n=n)} ({ResponseMsgs.get('sell', lang)}) - "
-                f"{ResponseMsgs.get('n_amd', n=bank.rates[0].sell) if bank.rates[0].sell else ''}\n\n"
+                f"{ResponseMsgs.get('n_amd', n=usd_sell) if usd_sell else ''}\n\n"
                 f"{ResponseMsgs.get('n_rur', n=n)} ({ResponseMsgs.get('buy', lang)}) - "
-                f"{ResponseMsgs.get('n_amd', n=bank.rates[1].buy) if bank.rates[1].buy else ''}\n\n"
+                f"{ResponseMsgs.get('n_amd', n=rur_buy) if rur_buy else ''}\n\n"
                 f"{ResponseMsgs.get('n_rur', n=n)} ({ResponseMsgs.get('sell', lang)}) - "
-                f"{ResponseMsgs.get('n_amd', n=bank.rates[1].sell) if bank.rates[1].sell else ''}\n\n")
+                f"{ResponseMsgs.get('n_amd', n=rur_sell) if rur_sell else ''}\n\n")
         else:
             return (
-                f"{ResponseMsgs.get('n_usd', n=bank.rates[0].buy) if bank.rates[0].buy else ''}"
+                f"{ResponseMsgs.get('n_usd', n=usd_buy) if usd_buy else ''}"
                 f" ({ResponseMsgs.get('buy', lang)}) - "
                 f"{ResponseMsgs.get('n_amd', n=n)}\n\n"
-                f"{ResponseMsgs.get('n_usd', n=bank.rates[0].sell) if bank.rates[0].sell else ''}"
+                f"{ResponseMsgs.get('n_usd', n=usd_sell) if usd_sell else ''}"
                 f" ({ResponseMsgs.get('sell', lang)}) - "
                 f"{ResponseMsgs.get('n_amd', n=n)}\n\n"
-                f"{ResponseMsgs.get('n_rur', n=bank.rates[1].buy) if bank.rates[1].buy else ''}"
+                f"{ResponseMsgs.get('n_rur', n=rur_buy) if rur_buy else ''}"
                 f" ({ResponseMsgs.get('buy', lang)}) - "
                 f"{ResponseMsgs.get('n_amd', n=n)}\n\n"
-                f"{ResponseMsgs.get('n_rur', n=bank.rates[1].sell) if bank.rates[1].sell else ''}"
+                f"{ResponseMsgs.get('n_rur', n=rur_sell) if rur_sell else ''}"
                 f" ({ResponseMsgs.get('sell', lang)}) - "
                 f"{ResponseMsgs.get('n_amd', n=n)}\n\n")
@@ -1,27 +1,55 @@
 import asyncio
-from typing import Union, List, Tuple
+import time
+from decimal import Decimal
+from typing import Union, List, Tuple, Dict, NamedTuple
 
 from botbuilder.core import ConversationState, UserState, CardFactory, MessageFactory
 from botbuilder.dialogs import Dialog
 from botbuilder.schema import Activity, HeroCard, CardAction, ActionTypes
 
 from bot_data import banks, Currency, Language
+from bot_data.currency import RUR_CLUES
 from data_models import UserPreferences
-from exchange_rates_informers import ExchangeRatesInformer
+from exchange_rates_informers import ExchangeRatesInformer, RatesSnapshot, RateHistory, RateStats
 from msg_responders import BaseMsgResponder
 from msg_recognizers import RecognizedMessage, MessageIntent
 from resources import ResponseMsgs
 
 
+class _BanksTable(NamedTuple):
+    """A rendered message with a table of banks and their rates."""
+    header: str
+    footer: str
+    rows: Tuple[str, ...]
+    user_rows: Tuple[str, ...]
+    positions: Dict[str, int]
+
+    def with_user_bank(self, user_bank: str) -> str:
+        """Returns the message, in which the user bank is highlighted and brought to the front of the table."""
+        position = self.positions.get(user_bank)
+        if position is None:
+            rows = self.rows
+        else:
+            rows = (self.user_rows[position],) + self.rows[:position] + self.rows[position + 1:]
+
+        return self.header + '\n\n'.join(rows) + self.footer
+
+
 class ExchangeRateMsgResponder(BaseMsgResponder):
     """Represents a message responder which creates responses for messages concerning exchange rates."""
 
-    __RUR = ['₽', 'ru', 'rur', 'rub*', 'rus*', 'ру', 'руб*', 'рус*', 'рос*', 'ռուս*', 'ռուբ*']
+    # Number of last hours, for which the trend of the rates is shown
+    TREND_HOURS = 24
 
     def __init__(self, conversation_state: ConversationState, user_state: UserState,
-                 informer: ExchangeRatesInformer):
+                 informer: ExchangeRatesInformer, history: RateHistory = None):
         super(ExchangeRateMsgResponder, self).__init__(conversation_state, user_state)
         self.informer = informer
+        self.history = history
+
+        # Rendered banks tables keyed by (lang, currency, channel, non_cash), along with the version of the snapshot
+        #   they were rendered from. A table is rendered again only when the informer returns a new snapshot.
+        self.__tables: Dict[Tuple, Tuple[int, _BanksTable]] = {}
 
         self.actions = {
             'all': self._get_all,
@@ -29,6 +57,10 @@ class ExchangeRateMsgResponder(BaseMsgResponder):
             'mybank': self._get_user_bank_rates
         }
 
+        # The trend is shown only if the history of the rates is kept
+        if history is not None:
+            self.actions['trend'] = self._get_user_bank_trend
+
         for bank in banks.BANKS:
             self.actions[bank.id_.value] = self._get_bank_rates
 
@@ -63,67 +95,67 @@ class ExchangeRateMsgResponder(BaseMsgResponder):
         user_bank_id = banks.get_by_id(user_preferences.bank).rate_am_id
         lang = user_preferences.lang
 
-        # Message formatting: bold and italic
-        b = '**'
-        i = '*'
-        if channel == 'facebook':
-            b = "'"
-            i = "'"
-
         cur = Currency.usd
 
         # Get the currency from message params
-        params = recognized_message.params
-        if isinstance(params, dict):
-            params = params.values()
+        if self._has_clue(recognized_message.params, RUR_CLUES):
+            cur = Currency.rur
 
-        def is_in_params(clue):
-            return any(
-                param.startswith(clue[:-1]) if clue.endswith('*') else clue == param for param in params)
+        # Get the snapshots of both non-cash and cash rates, and the tables rendered from them
+        snapshot_non_cash, snapshot_cash = await asyncio.gather(
+            self.informer.get_snapshot(lang), self.informer.get_snapshot(lang, non_cash=False))
 
-        if any(is_in_params(rur) for rur in ExchangeRateMsgResponder.__RUR):
-            cur = Currency.rur
+        table_non_cash = self.__get_banks_table(snapshot_non_cash, lang, cur, channel, True)
+        table_cash = self.__get_banks_table(snapshot_cash, lang, cur, channel, False)
 
-        # Get the best rates values and all banks rates for both non-cash and cash types
-        ((best_non_cash, banks_non_cash), (best_cash, banks_cash)) = await asyncio.gather(
-            self.informer.get_all(lang, cur), self.informer.get_all(lang, cur, non_cash=False))
+        # Highlight the user bank and bring it to the front of the list
+        stale_notice = self._get_stale_notice(lang, min(snapshot_non_cash.created_at, snapshot_cash.created_at))
+        return table_non_cash.with_user_bank(user_bank_id), table_cash.with_user_bank(user_bank_id) + stale_notice
 
-        # Sort banks by name
-        banks_non_cash.sort(key=lambda x: x.name)
-        banks_cash.sort(key=lambda x: x.name)
+    def __get_banks_table(self, snapshot: RatesSnapshot, lang: Language, cur: Currency, channel: str,
+                          non_cash: bool) -> _BanksTable:
+        """Returns the table of the given snapshot's banks, rendering it only once per snapshot version."""
+        key = (lang, cur, channel, non_cash)
+        cached = self.__tables.get(key)
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
 
-        # Bring the user bank to the front of the list
-        for b_nc in banks_non_cash:
-            if b_nc.id_ == user_bank_id:
-                break
-        else:
-            b_nc = None
-        if b_nc:
-            banks_non_cash.remove(b_nc)
-            banks_non_cash.insert(0, b_nc)
-
-        for b_c in banks_cash:
-            if b_c.id_ == user_bank_id:
-                break
-        else:
-            b_c = None
-        if b_c:
-            banks_cash.remove(b_c)
-            banks_cash.insert(0, b_c)
+        table = ExchangeRateMsgResponder.__render_banks_table(snapshot, lang, cur, channel, non_cash)
 
-        # Create a table-like text for both cash and non-cash types. Bank name is in the end of row, because otherwise
-        #   the message doesn't look like a table, since bank names have different lengths.
-        # Highlight best rates and user bank.
-        non_cash_table = ExchangeRateMsgResponder.__create_banks_table(banks_non_cash, best_non_cash[0],
-                                                                       best_non_cash[1], b, i, channel, user_bank_id)
+        # Tables of the previous snapshot are replaced, so the cache never grows beyond the number of keys.
+        self.__tables[key] = (snapshot.version, table)
+        return table
 
-        cash_table = ExchangeRateMsgResponder.__create_banks_table(banks_cash, best_cash[0],
-                                                                   best_cash[1], b, i, channel, user_bank_id)
+    @staticmethod
+    def __render_banks_table(snapshot: RatesSnapshot, lang: Language, cur: Currency, channel: str,
+                             non_cash: bool) -> _BanksTable:
+        """Renders the message with a table of the given snapshot's banks, without highlighting the user bank."""
+        # Message formatting: bold and italic
+        b = '**'
+        i = '*'
+        if channel == 'facebook':
+            b = "'"
+            i = "'"
+
+        # Sort banks by name
+        banks_ = sorted(snapshot.get_banks(cur), key=lambda x: x.name)
+        best_buy, best_sell = snapshot.get_best(cur)
+
+        # Create a table-like text. Bank name is in the end of row, because otherwise
+        #   the message doesn't look like a table, since bank names have different lengths.
+        # Highlight best rates. The user bank row is highlighted when the table is used.
+        rows = []
+        user_rows = []
+        for bank in banks_:
+            rates = (f"{f'{b}{bank.rates[0].buy}{b}' if bank.rates[0].buy == best_buy else bank.rates[0].buy} | " +
+                     f"{f'{b}{bank.rates[0].sell}{b}' if bank.rates[0].sell == best_sell else bank.rates[0].sell} | ")
+            name = ExchangeRateMsgResponder.__truncate_bank_name(bank.name, channel)
+            rows.append(rates + name)
+            user_rows.append(f'{rates}{i}{name}{i}')
 
         # Construct the result message
         currency_msg = ResponseMsgs.get('n_rur' if cur is Currency.rur else 'n_usd', n=1)
-        non_cash_msg = ResponseMsgs.get('non_cash', lang)
-        cash_msg = ResponseMsgs.get('cash', lang)
+        type_msg = ResponseMsgs.get('non_cash' if non_cash else 'cash', lang)
         table_header_msg = (f"{ResponseMsgs.get('buy', lang)} | "
                             f"{ResponseMsgs.get('sell', lang)} | "
                             f"{ResponseMsgs.get('bank_name', lang)}")
@@ -131,21 +163,15 @@ class ExchangeRateMsgResponder(BaseMsgResponder):
         # Don't highlight headers for fb
         if b == "'":
             b = ''
-        res_msg_non_cash = (
-            f"{b}{currency_msg}, {non_cash_msg}{b}\n\n\n\n"
+        header = (
+            f"{b}{currency_msg}, {type_msg}{b}\n\n\n\n"
             f"{table_header_msg}\n\n"
             "-----\n\n"
-            f"{non_cash_table}"
         )
+        footer = '' if non_cash else '\n\n'
 
-        res_msg_cash = (
-            f"{b}{currency_msg}, {cash_msg}{b}\n\n\n\n"
-            f"{table_header_msg}\n\n"
-            "-----\n\n"
-            f"{cash_table}\n\n"
-        )
-
-        return res_msg_non_cash, res_msg_cash
+        return _BanksTable(header, footer, tuple(rows), tuple(user_rows),
+                           {bank.id_: position for position, bank in enumerate(banks_)})
 
     async def _get_user_bank_rates(self, user_preferences: UserPreferences, channel: str, **kwargs) -> str:
         """Gets buy and sell exchange rates for all supported currencies at user bank.
@@ -176,9 +202,13 @@ class ExchangeRateMsgResponder(BaseMsgResponder):
 
     async def __get_rates_by_bank_id(self, bank_id: str, lang: Language, channel: str):
         """Returns exchange rates at the given bank."""
-        b_non_cash, b_cash = await asyncio.gather(
-            self.informer.get_bank_rates(bank_id, lang),
-            self.informer.get_bank_rates(bank_id, lang, non_cash=False))
+        snapshot_non_cash, snapshot_cash = await asyncio.gather(
+            self.informer.get_snapshot(lang), self.informer.get_snapshot(lang, non_cash=False))
+
+        b_non_cash = snapshot_non_cash.get_bank(bank_id)
+        b_cash = snapshot_cash.get_bank(bank_id)
+        if b_non_cash is None or b_cash is None:
+            raise KeyError(f"[{ExchangeRateMsgResponder.__name__}]: no bank with id {bank_id}.")
 
         # Message formatting: bold
         b = '**' if not channel == 'facebook' else ''
@@ -195,7 +225,64 @@ class ExchangeRateMsgResponder(BaseMsgResponder):
                 f"{ResponseMsgs.get('n_rur', n=1)} ({ResponseMsgs.get('buy', lang)}) - {data.rates[1].buy}\n\n"
                 f"{ResponseMsgs.get('n_rur', n=1)} ({ResponseMsgs.get('sell', lang)}) - {data.rates[1].sell}\n\n")
 
-        return header + non_cash + rate_msgs[0] + cash + rate_msgs[1]
+        stale_notice = self._get_stale_notice(lang, min(snapshot_non_cash.created_at, snapshot_cash.created_at))
+        return header + non_cash + rate_msgs[0] + cash + rate_msgs[1] + stale_notice
+
+    async def _get_user_bank_trend(self, recognized_message: RecognizedMessage, user_preferences: UserPreferences,
+                                   channel: str, **kwargs) -> str:
+        """Gets how buy and sell exchange rates for given currency at user bank have moved during the last hours.
+
+        :param RecognizedMessage recognized_message: recognized message which contains params
+        :param UserPreferences user_preferences: user preferences
+        :param str channel: channel id from which the message came
+        :return str: message which contains the current, lowest and highest rates and their changes
+        """
+        lang = user_preferences.lang
+        bank_id = banks.get_by_id(user_preferences.bank).rate_am_id
+
+        cur = Currency.usd
+        if self._has_clue(recognized_message.params, RUR_CLUES):
+            cur = Currency.rur
+
+        since = time.time() - ExchangeRateMsgResponder.TREND_HOURS * 60 * 60
+        stats_non_cash = self.history.get_stats(True, bank_id, cur, since)
+        stats_cash = self.history.get_stats(False, bank_id, cur, since)
+        if stats_non_cash is None and stats_cash is None:
+            return ResponseMsgs.get('no_trend', lang)
+
+        bank = (await self.informer.get_snapshot(lang)).get_bank(bank_id)
+        if bank is None:
+            raise KeyError(f"[{ExchangeRateMsgResponder.__name__}]: no bank with id {bank_id}.")
+
+        # Message formatting: bold
+        b = '**' if not channel == 'facebook' else ''
+
+        currency_msg = ResponseMsgs.get('n_rur' if cur is Currency.rur else 'n_usd', n=1)
+        header = (f"{b}{bank.name}, {currency_msg}{b}\n\n"
+                  f"{ResponseMsgs.get('trend', lang, hours=ExchangeRateMsgResponder.TREND_HOURS)}\n\n")
+
+        msgs = [header]
+        for stats, type_msg in ((stats_non_cash, ResponseMsgs.get('non_cash', lang)),
+                                (stats_cash, ResponseMsgs.get('cash', lang))):
+            if stats is None:
+                continue
+
+            msgs.append(f"<br/>{type_msg}\n\n---\n\n")
+            for rate_stats, side_msg in zip(stats, (ResponseMsgs.get('buy', lang), ResponseMsgs.get('sell', lang))):
+                if rate_stats is not None:
+                    msgs.append(f"{side_msg} - {ExchangeRateMsgResponder.__format_trend(rate_stats, lang)}\n\n")
+
+        return ''.join(msgs)
+
+    @staticmethod
+    def __format_trend(stats: RateStats, lang: Language) -> str:
+        """Formats the current rate with its change, and the lowest and highest rates."""
+        def amount(minor_units: int) -> Decimal:
+            return Decimal(minor_units).scaleb(-2)
+
+        return (f"{amount(stats.last):.2f} ({amount(stats.delta):+.2f}), "
+                f"{ResponseMsgs.get('low', lang)} {amount(stats.low):.2f}, "
+                f"{ResponseMsgs.get('high', lang)} {amount(stats.high):.2f}")
 
     @staticmethod
     async def _get_banks(user_preferences: UserPreferences, **kwargs):
@@ -218,16 +305,6 @@ class ExchangeRateMsgResponder(BaseMsgResponder):
         reply = MessageFactory.list([card_attachment])
         return reply
 
-    @staticmethod
-    def __create_banks_table(banks_, best_buy, best_sell, b, i, channel, user_bank):
-        """Creates a table-like message for given banks and rates."""
-        return '\n\n'.join(
-            f"{f'{b}{bank.rates[0].buy}{b}' if bank.rates[0].buy == best_buy else bank.rates[0].buy} | " +
-            f"{f'{b}{bank.rates[0].sell}{b}' if bank.rates[0].sell == best_sell else bank.rates[0].sell} | " +
-            (f'{i}{ExchangeRateMsgResponder.__truncate_bank_name(bank.name, channel)}{i}' if bank.id_ == user_bank
-             else ExchangeRateMsgResponder.__truncate_bank_name(bank.name, channel))
-            for bank in banks_)
-
     @staticmethod
     def __truncate_bank_name(name, channel):
         """Truncates the given name, so it can fit in banks table message."""
@@ -35,13 +35,18 @@ class ResponseMsgs:
                  '- Բոլորը ₽(ռուբլի) - տեսնել բոլոր բանկերի կողմից սահմանված դրամի փոխարժեքները ՌԴ ռուբլու նկատմամբ\n\n'
                  '- Բանկեր - տեսնել բոլոր բանկերը\n\n'
                  '- Իմ բանկը - տեսնել իմ բանկի կողմից սահմանված դրամի փոխարժեքները\n\n'
+                 '- Միտում $(դոլար) կամ ₽(ռուբլի) - տեսնել, թե ինչպես են փոխվել իմ բանկի փոխարժեքները '
+                 'վերջին 24 ժամում\n\n'
+                 '- Ծանուցել առք 490 - ստանալ հաղորդագրություն, երբ իմ բանկի ԱՄՆ դոլարի առքի փոխարժեքը հասնի 490-ի\n\n'
+                 '- Ծանուցումներ - տեսնել իմ ծանուցումները, Չեղարկել ծանուցումները - հեռացնել դրանք\n\n'
                  '- Կարգավորումներ - փոխել լեզուն և բանկը\n\n'
                  '- Օգնություն - տեսնել հասանելի հրամանները\n\n'
                  '- Կապ - տեսնել կոնտակտային տվյալները\n\n'
                  '<br/>'
                  'Հաշվիչից օգտվելու համար պարզապես ուղարկեք անհրաժեշտ գումարը, այն դրամի փոխարկելու համար (օր․ 200), '
                  'իսկ դրամն ԱՄՆ դոլարի և ռուսական ռուբլու փոխարկելու համար, '
-                 'գումարի հետ ուղարկեք «դրամ» բառը (օր․ 48000 դրամ)։'
+                 'գումարի հետ ուղարկեք «դրամ» բառը (օր․ 48000 դրամ)։ '
+                 'Բոլոր բանկերի փոխարժեքներով փոխարկելու համար ավելացրեք «լավագույն» բառը (օր․ 200 լավագույն)։'
                  ),
         'contact': 'Բոլոր տվյալները վերցվում են rate.am-ից։ Առաջարկների կամ թերություն գտնելու դեպքում '
                    'կարող եք գրել հետևյալ հասցեին՝ aramayis.amiraghyan@yandex.com',
@@ -57,6 +62,26 @@ class ResponseMsgs:
         # Face with raised eyebrow 🤨
         'err_n_small': "Գումարը շատ փոքր է, ես էլ այդքան լավ չեմ միկրոսկոպիկ հաշվարկներից։ \U0001F928",
         'err_n_0': "Գուցե զարմանաք, բայց 0-ն բոլոր արժույթներով էլ 0 է։ \U0001F643",  # Upside-down face 🙃
+        # Warning sign ⚠
+        'stale_rates': "\U000026A0 rate.am-ը հասանելի չէ, փոխարժեքները թարմացվել են {minutes} րոպե առաջ։",
+        'trend': 'Վերջին {hours} ժամը',
+        'low': 'նվազ.',
+        'high': 'առավ.',
+        'no_trend': "Փոխարժեքների պատմությունը դեռ հասանելի չէ, խնդրում եմ փորձել մի փոքր ուշ։",
+        'alert_usage': ("Ծանուցում ստանալու համար ուղարկեք սպասվող փոխարժեքը, օր․ «ծանուցել առք 490» կամ "
+                        "«ծանուցել վաճառք ₽ 6.2»։ Կանխիկ փոխարժեքների համար ավելացրեք «կանխիկ» բառը։ "
+                        "Ես Ձեզ կտեղեկացնեմ, երբ Ձեր բանկի փոխարժեքը հասնի դրան։"),
+        'alert_saved': "\U0001F514 Պատրաստ է։ Ես Ձեզ կտեղեկացնեմ, երբ՝",  # Bell 🔔
+        'alert_reached': "Փոխարժեքն արդեն հասել է դրան՝",
+        'alert_fired': "\U0001F514 Փոխարժեքը հասել է Ձեր սպասածին՝",  # Bell 🔔
+        'alert_now': "Հիմա՝ {rate}",
+        'alert_limit': ("Կարող եք ունենալ առավելագույնը {n} ծանուցում։ "
+                        "Դրանք հեռացնելու համար ուղարկեք «չեղարկել ծանուցումները»։"),
+        'alerts': "\U0001F514 Ձեր ծանուցումները՝\n\n",  # Bell 🔔
+        'no_alerts': "Դուք ծանուցումներ չունեք։",
+        'alerts_stopped': "Ձեր ծանուցումները հեռացված են։",
+        'no_rate': "Ձեր բանկը հիմա այդ փոխարժեքը չունի։",
+        'digest': "\U0001F4F0 Ձեր բանկի այսօրվա փոխարժեքները՝",  # Newspaper 📰
 
         # Menu
         'all_usd': '\U0001F1FA\U0001F1F8 Բոլորը $',  # US flag
@@ -80,12 +105,16 @@ class ResponseMsgs:
                  '- All ₽(ruble)- get AMD exchange rates against RUR set by all banks \n\n'
                  '- Banks - get all banks\n\n'
                  '- My bank - get AMD exchange rates set by my bank\n\n'
+                 '- Trend $(dollar) or ₽(ruble) - see how the rates of my bank have changed in the last 24 hours\n\n'
+                 '- Alert buy 490 - get a message when the USD buy rate of my bank reaches 490\n\n'
+                 '- Alerts - see my alerts, Stop alerts - remove them\n\n'
                  '- Preferences - change the language and bank\n\n'
                  '- Help - get available commands\n\n'
                  '- Contact - get contact details\n\n'
                  '<br/>'
                  'To use currency converter just send the necessary amount to convert it to AMD (e.g. 200), '
-                 'and to convert AMD to USD or RUR add the word \'dram\' to the amount (e.g. 48000 dram).'
+                 'and to convert AMD to USD or RUR add the word \'dram\' to the amount (e.g. 48000 dram). '
+                 'To convert at all banks, best rates first, add the word \'best\' (e.g. 200 best).'
                  ),
         'contact': 'All data is taken from rate.am. In case if you have any suggestions or find a bug, '
                    'please send an email to this address: aramayis.amiraghyan@yandex.com',
@@ -100,6 +129,25 @@ class ResponseMsgs:
         # Face with raised eyebrow 🤨
         'err_n_small': "The amount is very small and I am not good at microscopic calculations. \U0001F928",
         'err_n_0': "Will you be surprised if I tell you that 0 is 0 everywhere? \U0001F643",  # Upside-down face 🙃
+        # Warning sign ⚠
+        'stale_rates': "\U000026A0 rate.am is unavailable, the rates were updated {minutes} min ago.",
+        'trend': 'Last {hours} hours',
+        'low': 'min',
+        'high': 'max',
+        'no_trend': "The history of the rates isn't available yet, please try again a bit later.",
+        'alert_usage': ("To get an alert, send the rate you are waiting for, e.g. 'alert buy 490' or "
+                        "'alert sell ₽ 6.2'. Add the word 'cash' for cash rates. "
+                        "I will let you know when the rate of your bank reaches it."),
+        'alert_saved': "\U0001F514 Done! I will let you know when:",  # Bell 🔔
+        'alert_reached': "The rate has already reached it:",
+        'alert_fired': "\U0001F514 The rate has reached your alert:",  # Bell 🔔
+        'alert_now': "Now: {rate}",
+        'alert_limit': "You can have at most {n} alerts. Send 'stop alerts' to remove them.",
+        'alerts': "\U0001F514 Your alerts:\n\n",  # Bell 🔔
+        'no_alerts': "You have no alerts.",
+        'alerts_stopped': "Your alerts have been removed.",
+        'no_rate': "Your bank doesn't have this rate now.",
+        'digest': "\U0001F4F0 Today's rates of your bank:",  # Newspaper 📰
 
         # Menu
         'all_usd': '\U0001F1FA\U0001F1F8 All $',  # US flag
@@ -123,13 +171,19 @@ class ResponseMsgs:
                  '- Все ₽(рубль) - узнать курс драма к рублю РФ\n\n'
                  '- Банки - увидеть все банки\n\n'
                  '- Мой банк - узнать курс драма установленный моим банком\n\n'
+                 '- Тренд $(доллар) или ₽(рубль) - узнать, как менялись курсы моего банка за последние 24 часа\n\n'
+                 '- Уведомить покупка 490 - получить сообщение, когда курс покупки доллара моим банком '
+                 'достигнет 490\n\n'
+                 '- Уведомления - увидеть мои уведомления, Отключить уведомления - удалить их\n\n'
                  '- Настройки - изменить язык и банк\n\n'
                  '- Помощь - увидеть доступные команды\n\n'
                  '- Контакты - увидеть контактную информацию\n\n'
                  '<br/>'
                  'Чтобы воспользоваться конвертером валют, просто отправьте необходимую сумму (например: 200) '
                  'и она будет конвертирована в драмы. Для конвертации драма в доллары США и рубли РФ, отправьте слово '
-                 '«драм» вместе с суммой (например: 48000 драм).'
+                 '«драм» вместе с суммой (например: 48000 драм). '
+                 'Чтобы конвертировать по курсам всех банков, начиная с лучших, добавьте слово «лучший» '
+                 '(например: 200 лучший).'
                  ),
         'contact': 'Все данные берутся из rate.am. Если у вас есть предложения или вы нашли ошибку, можете '
                    'отправить электронное письмо по адресу aramayis.amiraghyan@yandex.com',
@@ -144,6 +198,26 @@ class ResponseMsgs:
         # Face with raised eyebrow 🤨
         'err_n_small': "Сумма очень маленькая, а я не очень дружу с микроскопическими вычислениями. \U0001F928",
         'err_n_0': "0 он и в Африке 0. \U0001F643",  # Upside-down face 🙃
+        # Warning sign ⚠
+        'stale_rates': "\U000026A0 rate.am недоступен, курсы обновлены {minutes} мин. назад.",
+        'trend': 'Последние {hours} часа',
+        'low': 'мин.',
+        'high': 'макс.',
+        'no_trend': "История курсов пока недоступна, пожалуйста, попробуйте немного позже.",
+        'alert_usage': ("Чтобы получить уведомление, отправьте ожидаемый курс, например: «уведомить покупка 490» или "
+                        "«уведомить продажа ₽ 6.2». Для наличных курсов добавьте слово «наличные». "
+                        "Я сообщу Вам, когда курс Вашего банка его достигнет."),
+        'alert_saved': "\U0001F514 Готово! Я сообщу Вам, когда:",  # Bell 🔔
+        'alert_reached': "Курс уже достиг этого значения:",
+        'alert_fired': "\U0001F514 Курс достиг ожидаемого значения:",  # Bell 🔔
+        'alert_now': "Сейчас: {rate}",
+        'alert_limit': ("У Вас может быть не более {n} уведомлений. "
+                        "Чтобы удалить их, отправьте «отключить уведомления»."),
+        'alerts': "\U0001F514 Ваши уведомления:\n\n",  # Bell 🔔
+        'no_alerts': "У Вас нет уведомлений.",
+        'alerts_stopped': "Ваши уведомления удалены.",
+        'no_rate': "Сейчас у Вашего банка нет такого курса.",
+        'digest': "\U0001F4F0 Сегодняшние курсы Вашего банка:",  # Newspaper 📰
 
         # Menu
         'all_usd': '\U0001F1FA\U0001F1F8 Все $',  # US flag
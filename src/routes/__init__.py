@@ -1,10 +1,24 @@
+from typing import Callable
+
 from aiohttp import web
 from botbuilder.core import BotFrameworkAdapter, ActivityHandler
+from botbuilder.schema import Activity
 
+from broadcasts import BroadcastEngine
+from utils.resilience import LoadShedder
+from .broadcasts import setup_broadcasts_routes
 from .home import setup_home_routes
 from .messages import setup_messages_routes
+from .metrics import setup_metrics_routes
 
 
-def setup_routes(app: web.Application, adapter: BotFrameworkAdapter, bot: ActivityHandler):
+def setup_routes(app: web.Application, adapter: BotFrameworkAdapter, bot: ActivityHandler,
+                 broadcasts: BroadcastEngine = None, broadcast_token: str = '', shedder: LoadShedder = None,
+                 priority: Callable[[Activity], int] = None):
     setup_home_routes(app)
-    setup_messages_routes(app, adapter, bot)
+    setup_messages_routes(app, adapter, bot, shedder, priority)
+    setup_metrics_routes(app)
+
+    # The broadcasts API is exposed only if it's protected by a token
+    if broadcasts is not None and broadcast_token:
+        setup_broadcasts_routes(app, broadcasts, broadcast_token)
@@ -0,0 +1,54 @@
+import hmac
+
+from aiohttp import web
+from aiohttp.web import Request, Response, json_response
+
+from broadcasts import BroadcastEngine
+
+BROADCASTS = None
+TOKEN = ''
+
+
+def authorized(req: Request) -> bool:
+    # The broadcasts are sent to all users, so only the holder of the token can start them
+    return hmac.compare_digest(req.headers.get("Authorization", ""), f"Bearer {TOKEN}")
+
+
+# Listen for incoming requests on /api/broadcasts
+async def start_broadcast(req: Request) -> Response:
+    # Start a new broadcast, or resume an interrupted one by its id
+    if not authorized(req):
+        return Response(status=401)
+    if "application/json" not in req.headers.get("Content-Type", ""):
+        return Response(status=415)
+
+    body = await req.json()
+    try:
+        broadcast = await BROADCASTS.start(body.get("kind"), body.get("texts"), body.get("id"))
+    except KeyError:
+        return Response(status=404)
+    except ValueError as error:
+        return json_response(data={'error': str(error)}, status=400)
+
+    return json_response(data=broadcast.to_document(), status=202)
+
+
+# Listen for incoming requests on /api/broadcasts/{id}
+async def get_broadcast(req: Request) -> Response:
+    # Report the progress of a broadcast
+    if not authorized(req):
+        return Response(status=401)
+
+    broadcast = await BROADCASTS.get(req.match_info["id"])
+    if broadcast is None:
+        return Response(status=404)
+    return json_response(data=broadcast.to_document())
+
+
+def setup_broadcasts_routes(app: web.Application, broadcasts: BroadcastEngine, token: str):
+    global BROADCASTS, TOKEN
+    BROADCASTS = broadcasts
+    TOKEN = token
+
+    app.router.add_post("/api/broadcasts", start_broadcast)
+    app.router.add_get("/api/broadcasts/{id}", get_broadcast)
@@ -1,10 +1,18 @@
+import math
+from typing import Callable
+
 from aiohttp import web
 from aiohttp.web import Request, Response, json_response
 from botbuilder.core import BotFrameworkAdapter, ActivityHandler
 from botbuilder.schema import Activity
 
+from metrics import TRACER
+from utils.resilience import LoadShedder, OverloadedError
+
 ADAPTER = None
 BOT = None
+SHEDDER = None
+PRIORITY = None
 
 
 # Listen for incoming requests on /api/messages
@@ -19,10 +27,18 @@ async def messages(req: Request) -> Response:
     auth_header = req.headers["Authorization"] if "Authorization" in req.headers else ""
 
     try:
-        response = await ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+        # Bound the turns in flight, so a spike is queued or shed instead of slowing down every turn
+        #   The priority is computed only if the turn has to wait.
+        if SHEDDER is not None:
+            response = await SHEDDER.call(lambda: PRIORITY(activity) if PRIORITY is not None else 0,
+                                          process_activity, activity, auth_header)
+        else:
+            response = await process_activity(activity, auth_header)
         if response:
             return json_response(data=response.body, status=response.status)
         return Response(status=201)
+    except OverloadedError as error:
+        return Response(status=503, headers={"Retry-After": str(math.ceil(error.retry_after))})
     except Exception as exception:
         if "unauth" in str(exception).lower():
             return Response(status=401)
@@ -30,9 +46,18 @@ async def messages(req: Request) -> Response:
             return Response(status=400)
 
 
-def setup_messages_routes(app: web.Application, adapter: BotFrameworkAdapter, bot: ActivityHandler):
-    global ADAPTER, BOT
+async def process_activity(activity: Activity, auth_header: str):
+    # Trace the stages of the turn
+    with TRACER.turn(activity.channel_id):
+        return await ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+
+
+def setup_messages_routes(app: web.Application, adapter: BotFrameworkAdapter, bot: ActivityHandler,
+                          shedder: LoadShedder = None, priority: Callable[[Activity], int] = None):
+    global ADAPTER, BOT, SHEDDER, PRIORITY
     ADAPTER = adapter
     BOT = bot
+    SHEDDER = shedder
+    PRIORITY = priority
 
     app.router.add_post("/api/messages", messages)
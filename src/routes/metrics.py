@@ -0,0 +1,14 @@
+from aiohttp import web
+from aiohttp.web import Request, Response
+
+from metrics import render_text, CONTENT_TYPE
+
+
+# Listen for incoming requests on /metrics
+async def metrics(req: Request) -> Response:
+    # Expose the app's metrics to Prometheus
+    return Response(body=render_text().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+
+def setup_metrics_routes(app: web.Application):
+    app.router.add_get("/metrics", metrics)
@@ -1 +1,2 @@
 from .mongodb_storage import MongodbStorage
+from .write_behind_buffer import WriteBehindBuffer
@@ -0,0 +1,3 @@
+from .storage_codec import StorageCodec
+from .jsonpickle_codec import JsonpickleCodec
+from .compact_codec import CompactCodec
@@ -0,0 +1,128 @@
+import importlib
+from enum import Enum
+from typing import Dict
+
+from botbuilder.dialogs import DialogState, DialogInstance
+from jsonpickle.pickler import Pickler
+from jsonpickle.unpickler import Unpickler
+
+from bot_data import Language
+from bot_data.banks import BankId
+from data_models import UserPreferences
+from storage.codecs.storage_codec import StorageCodec
+
+
+class CompactCodec(StorageCodec):
+    """Encodes the known state shapes (user preferences and dialog state) into small plain documents.
+
+    Plain values, lists and dicts with string keys are saved as they are. The known objects are saved as dicts
+    with a short type tag under :py:attr:`TYPE_TAG`, and any other object falls back to jsonpickle.
+    """
+
+    NAME = 'compact/1'
+    TYPE_TAG = '~'
+
+    # Short names of the known enums
+    __ENUMS = {
+        'lang': Language,
+        'bank': BankId,
+    }
+    __ENUM_NAMES = {enum: name for name, enum in __ENUMS.items()}
+
+    @property
+    def name(self) -> str:
+        return CompactCodec.NAME
+
+    def encode(self, store_item: object) -> Dict:
+        if isinstance(store_item, dict):
+            store_item = {key: value for key, value in store_item.items() if key != 'e_tag'}
+        document = self.__encode(store_item)
+
+        # The document has to be a dict, so wrap the other values.
+        if not isinstance(document, dict) or CompactCodec.TYPE_TAG in document:
+            document = {CompactCodec.TYPE_TAG: 'v', 'v': document}
+        return document
+
+    def decode(self, document: Dict) -> object:
+        return self.__decode(document)
+
+    def __encode(self, value: object) -> object:
+        """Encodes the given value recursively."""
+        tag = CompactCodec.TYPE_TAG
+
+        if value is None or isinstance(value, (bool, int, float, str)) and not isinstance(value, Enum):
+            return value
+        if isinstance(value, list):
+            return [self.__encode(item) for item in value]
+        if isinstance(value, dict):
+            if tag not in value and all(isinstance(key, str) for key in value):
+                return {key: self.__encode(item) for key, item in value.items()}
+            # Save the dicts which can't be saved as they are as lists of pairs
+            return {tag: 'd', 'v': [[self.__encode(key), self.__encode(item)] for key, item in value.items()]}
+        if isinstance(value, tuple):
+            return {tag: 't', 'v': [self.__encode(item) for item in value]}
+        if isinstance(value, Enum):
+            return self.__encode_enum(value)
+        if type(value) is UserPreferences:
+            return {tag: 'up',
+                    'l': value.lang.value if value.lang is not None else None,
+                    'b': value.bank.value if value.bank is not None else None}
+        if type(value) is DialogState:
+            return {tag: 'ds', 's': [self.__encode(instance) for instance in value.dialog_stack]}
+        if type(value) is DialogInstance:
+            return {tag: 'di', 'id': value.id, 's': self.__encode(value.state)}
+
+        return {tag: 'jp', 'v': Pickler().flatten(value)}
+
+    def __decode(self, value: object) -> object:
+        """Decodes the given value recursively."""
+        tag = CompactCodec.TYPE_TAG
+
+        if isinstance(value, list):
+            return [self.__decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        type_ = value.get(tag)
+        if type_ is None:
+            return {key: self.__decode(item) for key, item in value.items()}
+        if type_ == 'v':
+            return self.__decode(value['v'])
+        if type_ == 'd':
+            return {self.__decode(key): self.__decode(item) for key, item in value['v']}
+        if type_ == 't':
+            return tuple(self.__decode(item) for item in value['v'])
+        if type_ == 'e':
+            return self.__decode_enum(value)
+        if type_ == 'up':
+            return UserPreferences(Language(value['l']) if value['l'] is not None else None,
+                                   BankId(value['b']) if value['b'] is not None else None)
+        if type_ == 'ds':
+            return DialogState([self.__decode(instance) for instance in value['s']])
+        if type_ == 'di':
+            return DialogInstance(value['id'], self.__decode(value['s']))
+        if type_ == 'jp':
+            return Unpickler().restore(value['v'])
+
+        raise ValueError(f"[{CompactCodec.__name__}]: unknown type tag {type_}.")
+
+    @staticmethod
+    def __encode_enum(value: Enum) -> Dict:
+        """Encodes an enum member by its class name and value. The known enums are saved by their short names."""
+        enum_name = CompactCodec.__ENUM_NAMES.get(type(value))
+        if enum_name is None:
+            enum_name = f"{type(value).__module__}:{type(value).__qualname__}"
+
+        return {CompactCodec.TYPE_TAG: 'e', 'c': enum_name, 'v': value.value}
+
+    @staticmethod
+    def __decode_enum(value: Dict) -> Enum:
+        """Decodes an enum member encoded by :py:meth:`__encode_enum`."""
+        enum = CompactCodec.__ENUMS.get(value['c'])
+        if enum is None:
+            module_name, qualname = value['c'].split(':')
+            enum = importlib.import_module(module_name)
+            for name in qualname.split('.'):
+                enum = getattr(enum, name)
+
+        return enum(value['v'])
@@ -0,0 +1,29 @@
+from typing import Dict
+
+from jsonpickle.pickler import Pickler
+from jsonpickle.unpickler import Unpickler
+
+from storage.codecs.storage_codec import StorageCodec
+
+
+class JsonpickleCodec(StorageCodec):
+    """Encodes storeitems with jsonpickle. Can encode any object, but is slow and creates large documents.
+
+    Documents saved before the codecs were introduced were encoded this way.
+    """
+
+    NAME = 'jsonpickle'
+
+    @property
+    def name(self) -> str:
+        return JsonpickleCodec.NAME
+
+    def encode(self, store_item: object) -> Dict:
+        json_dict = Pickler().flatten(store_item)
+        if "e_tag" in json_dict:
+            del json_dict["e_tag"]
+
+        return json_dict
+
+    def decode(self, document: Dict) -> object:
+        return Unpickler().restore(document)
@@ -0,0 +1,30 @@
+from abc import ABC, abstractmethod
+from typing import Dict
+
+
+class StorageCodec(ABC):
+    """Defines methods which need to be implemented in a codec, which converts storeitems to db documents and back."""
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """A unique name of the codec, which is saved with each document encoded by it."""
+        pass
+
+    @abstractmethod
+    def encode(self, store_item: object) -> Dict:
+        """Creates a db document from the given storeitem. The e_tag is not saved.
+
+        :param store_item: storeitem to encode
+        :return dict:
+        """
+        pass
+
+    @abstractmethod
+    def decode(self, document: Dict) -> object:
+        """Creates a storeitem from the given db document.
+
+        :param document: document created by :py:meth:`encode`
+        :return object:
+        """
+        pass
@@ -1,26 +1,77 @@
-from jsonpickle.pickler import Pickler
-from jsonpickle.unpickler import Unpickler
-from typing import Dict, List
+import asyncio
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, AsyncIterator, Tuple
+import bson
+from aiohttp import web
 from botbuilder.core import Storage
+from pymongo import UpdateOne, IndexModel, ASCENDING
 import motor.motor_asyncio
 
+from cluster import ClusterEvents
+from error_reporting import report_error
+from metrics import TRACER, REGISTRY
+from storage.codecs import StorageCodec, JsonpickleCodec, CompactCodec
+from storage.write_behind_buffer import WriteBehindBuffer
+from utils.caching import TTLCache
+
 
 class MongodbStorage(Storage):
     """The class for MongoDB middleware for the Azure Bot Framework."""
 
     ID_TAG = 'real_id'
     DOCUMENT_TAG = 'document'
+    CODEC_TAG = 'codec'
+    EXPIRES_TAG = 'expires_at'
+
+    # Conversation state keys contain this part, e.g. 'telegram/conversations/123'
+    CONVERSATION_KEY_MARKER = '/conversations/'
+
+    # Topic of the events by which the workers tell each other about the changed storeitems
+    EVENTS_TOPIC = 'storage'
+
+    # Only these fields are read from the db
+    PROJECTION = {'_id': 0, ID_TAG: 1, DOCUMENT_TAG: 1, CODEC_TAG: 1}
 
-    def __init__(self, connection_string, db, collection, **kwargs):
+    def __init__(self, connection_string, db, collection, write_behind=False, flush_interval=0.05,
+                 max_batch_size=500, cache=False, cache_ttl=300, cache_max_entries=10000,
+                 cache_max_bytes=16 * 1024 * 1024, codec: StorageCodec = None, indexes: List[IndexModel] = None,
+                 conversation_ttl=0, events: ClusterEvents = None, **kwargs):
         """Create the storage object.
 
         :param connection_string: mongoDB connection URI
         :param db: db name
         :param collection: collection name
+        :param write_behind: gather the changes of concurrent writes and save them with one bulk write per flush
+                             window instead of saving them immediately
+        :param flush_interval: maximum time in seconds a change waits before being saved in write-behind mode
+        :param max_batch_size: maximum number of changes saved with one bulk write in write-behind mode
+        :param cache: keep the read and written storeitems in an in-process LRU cache, so reading them again doesn't
+                      query the db
+        :param cache_ttl: time in seconds after which a cached storeitem is read from the db again
+        :param cache_max_entries: maximum number of cached storeitems
+        :param cache_max_bytes: maximum total BSON size of cached storeitems
+        :param codec: codec used to encode storeitems, CompactCodec by default. Documents encoded by the other known
+                      codecs (including the documents saved with jsonpickle before the codecs were introduced) are
+                      still read, and are lazily re-encoded with this codec.
+        :param indexes: indexes created by :py:meth:`ensure_indexes`, a unique index on the id by default
+        :param conversation_ttl: time in seconds after the last write, after which conversation states are deleted
+                                 by a TTL index. Conversation states never expire if it's 0.
+        :param events: events by which the workers of the app tell each other about the saved and deleted
+                       storeitems, so they don't serve the outdated ones from their caches
         :param kwargs: parameters to pass to MongoClient as keyword arguments
         """
         super(MongodbStorage, self).__init__()
 
+        self.__operation_seconds = REGISTRY.histogram(
+            'mongodb_operation_seconds', 'Duration of the MongoDB operations of the storage.', ('operation',))
+        self.__operation_failures = REGISTRY.counter(
+            'mongodb_operation_failures_total', 'Failed MongoDB operations of the storage.', ('operation',))
+
         self.connection_string = connection_string
         self.db_name = db
         self.collection_name = collection
@@ -28,54 +79,129 @@ class MongodbStorage(Storage):
         self.mongodb_client = motor.motor_asyncio.AsyncIOMotorClient(self.connection_string, **kwargs)
         self.db = self.mongodb_client[self.db_name]
 
+        self.codec = codec if codec is not None else CompactCodec()
+        self.__codecs = {JsonpickleCodec.NAME: JsonpickleCodec(), CompactCodec.NAME: CompactCodec(),
+                         self.codec.name: self.codec}
+        self.__migrations = set()
+
+        self.write_behind = write_behind
+        self.__buffer = WriteBehindBuffer(self.__bulk_write, flush_interval, max_batch_size) if write_behind else None
+
+        # The cache holds the storeitems' encoded items, not the objects, since the objects are modified by the turns.
+        self.__cache = TTLCache(cache_ttl, cache_max_entries, cache_max_bytes,
+                                lambda doc: len(bson.encode(doc))) if cache else None
+        # Incremented on each write and delete, so a db read which raced with them doesn't cache outdated documents
+        self.__generation = 0
+
+        self.indexes = indexes if indexes is not None else [
+            IndexModel([(MongodbStorage.ID_TAG, ASCENDING)], unique=True, name=f'{MongodbStorage.ID_TAG}_unique')]
+        self.conversation_ttl = conversation_ttl
+
+        self.events = events
+        if events is not None:
+            events.subscribe(MongodbStorage.EVENTS_TOPIC, self.__on_changed_elsewhere)
+            events.subscribe(ClusterEvents.RESET, self.__on_reset)
+
     async def write(self, changes: Dict[str, object]):
         """Save storeitems to storage.
 
         :param changes:
         :return:
         """
-        if changes is None:
-            raise Exception("Changes are required when writing")
-        if not changes:
-            return
-        try:
-            # get the collection to save changes in
-            collection = self.__collection
+        with TRACER.stage('state_write'):
+            if changes is None:
+                raise Exception("Changes are required when writing")
+            if not changes:
+                return
+            try:
+                # create an encoded item from each change object
+                items = {key: self.__create_item(key, change) for (key, change) in changes.items()}
+
+                # make the reads which are running now not cache the old storeitems
+                self.__generation += 1
 
-            for (key, change) in changes.items():
-                # create a dictionary from the change object
-                doc = self.__create_dict(change)
+                # in write-behind mode leave the changes to the buffer, which will save them with the next batch
+                if self.__buffer is not None:
+                    self.__cache_items(items)
+                    self.__buffer.add(items)
+                    return
+
+                # get the collection to save changes in
+                collection = self.__collection
 
                 # save each change in db collection
-                await collection.update_one({MongodbStorage.ID_TAG: key},
-                                            {'$set': {MongodbStorage.DOCUMENT_TAG: doc}},
-                                            upsert=True)
-        except Exception as error:
-            raise error
+                for (key, item) in items.items():
+                    with self.__measure('update_one'):
+                        await collection.update_one({MongodbStorage.ID_TAG: key}, {'$set': item}, upsert=True)
+
+                # write through the cache only when the changes are saved. The reads which ran meanwhile might
+                #   have got the old storeitems, so they don't cache them.
+                self.__generation += 1
+                self.__cache_items(items)
 
-    async def read(self, keys: List[str]):
+                await self.__publish_changes(list(items))
+            except Exception as error:
+                # the changes might have been partly saved, so the storeitems are read from the db again
+                self.__generation += 1
+                if self.__cache is not None:
+                    for key in changes:
+                        self.__cache.pop(key)
+                raise error
+
+    async def read(self, keys: List[str], cache: bool = True):
         """Read storeitems from storage.
 
         :param keys:
+        :param cache: whether to use the cache. Bulk reads of many storeitems, which aren't read again soon, e.g. of
+                      all users for a broadcast, should bypass it, so they don't evict the storeitems of active users.
         :return dict:
         """
-        data = {}
-        if not keys:
-            return data
-        try:
-            # get the collection to read storeitems from
-            collection = self.__collection
+        with TRACER.stage('state_read'):
+            data = {}
+            if not keys:
+                return data
+            cache = self.__cache if cache else None
+            try:
+                # serve the cached storeitems and the changes which haven't been saved yet from memory
+                for key in keys:
+                    item = cache.get(key) if cache is not None else None
+                    if item is None and self.__buffer is not None:
+                        item = self.__buffer.get(key)
+                    if item is not None:
+                        data[key] = self.__create_object(item)
+                keys = [key for key in keys if key not in data]
+                if not keys:
+                    return data
 
-            # get the data for given keys from db collection
-            data_from_db = collection.find({MongodbStorage.ID_TAG: {'$in': keys}})
+                generation = self.__generation
 
-            async for item in data_from_db:
-                # create a storeitem from each db and save it in the result dictionary
-                data[item[MongodbStorage.ID_TAG]] = self.__create_object(item)
-        except TypeError as error:
-            raise error
+                # get the collection to read storeitems from
+                collection = self.__collection
+
+                # get the data for given keys from db collection
+                with self.__measure('find'):
+                    data_from_db = await collection.find(
+                        {MongodbStorage.ID_TAG: {'$in': keys}}, MongodbStorage.PROJECTION).to_list(None)
+
+                for item in data_from_db:
+                    # create a storeitem from each db and save it in the result dictionary
+                    key = item[MongodbStorage.ID_TAG]
+                    data[key] = self.__create_object(item)
+
+                    # re-encode the items saved by another codec in the background
+                    if item.get(MongodbStorage.CODEC_TAG) != self.codec.name:
+                        old_codec = item.get(MongodbStorage.CODEC_TAG)
+                        item = self.__create_item(key, data[key])
+                        self.__migrate(key, old_codec, item)
 
-        return data
+                    # cache the item unless it has been changed while reading
+                    if cache is not None and generation == self.__generation:
+                        cache.set(key, {MongodbStorage.DOCUMENT_TAG: item.get(MongodbStorage.DOCUMENT_TAG),
+                                               MongodbStorage.CODEC_TAG: item.get(MongodbStorage.CODEC_TAG)})
+            except TypeError as error:
+                raise error
+
+            return data
 
     async def delete(self, keys: List[str]):
         """Remove storeitems from storage.
@@ -84,14 +210,231 @@ class MongodbStorage(Storage):
         :return:
         """
         try:
+            # invalidate the cached storeitems
+            self.__generation += 1
+            if self.__cache is not None:
+                for key in keys:
+                    self.__cache.pop(key)
+
+            # make sure pending changes for these keys won't be saved after the deletion
+            if self.__buffer is not None:
+                self.__buffer.discard(keys)
+                await self.__buffer.flush()
+
             # get the collection to delete storeitems from
             collection = self.__collection
 
             # delete all storeitems for given keys
-            await collection.delete_many({MongodbStorage.ID_TAG: {'$in': keys}})
+            with self.__measure('delete_many'):
+                await collection.delete_many({MongodbStorage.ID_TAG: {'$in': keys}})
+
+            await self.__publish_changes(keys)
         except TypeError as error:
             raise error
 
+    async def scan(self, key_marker: str = None, after: str = None,
+                   batch_size: int = 100) -> AsyncIterator[List[Tuple[str, object]]]:
+        """Stream the storeitems ordered by their keys in batches with a cursor, so they are never all loaded.
+        The storeitems are read from the db, so the cached ones aren't consulted, and the pending changes are
+        saved first.
+
+        :param key_marker: part which follows the channel id in the keys of the storeitems, e.g.
+                           :py:attr:`CONVERSATION_KEY_MARKER`
+        :param after: key after which the storeitems are read, e.g. to resume from the last read one
+        :param batch_size: number of storeitems in a batch
+        :return: async iterator of the lists of (key, storeitem)
+        """
+        await self.flush()
+
+        query = {}
+        if after is not None:
+            query['$gt'] = after
+        if key_marker:
+            # anchored right after the channel id, so the marker in another part of a key, e.g. a user id, isn't matched
+            query['$regex'] = f'^[^/]+{re.escape(key_marker)}'
+
+        cursor = self.__collection.find({MongodbStorage.ID_TAG: query} if query else {}, MongodbStorage.PROJECTION)
+        cursor = cursor.sort(MongodbStorage.ID_TAG, ASCENDING).batch_size(batch_size)
+
+        batch = []
+        async for item in cursor:
+            batch.append((item[MongodbStorage.ID_TAG], self.__create_object(item)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def ensure_indexes(self, _app: web.Application = None):
+        """Create the indexes if they don't exist, and check that the queries use them.
+        Can be used as an aiohttp startup hook, so it only reports the errors, not to prevent the app from starting.
+
+        :return:
+        """
+        try:
+            indexes = list(self.indexes)
+            if self.conversation_ttl:
+                # Documents without the expiration field, i.e. user states, never expire.
+                indexes.append(IndexModel([(MongodbStorage.EXPIRES_TAG, ASCENDING)], expireAfterSeconds=0,
+                                          name=f'{MongodbStorage.EXPIRES_TAG}_ttl'))
+
+            await self.__collection.create_indexes(indexes)
+            await self.check_indexes()
+        except Exception as error:
+            report_error(MongodbStorage.__name__, "failed to ensure indexes", error)
+
+    async def check_indexes(self) -> bool:
+        """Explain the read query and warn if it scans the collection instead of using an index.
+
+        :return bool: True if the query uses an index
+        """
+        explanation = await self.__collection.find(
+            {MongodbStorage.ID_TAG: {'$in': ['index-check']}}, MongodbStorage.PROJECTION).explain()
+        stages = MongodbStorage.__get_stages(explanation.get('queryPlanner', {}).get('winningPlan', {}))
+
+        if 'COLLSCAN' in stages or 'IXSCAN' not in stages:
+            print(f"\n [{MongodbStorage.__name__}] WARNING: reads from {self.collection_name} are not covered "
+                  f"by an index, the query plan stages are {stages}.", file=sys.stderr)
+            return False
+        return True
+
+    @staticmethod
+    def parse_indexes(spec: str) -> List[IndexModel]:
+        """Create indexes from a JSON spec, e.g. '[{"keys": [["real_id", 1]], "unique": true}]'.
+        All the fields except 'keys' are passed to IndexModel as options.
+
+        :param spec: JSON list of index specs
+        :return List[IndexModel]:
+        """
+        indexes = []
+        for index in json.loads(spec):
+            options = dict(index)
+            keys = [tuple(key) for key in options.pop('keys')]
+            indexes.append(IndexModel(keys, **options))
+
+        return indexes
+
+    @property
+    def cache(self) -> TTLCache:
+        """The storeitems cache with hit and miss counters, or None if caching is disabled."""
+        return self.__cache
+
+    async def flush(self):
+        """Save all changes pending in write-behind mode.
+
+        :return:
+        """
+        if self.__buffer is not None:
+            await self.__buffer.flush()
+
+    async def close(self, _app: web.Application = None):
+        """Save all pending changes and close the connection. Can be used as an aiohttp cleanup hook, so it only
+        reports the errors, not to prevent the other cleanup hooks from running.
+
+        :return:
+        """
+        try:
+            await self.flush()
+        except Exception as error:
+            report_error(MongodbStorage.__name__, "failed to save the pending changes", error)
+        finally:
+            if self.__migrations:
+                await asyncio.gather(*self.__migrations, return_exceptions=True)
+            self.mongodb_client.close()
+
+    async def __bulk_write(self, items: Dict[str, Dict]):
+        """Save the given items with one unordered bulk write.
+
+        :param items: items keyed by their storage keys
+        :return:
+        """
+        requests = [UpdateOne({MongodbStorage.ID_TAG: key}, {'$set': item}, upsert=True)
+                    for (key, item) in items.items()]
+        with self.__measure('bulk_write'):
+            await self.__collection.bulk_write(requests, ordered=False)
+
+        await self.__publish_changes(list(items))
+
+    def __cache_items(self, items: Dict[str, Dict]):
+        """Cache the given items written by this worker.
+
+        :param items: items keyed by their storage keys
+        :return:
+        """
+        if self.__cache is not None:
+            for (key, item) in items.items():
+                self.__cache.set(key, item)
+
+    async def __publish_changes(self, keys: List[str]):
+        """Tell the other workers that the storeitems with the given keys have been saved or deleted.
+        The event is published after the changes are saved, so the other workers don't read the outdated storeitems
+        from the db again.
+
+        :param keys: keys of the changed storeitems
+        :return:
+        """
+        if self.events is not None:
+            await self.events.publish(MongodbStorage.EVENTS_TOPIC, {'keys': keys})
+
+    def __on_changed_elsewhere(self, payload: Dict):
+        """Drop the cached storeitems which have been changed by another worker.
+
+        :param payload: the event payload with the keys of the changed storeitems
+        :return:
+        """
+        # a db read which raced with the change mustn't cache the outdated storeitems
+        self.__generation += 1
+        if self.__cache is not None:
+            for key in payload.get('keys', ()):
+                self.__cache.pop(key)
+
+    def __on_reset(self, _payload: Dict):
+        """Drop all cached storeitems, since the changes made by the other workers might have been missed.
+
+        :return:
+        """
+        self.__generation += 1
+        if self.__cache is not None:
+            self.__cache.clear()
+
+    def __migrate(self, key: str, old_codec: str, item: Dict):
+        """Replace the item saved by the old codec with the given re-encoded one in the background.
+        The item is replaced only if it hasn't been changed since, i.e. it's still encoded by the old codec.
+
+        :param key: storage key of the item
+        :param old_codec: name of the codec the saved item is encoded by, None for the legacy items
+        :param item: the re-encoded item
+        :return:
+        """
+        async def migrate():
+            try:
+                with self.__measure('migrate'):
+                    await self.__collection.update_one(
+                        {MongodbStorage.ID_TAG: key, MongodbStorage.CODEC_TAG: old_codec or {'$exists': False}},
+                        {'$set': item})
+            except Exception as error:
+                report_error(MongodbStorage.__name__, f"migration of {key} failed", error)
+
+        task = asyncio.ensure_future(migrate())
+        self.__migrations.add(task)
+        task.add_done_callback(self.__migrations.discard)
+
+    @contextmanager
+    def __measure(self, operation: str):
+        """Record the duration of the given db operation, and count it if it fails.
+
+        :param operation: name of the operation
+        :return:
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.__operation_failures.inc(operation=operation)
+            raise
+        finally:
+            self.__operation_seconds.observe(time.perf_counter() - started, operation=operation)
+
     @property
     def __collection(self) -> motor.motor_asyncio.AsyncIOMotorCollection:
         """Return db collection where storeitems are stored.
@@ -101,32 +444,52 @@ class MongodbStorage(Storage):
         """
         return self.db[self.collection_name]
 
-    @staticmethod
-    def __create_object(result) -> object:
+    def __create_object(self, result) -> object:
         """Create an object from a result out of MongoDb.
 
         :param result:
         :return object:
         """
-        # get the document item from the result and turn into a dict
+        # get the document item from the result and the codec it was encoded by.
+        # Items without codec were saved before the codecs were introduced, and are encoded with jsonpickle.
         doc = result.get(MongodbStorage.DOCUMENT_TAG)
+        codec = self.__codecs.get(result.get(MongodbStorage.CODEC_TAG) or JsonpickleCodec.NAME)
+        if codec is None:
+            raise ValueError(f"[{MongodbStorage.__name__}]: unknown codec {result.get(MongodbStorage.CODEC_TAG)}.")
 
         # create and return the object
-        result_obj = Unpickler().restore(doc)
+        result_obj = codec.decode(doc)
 
         return result_obj
 
-    @staticmethod
-    def __create_dict(store_item: object) -> Dict:
-        """Return the dict of an object.
-        This eliminates non_magic attributes and the e_tag.
+    def __create_item(self, key: str, store_item: object) -> Dict:
+        """Return the item to save for an object: its document encoded by the codec and the codec name.
+        Conversation states also get the expiration time if they expire.
+        This eliminates the e_tag.
 
+        :param key: storage key of the object
         :param store_item:
         :return dict:
         """
-        # read the content
-        json_dict = Pickler().flatten(store_item)
-        if "e_tag" in json_dict:
-            del json_dict["e_tag"]
+        item = {MongodbStorage.DOCUMENT_TAG: self.codec.encode(store_item),
+                MongodbStorage.CODEC_TAG: self.codec.name}
+        if self.conversation_ttl and MongodbStorage.CONVERSATION_KEY_MARKER in key:
+            item[MongodbStorage.EXPIRES_TAG] = datetime.utcnow() + timedelta(seconds=self.conversation_ttl)
+
+        return item
+
+    @staticmethod
+    def __get_stages(plan: Dict) -> List[str]:
+        """Return the names of all stages of a query plan.
+
+        :param plan: winning plan from an explain output
+        :return List[str]:
+        """
+        # With the slot-based query engine (MongoDB 5.1+) the stages are under the winning plan's queryPlan
+        plan = plan.get('queryPlan', plan)
+        stages = [plan['stage']] if 'stage' in plan else []
+        for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+            if child:
+                stages.extend(MongodbStorage.__get_stages(child))
 
-        return json_dict
+        return stages
@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+from typing import Dict, Callable, Awaitable, Optional, Iterable
+
+from error_reporting import report_error
+
+
+class WriteBehindBuffer:
+    """Gathers documents written by many concurrent callers and flushes them in batches.
+
+    A batch is flushed when it reaches the maximum size or when the flush interval has passed since the first
+    document of the batch was added, whichever comes first. Writing the same key again before a flush replaces
+    the pending document, so only the latest one is flushed. A batch never has more than the maximum number of
+    documents: if more of them are pending, e.g. while a flush is slow, they are flushed in several batches.
+    """
+
+    def __init__(self, flush: Callable[[Dict[str, Dict]], Awaitable[None]], flush_interval: float = 0.05,
+                 max_batch_size: int = 500):
+        """Creates the buffer.
+
+        :param flush: coroutine function which writes the given documents keyed by their keys
+        :param float flush_interval: maximum time in seconds a document waits in the buffer
+        :param int max_batch_size: maximum number of documents in one batch
+        """
+        self.__flush = flush
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+
+        self.__pending: Dict[str, Dict] = {}
+        self.__flushing: Dict[str, Dict] = {}
+        self.__timer: Optional[asyncio.TimerHandle] = None
+        self.__flush_lock = asyncio.Lock()
+        # The background flush, which flushes full batches until fewer documents are pending
+        self.__flusher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.__pending)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Returns the pending document for the given key, if any, including the ones being flushed right now."""
+        document = self.__pending.get(key)
+        return document if document is not None else self.__flushing.get(key)
+
+    def add(self, documents: Dict[str, Dict]) -> None:
+        """Adds the given documents keyed by their keys to the buffer."""
+        self.__pending.update(documents)
+
+        if len(self.__pending) >= self.max_batch_size:
+            self.__schedule_flush()
+        elif self.__timer is None:
+            self.__timer = asyncio.get_event_loop().call_later(self.flush_interval, self.__schedule_flush)
+
+    def discard(self, keys: Iterable[str]) -> None:
+        """Removes the pending documents for the given keys."""
+        for key in keys:
+            self.__pending.pop(key, None)
+
+    async def flush(self) -> None:
+        """Waits for the flushes started in the background and flushes all pending documents.
+
+        Unlike the background flushes, it raises the error if the pending documents couldn't be flushed.
+        """
+        self.__cancel_timer()
+        if self.__flusher is not None:
+            await asyncio.gather(self.__flusher, return_exceptions=True)
+
+        while self.__pending:
+            await self.__flush_batch(raise_error=True)
+
+    def __schedule_flush(self) -> None:
+        """Starts flushing the pending documents in the background, unless a background flush is already queued."""
+        self.__cancel_timer()
+        if self.__flusher is None:
+            self.__flusher = asyncio.ensure_future(self.__flush_in_background())
+
+    async def __flush_in_background(self) -> None:
+        """Flushes the pending documents in batches until less than a full batch is left, which waits for the timer.
+        Stops at a failed batch, which is retried by the timer."""
+        try:
+            while await self.__flush_batch() and len(self.__pending) >= self.max_batch_size:
+                pass
+        finally:
+            self.__flusher = None
+
+        if self.__pending and self.__timer is None:
+            self.__timer = asyncio.get_event_loop().call_later(self.flush_interval, self.__schedule_flush)
+
+    def __cancel_timer(self) -> None:
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+    async def __flush_batch(self, raise_error: bool = False) -> bool:
+        """Flushes at most a full batch of the pending documents, the earliest ones first. Only one batch is flushed at
+        a time.
+
+        :return bool: whether the batch was flushed
+        """
+        async with self.__flush_lock:
+            if not self.__pending:
+                return True
+
+            if len(self.__pending) <= self.max_batch_size:
+                batch, self.__pending = self.__pending, {}
+            else:
+                batch = {key: self.__pending.pop(key)
+                         for key in list(itertools.islice(self.__pending, self.max_batch_size))}
+            self.__flushing = batch
+            try:
+                await self.__flush(batch)
+                return True
+            except Exception as error:
+                # Put the failed documents back in front, unless they have been replaced in the meantime,
+                #   so they are retried with the next batch.
+                self.__pending = {**batch, **self.__pending}
+
+                if raise_error:
+                    raise error
+                if self.__timer is None:
+                    self.__timer = asyncio.get_event_loop().call_later(self.flush_interval, self.__schedule_flush)
+
+                report_error(WriteBehindBuffer.__name__, "flush failed", error)
+                return False
+            finally:
+                self.__flushing = {}
@@ -0,0 +1,2 @@
+from .ttl_cache import TTLCache
+from .async_loading_cache import AsyncLoadingCache
@@ -0,0 +1,97 @@
+import asyncio
+import sys
+import time
+from typing import Hashable, Any, Callable, Awaitable, Dict, Set
+
+from .ttl_cache import TTLCache
+
+_MISSING = object()
+
+
+class AsyncLoadingCache:
+    """A TTL cache which loads missing values with the given coroutine function.
+
+    Concurrent misses for the same key are collapsed into a single call of the loader, so a burst of requests
+    for a missing key results in a single load.
+
+    With a stale TTL, a value which is older than the TTL is still returned for that much longer, while it is
+    reloaded once in the background (stale-while-revalidate). So a slow or failing loader delays only the first
+    load of a key, and the last loaded value is served until a reload succeeds.
+    """
+
+    def __init__(self, loader: Callable[[Hashable], Awaitable[Any]], ttl: float, max_size: int,
+                 stale_ttl: float = 0, on_revalidation_error: Callable[[Exception], None] = None):
+        """Creates the cache.
+
+        :param loader: coroutine function which loads the value for the given key
+        :param float ttl: time-to-live of a loaded value in seconds
+        :param int max_size: maximum number of cached values
+        :param float stale_ttl: time in seconds after the TTL, during which the value is returned while it's being
+                                reloaded in the background
+        :param on_revalidation_error: function called with the error of a failed background reload. The error is
+                                      printed if it's None.
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.on_revalidation_error = on_revalidation_error
+
+        # key -> (load time, value)
+        self.entries = TTLCache(ttl + stale_ttl, max_size)
+
+        self.__in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.__revalidations: Set[asyncio.Future] = set()
+
+    async def get(self, key: Hashable) -> Any:
+        """Returns the cached value for the given key, loading it if it is missing or has expired."""
+        entry = self.entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            loaded_at, value = entry
+            if time.monotonic() - loaded_at >= self.ttl:
+                self.__revalidate(key)
+            return value
+
+        return await self.refresh(key)
+
+    async def refresh(self, key: Hashable) -> Any:
+        """Loads the value for the given key regardless of the cached one and caches it."""
+        # Join the load which is already in progress for this key, if any.
+        future = self.__in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.__load(key))
+            self.__in_flight[key] = future
+
+        # Shield the load, so a cancelled waiter doesn't cancel it for the other ones.
+        return await asyncio.shield(future)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Removes the cached value for the given key."""
+        self.entries.pop(key)
+
+    async def __load(self, key: Hashable) -> Any:
+        """Loads and caches the value for the given key."""
+        try:
+            value = await self.loader(key)
+            self.entries.set(key, (time.monotonic(), value))
+            return value
+        finally:
+            del self.__in_flight[key]
+
+    def __revalidate(self, key: Hashable) -> None:
+        """Reloads the stale value for the given key in the background, unless it's already being loaded."""
+        if key in self.__in_flight:
+            return
+
+        task = asyncio.ensure_future(self.refresh(key))
+        self.__revalidations.add(task)
+        task.add_done_callback(self.__on_revalidated)
+
+    def __on_revalidated(self, task: asyncio.Future) -> None:
+        self.__revalidations.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+
+        if self.on_revalidation_error is not None:
+            self.on_revalidation_error(task.exception())
+        else:
+            print(f"\n [{AsyncLoadingCache.__name__}] revalidation failed: {task.exception()!r}", file=sys.stderr)
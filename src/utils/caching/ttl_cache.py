@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Any, Callable
+
+
+class TTLCache:
+    """A size-limited LRU cache, which entries expire after the given time-to-live.
+
+    Besides the number of entries, the cache can limit the total weight of the entries, e.g. their size in bytes,
+    computed by the given weigher.
+    """
+
+    __MISSING = object()
+
+    def __init__(self, ttl: float, max_size: int, max_weight: int = None, weigher: Callable[[Any], int] = None):
+        """Creates the cache.
+
+        :param float ttl: time-to-live of an entry in seconds
+        :param int max_size: maximum number of entries, the least recently used entry is evicted when it's reached
+        :param int max_weight: optional maximum total weight of the entries, requires the weigher
+        :param weigher: function which returns the weight of the given value
+        """
+        if ttl <= 0:
+            raise ValueError(f"[{TTLCache.__name__}]: ttl must be positive, but {ttl} was given.")
+        if max_size <= 0:
+            raise ValueError(f"[{TTLCache.__name__}]: max_size must be positive, but {max_size} was given.")
+        if max_weight is not None and weigher is None:
+            raise ValueError(f"[{TTLCache.__name__}]: weigher is required when max_weight is given.")
+
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.weigher = weigher
+
+        self.hits = 0
+        self.misses = 0
+        self.weight = 0
+
+        # key -> (expiration time, value, weight)
+        self.__entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, TTLCache.__MISSING, count=False) is not TTLCache.__MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        """Returns the value for the given key, or the default if the key is missing or has expired.
+
+        :param key: key of the entry
+        :param default: value to return if there is no fresh entry for the key
+        :param bool count: whether to count this lookup in :py:attr:`hits` and :py:attr:`misses`
+        """
+        entry = self.__entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.monotonic():
+                self.__entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+
+            self.pop(key)
+
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Stores the value for the given key, evicting the least recently used entries if the cache is full."""
+        weight = self.weigher(value) if self.weigher is not None else 0
+
+        self.pop(key)
+        self.__entries[key] = (time.monotonic() + self.ttl, value, weight)
+        self.weight += weight
+
+        while len(self.__entries) > self.max_size or \
+                (self.max_weight is not None and self.weight > self.max_weight and self.__entries):
+            _, (_, _, evicted_weight) = self.__entries.popitem(last=False)
+            self.weight -= evicted_weight
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Removes the entry for the given key and returns its value (even if it has expired)."""
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return default
+
+        self.weight -= entry[2]
+        return entry[1]
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        self.__entries.clear()
+        self.weight = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Ratio of the hits to all counted lookups."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
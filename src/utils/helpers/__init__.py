@@ -1 +1,2 @@
 from .dialog_helper import DialogHelper
+from .executor_helper import ExecutorHelper
@@ -0,0 +1,23 @@
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class ExecutorHelper:
+    """ Contains methods for working with executors, which run CPU-bound work off the event loop. """
+
+    THREAD = 'thread'
+    PROCESS = 'process'
+
+    @staticmethod
+    def create_executor(kind: str, max_workers: int = None) -> Executor:
+        """ Creates a thread or process pool executor.
+
+        :param kind: 'thread' or 'process'
+        :param max_workers: maximum number of workers, the executor's default if None
+        :return Executor: created executor
+        """
+        if kind == ExecutorHelper.THREAD:
+            return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='worker')
+        if kind == ExecutorHelper.PROCESS:
+            return ProcessPoolExecutor(max_workers=max_workers)
+
+        raise ValueError(f"[{ExecutorHelper.__name__}]: unsupported executor kind {kind}.")
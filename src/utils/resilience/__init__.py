@@ -0,0 +1,3 @@
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .load_shedder import LoadShedder, OverloadedError
+from .token_bucket import TokenBucket
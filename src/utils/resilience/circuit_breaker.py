@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+from typing import Callable, Awaitable, Any
+
+from metrics import REGISTRY, MetricsRegistry
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the protected function while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream after repeated failures, and probes it with an exponential backoff.
+
+    The circuit is closed while calls succeed. After the given number of consecutive failures it opens, and calls
+    are rejected with :py:class:`CircuitOpenError` without reaching the upstream. When the recovery timeout passes,
+    the circuit is half-open: a single call is let through as a probe. If the probe succeeds the circuit closes,
+    otherwise it opens again with a doubled recovery timeout.
+    """
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+
+    __STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 5,
+                 max_recovery_timeout: float = 300, registry: MetricsRegistry = REGISTRY):
+        """Creates the circuit breaker.
+
+        :param str name: name of the upstream, used in errors and metrics
+        :param int failure_threshold: number of consecutive failures which open the circuit
+        :param float recovery_timeout: time in seconds after which the first probe is let through
+        :param float max_recovery_timeout: maximum time in seconds between two probes
+        :param MetricsRegistry registry: registry to expose the circuit state in
+        """
+        if failure_threshold <= 0:
+            raise ValueError(f"[{CircuitBreaker.__name__}]: failure_threshold must be positive, "
+                             f"but {failure_threshold} was given.")
+
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max(max_recovery_timeout, recovery_timeout)
+
+        self.failures = 0
+        self.__state = CircuitBreaker.CLOSED
+        self.__current_timeout = recovery_timeout
+        self.__retry_at = 0.0
+
+        self.__state_gauge = registry.gauge(
+            'circuit_breaker_state', 'State of the circuit breaker: 0 - closed, 1 - half-open, 2 - open.', ('name',))
+        self.__rejected = registry.counter(
+            'circuit_breaker_rejected_total', 'Calls rejected by the open circuit breaker.', ('name',))
+        self.__set_state(CircuitBreaker.CLOSED)
+
+    @property
+    def state(self) -> str:
+        return self.__state
+
+    async def call(self, function: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Calls the given coroutine function through the circuit breaker.
+
+        :raises CircuitOpenError: if the circuit is open, or a probe is already in progress
+        """
+        if self.__state != CircuitBreaker.CLOSED:
+            if self.__state == CircuitBreaker.HALF_OPEN or time.monotonic() < self.__retry_at:
+                self.__rejected.inc(name=self.name)
+                raise CircuitOpenError(f"[{CircuitBreaker.__name__}]: the circuit of {self.name} is open.")
+
+            # Let this call through as the probe
+            self.__set_state(CircuitBreaker.HALF_OPEN)
+
+        try:
+            result = await function(*args, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled probe tells nothing about the upstream, so let the next call probe it
+            if self.__state == CircuitBreaker.HALF_OPEN:
+                self.__retry_at = time.monotonic()
+                self.__set_state(CircuitBreaker.OPEN)
+            raise
+        except Exception:
+            self.__on_failure()
+            raise
+
+        self.__on_success()
+        return result
+
+    def __on_success(self) -> None:
+        self.failures = 0
+        self.__current_timeout = self.recovery_timeout
+        self.__set_state(CircuitBreaker.CLOSED)
+
+    def __on_failure(self) -> None:
+        self.failures += 1
+        if self.__state == CircuitBreaker.HALF_OPEN:
+            # The probe failed, so wait longer before the next one
+            self.__current_timeout = min(self.__current_timeout * 2, self.max_recovery_timeout)
+        elif self.failures < self.failure_threshold:
+            return
+
+        # Spread the probes of several workers with a jitter
+        self.__retry_at = time.monotonic() + self.__current_timeout * random.uniform(0.8, 1.2)
+        self.__set_state(CircuitBreaker.OPEN)
+
+    def __set_state(self, state: str) -> None:
+        self.__state = state
+        self.__state_gauge.set(CircuitBreaker.__STATE_VALUES[state], name=self.name)
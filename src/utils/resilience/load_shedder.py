@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, Awaitable, Any, List, Tuple
+
+from metrics import REGISTRY, MetricsRegistry
+
+
+class OverloadedError(Exception):
+    """Raised instead of calling the protected function when the load is shed."""
+
+    def __init__(self, message: str, retry_after: float):
+        super(OverloadedError, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class LoadShedder:
+    """Bounds the number of calls in flight, queues the calls above the limit by their priority, and sheds the load
+    which can't be handled in time.
+
+    A queued call is rejected with :py:class:`OverloadedError` if it waits longer than the given budget. When the queue
+    is full, the queued call with the lowest priority is rejected to make room for a call with a higher one, otherwise
+    the new call is rejected right away. The calls of the same priority are run in the order they came in.
+    """
+
+    def __init__(self, name: str, max_in_flight: int = 64, max_queue: int = 256, max_wait: float = 2,
+                 retry_after: float = 1, registry: MetricsRegistry = REGISTRY):
+        """Creates the load shedder.
+
+        :param str name: name of the protected work, used in errors and metrics
+        :param int max_in_flight: maximum number of calls run at the same time
+        :param int max_queue: maximum number of calls waiting to run
+        :param float max_wait: time in seconds after which a waiting call is rejected
+        :param float retry_after: time in seconds after which the rejected calls should be retried
+        :param MetricsRegistry registry: registry to expose the load in
+        """
+        if max_in_flight <= 0:
+            raise ValueError(f"[{LoadShedder.__name__}]: max_in_flight must be positive, "
+                             f"but {max_in_flight} was given.")
+
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(max_queue, 0)
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        # The waiting calls ordered by (priority, arrival), and the number of them which haven't given up
+        self.__queue: List[Tuple[int, int, asyncio.Future]] = []
+        self.__queued = 0
+        self.__arrivals = itertools.count()
+
+        self.__in_flight_gauge = registry.gauge('load_shedder_in_flight', 'Calls in flight.', ('name',))
+        self.__queued_gauge = registry.gauge('load_shedder_queued', 'Calls waiting to run.', ('name',))
+        self.__shed = registry.counter('load_shedder_shed_total', 'Calls rejected by the load shedder.',
+                                       ('name', 'reason'))
+        self.__wait_seconds = registry.histogram('load_shedder_wait_seconds', 'Time the admitted calls waited to run.',
+                                                 ('name',))
+        self.__update_gauges()
+
+    async def call(self, priority: Callable[[], int], function: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Calls the given coroutine function when there is room for it.
+
+        :param priority: function which returns the priority of the call, the lower the sooner it runs. It's called
+                         only if the call has to wait, so the priority isn't computed while there is room.
+        :raises OverloadedError: if the call is shed
+        """
+        await self.__acquire(priority)
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            self.__release()
+
+    async def __acquire(self, get_priority: Callable[[], int]) -> None:
+        """Takes a place in flight, waiting in the queue if there is none."""
+        if self.in_flight < self.max_in_flight and not self.__queued:
+            self.in_flight += 1
+            self.__update_gauges()
+            return
+
+        priority = get_priority()
+        if self.__queued >= self.max_queue and not self.__evict_lower(priority):
+            self.__reject('queue_full')
+
+        started = time.monotonic()
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self.__queue, (priority, next(self.__arrivals), future))
+        self.__queued += 1
+        self.__update_gauges()
+        try:
+            # The place is handed over by the released call, or the future fails if the call is evicted
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            self.__give_up(future)
+            self.__reject('deadline')
+        except asyncio.CancelledError:
+            self.__give_up(future)
+            raise
+
+        self.__wait_seconds.observe(time.monotonic() - started, name=self.name)
+
+    def __release(self) -> None:
+        """Hands the place over to the first waiting call, or frees it."""
+        while self.__queue:
+            _, _, future = heapq.heappop(self.__queue)
+            if not future.done():
+                self.__queued -= 1
+                future.set_result(None)
+                self.__update_gauges()
+                return
+        self.in_flight -= 1
+        self.__update_gauges()
+
+    def __give_up(self, future: asyncio.Future) -> None:
+        """Leaves the queue, or frees the place if it was handed over meanwhile."""
+        if not future.done():
+            self.__queued -= 1
+            future.cancel()
+            self.__update_gauges()
+        elif not future.cancelled() and future.exception() is None:
+            self.__release()
+
+    def __evict_lower(self, priority: int) -> bool:
+        """Rejects the last waiting call of the lowest priority, if it's lower than the given one."""
+        waiting = [entry for entry in self.__queue if not entry[2].done()]
+        if not waiting:
+            return False
+
+        lowest = max(waiting, key=lambda entry: (entry[0], entry[1]))
+        if lowest[0] <= priority:
+            return False
+
+        self.__queued -= 1
+        self.__update_gauges()
+        lowest[2].set_exception(self.__create_error())
+        self.__shed.inc(name=self.name, reason='evicted')
+        return True
+
+    def __update_gauges(self) -> None:
+        self.__in_flight_gauge.set(self.in_flight, name=self.name)
+        self.__queued_gauge.set(self.__queued, name=self.name)
+
+    def __reject(self, reason: str) -> None:
+        self.__shed.inc(name=self.name, reason=reason)
+        raise self.__create_error()
+
+    def __create_error(self) -> OverloadedError:
+        return OverloadedError(f"[{LoadShedder.__name__}]: {self.name} is overloaded.", self.retry_after)
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Limits the rate of operations to an upstream.
+
+    Tokens are added to the bucket at the given rate up to its capacity, which allows short bursts, and each operation
+    takes a token, waiting for it if the bucket is empty. The waiting operations get the tokens in order.
+    The bucket can be paused, e.g. when the upstream asks to slow down, so no tokens are added until then.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """Creates the bucket, which is full at first.
+
+        :param float rate: number of tokens added per second
+        :param float capacity: maximum number of tokens, the rate (i.e. one second worth of tokens) by default
+        """
+        if rate <= 0:
+            raise ValueError(f"[{TokenBucket.__name__}]: rate must be positive, but {rate} was given.")
+
+        self.rate = rate
+        self.capacity = max(capacity if capacity is not None else rate, 1)
+
+        self.__tokens = self.capacity
+        # Monotonic time up to which the tokens have been added, which is in the future while the bucket is paused
+        self.__updated = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Takes a token, waiting until there is one."""
+        async with self.__lock:
+            while True:
+                now = time.monotonic()
+                if now > self.__updated:
+                    self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+                    self.__updated = now
+
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+
+                await asyncio.sleep(max(0.0, self.__updated - now) + (1 - self.__tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Takes all tokens, and adds no more of them for the given number of seconds."""
+        self.__tokens = min(self.__tokens, 0)
+        self.__updated = max(self.__updated, time.monotonic() + seconds)
@@ -0,0 +1,51 @@
+"""Tests of the alert index.
+
+Usage: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# pylint: disable=wrong-import-position
+from alerts import AlertIndex, RateAlert
+from bot_data import Language, Currency, banks
+
+
+def create_alert(id_: str, threshold: int, buy: bool = False) -> RateAlert:
+    return RateAlert(id_, 'telegram/conversations/1', Language.en, banks.BankId.ameria, Currency.usd, False, buy,
+                     threshold, 0)
+
+
+class AlertIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = AlertIndex()
+        self.bank_id = banks.get_by_id(banks.BankId.ameria).rate_am_id
+
+    def pop_reached(self, value: int, buy: bool = False):
+        return [alert.id_ for alert in self.index.pop_reached(False, self.bank_id, Currency.usd, buy, value)]
+
+    def test_fires_when_crossed(self):
+        self.index.add(create_alert('a', 48000))
+        self.assertEqual(self.pop_reached(50000), [])
+        self.assertEqual(self.pop_reached(47500), ['a'])
+        self.assertEqual(len(self.index), 0)
+
+    def test_new_alert_after_the_last_one_fired(self):
+        self.index.add(create_alert('a', 48000))
+        self.pop_reached(50000)
+        self.assertEqual(self.pop_reached(47500), ['a'])
+
+        # The rate without alerts is still followed, so the new alert is checked from its current value
+        self.assertIn((self.bank_id, Currency.usd, False), list(self.index.get_rates(False)))
+        self.assertEqual(self.pop_reached(50000), [])
+
+        self.index.add(create_alert('b', 49000))
+        self.assertEqual(self.pop_reached(48500), ['b'])
+        self.assertEqual(self.pop_reached(48000), [])
+
+
+if __name__ == '__main__':
+    unittest.main()